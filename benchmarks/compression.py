@@ -0,0 +1,81 @@
+"""
+Egress and CPU cost of the response middleware (common.http).
+
+Serves Messages- and Sessions-shaped pages of --sizes items from a small
+Flask app with add_response_middleware() and reports, per Accept-Encoding,
+the bytes on the wire and the added time per response. A final line shows
+a revalidation with If-None-Match, which costs a 304 and no body.
+
+    python benchmarks/compression.py
+    python benchmarks/compression.py --sizes 20,100,500 --rounds 200
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+
+from flask import Flask, jsonify
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path[:0] = [os.path.dirname(HERE), HERE]
+from common.http import add_response_middleware, brotli  # noqa: E402
+from common.json_provider import DynamoJSONProvider  # noqa: E402
+from json_serialization import message_items, session_items  # noqa: E402
+
+
+def make_app(payloads, middleware):
+    app = Flask(f"bench_{middleware}")
+    app.json = DynamoJSONProvider(app)
+
+    @app.route("/<name>")
+    def page(name):
+        return jsonify({"items": payloads[name], "count": len(payloads[name])})
+
+    if middleware:
+        add_response_middleware(app)
+    return app.test_client()
+
+
+def timed(client, path, headers, rounds):
+    samples = []
+    for _ in range(rounds):
+        t0 = time.perf_counter()
+        response = client.get(path, headers=headers)
+        samples.append((time.perf_counter() - t0) * 1e6)
+    return statistics.median(samples), response
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--sizes", default="20,100,500", help="items per page")
+    parser.add_argument("--rounds", type=int, default=100)
+    args = parser.parse_args()
+
+    encodings = ["identity", "gzip"] + (["br"] if brotli is not None else [])
+    for size in (int(s) for s in args.sizes.split(",")):
+        payloads = {"messages": message_items(size), "sessions": session_items(size)}
+        plain, wrapped = make_app(payloads, False), make_app(payloads, True)
+        for name in payloads:
+            path = f"/{name}"
+            base_us, base = timed(plain, path, {}, args.rounds)
+            for encoding in encodings:
+                us, response = timed(wrapped, path, {"Accept-Encoding": encoding}, args.rounds)
+                print(json.dumps({
+                    "benchmark": "compression", "payload": name, "items": size,
+                    "encoding": encoding, "bytes": len(response.data),
+                    "ratio": round(len(base.data) / len(response.data), 2),
+                    "added_us": round(us - base_us, 1),
+                }), flush=True)
+            etag = response.headers["ETag"]
+            us, response = timed(wrapped, path, {"If-None-Match": etag}, args.rounds)
+            print(json.dumps({
+                "benchmark": "compression", "payload": name, "items": size,
+                "encoding": "revalidate", "status": response.status_code,
+                "bytes": len(response.data), "added_us": round(us - base_us, 1),
+            }), flush=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,380 @@
+"""
+End-to-end load test of user-, counsellor- and messaging-service on one box.
+
+Everything runs locally, without network access:
+
+  * a moto server stands in for Cognito (it issues RS256 ID tokens and
+    serves the pool's JWKS) and, unless --dynamodb-endpoint points at
+    DynamoDB Local, for DynamoDB too;
+  * the DynamoDB tables and the Cognito user pool/client are created from
+    CloudformationStack/full-stack.yaml, so the schema matches production;
+  * the three services run under gunicorn with common/gunicorn_conf.py
+    (or the Flask development server with --server dev);
+  * --customers customers (real Cognito users) and --counsellors
+    counsellors are seeded, each customer with --messages and --sessions
+    of history.
+
+--users virtual users then repeat the customer journey for --duration
+seconds: log in, list counsellors, check a counsellor's availability, book
+a session, send --chat messages and read the conversation back, and list
+their sessions. Each request is timed under its route name.
+
+Output is one JSON line per endpoint (requests, errors, rps, p50/p95/p99)
+and a summary line with flows per second, the git commit and the
+settings; --output also writes all of it to a JSON file for comparing
+commits:
+
+    python benchmarks/e2e_load.py
+    python benchmarks/e2e_load.py --users 16 --duration 60 --output before.json
+    python benchmarks/e2e_load.py --dynamodb-endpoint http://localhost:8000 --customers 500
+"""
+import argparse
+import datetime
+import gzip
+import http.client
+import json
+import os
+import random
+import signal
+import subprocess
+import sys
+import threading
+import time
+import uuid
+
+import boto3
+import yaml
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(HERE)
+sys.path.insert(0, HERE)
+from serving_load import free_port, percentile  # noqa: E402
+
+REGION = "us-east-1"
+PASSWORD = "Bench-Passw0rd!"
+SERVICES = ("user-service", "counsellor-service", "messaging-service")
+TEMPLATE = os.path.join(ROOT, "CloudformationStack", "full-stack.yaml")
+# DynamoDB table properties that CreateTable accepts as they are.
+TABLE_KEYS = ("TableName", "BillingMode", "AttributeDefinitions", "KeySchema", "GlobalSecondaryIndexes")
+
+
+# ----------------------------------------------------------------
+#  Backend: moto server, tables and user pool from the stack template
+# ----------------------------------------------------------------
+class _TemplateLoader(yaml.SafeLoader):
+    pass
+
+
+# Intrinsic functions (!Ref, !Sub, ...) are not needed for the resources used here.
+_TemplateLoader.add_multi_constructor("!", lambda loader, suffix, node: None)
+
+
+def template_resources(resource_type):
+    with open(TEMPLATE) as f:
+        resources = yaml.load(f, Loader=_TemplateLoader)["Resources"]
+    return [r["Properties"] for r in resources.values() if r["Type"] == resource_type]
+
+
+def wait_for_http(port, path, timeout, process=None):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process is not None and process.poll() is not None:
+            break
+        try:
+            conn = http.client.HTTPConnection("127.0.0.1", port, timeout=1)
+            conn.request("GET", path)
+            if conn.getresponse().status < 500:
+                return
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError(f"Nothing healthy on port {port} ({path})")
+
+
+def start_moto(args):
+    port = free_port()
+    process = subprocess.Popen([sys.executable, "-m", "moto.server", "-H", "127.0.0.1", "-p", str(port)],
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    wait_for_http(port, "/moto-api/", args.startup_timeout, process)
+    return process, f"http://127.0.0.1:{port}"
+
+
+def create_tables(dynamodb):
+    for properties in template_resources("AWS::DynamoDB::Table"):
+        dynamodb.create_table(**{k: properties[k] for k in TABLE_KEYS if k in properties})
+    for properties in template_resources("AWS::DynamoDB::Table"):
+        dynamodb.Table(properties["TableName"]).wait_until_exists()
+
+
+def create_user_pool(cognito):
+    pool = template_resources("AWS::Cognito::UserPool")[0]
+    client = template_resources("AWS::Cognito::UserPoolClient")[0]
+    pool_id = cognito.create_user_pool(
+        PoolName=pool["UserPoolName"], Schema=pool["Schema"],
+        UsernameAttributes=pool["UsernameAttributes"], AutoVerifiedAttributes=pool["AutoVerifiedAttributes"],
+    )["UserPool"]["Id"]
+    client_id = cognito.create_user_pool_client(
+        UserPoolId=pool_id, ClientName=client["ClientName"], GenerateSecret=False,
+        ExplicitAuthFlows=[flow for flow in client["ExplicitAuthFlows"] if flow],
+    )["UserPoolClient"]["ClientId"]
+    return pool_id, client_id
+
+
+# ----------------------------------------------------------------
+#  Seed data
+# ----------------------------------------------------------------
+def seed(dynamodb, cognito, pool_id, client_id, args, rng):
+    now = datetime.datetime.utcnow()
+    counsellors = []
+    with dynamodb.Table("Users").batch_writer() as users:
+        for i in range(args.counsellors):
+            item = {"user_id": str(uuid.uuid4()), "name": f"Counsellor {i}", "email": f"counsellor{i}@example.com",
+                    "profile_type": "counsellor", "specialization": rng.choice(["anxiety", "grief", "career"]),
+                    "cognito_username": f"counsellor{i}@example.com",
+                    "created_at": (now - datetime.timedelta(minutes=i)).isoformat() + "Z"}
+            users.put_item(Item=item)
+            counsellors.append(item["user_id"])
+
+    customers = []
+    for i in range(args.customers):
+        email = f"customer{i}@example.com"
+        sub = cognito.sign_up(ClientId=client_id, Username=email, Password=PASSWORD, UserAttributes=[
+            {"Name": "email", "Value": email}, {"Name": "name", "Value": f"Customer {i}"},
+            {"Name": "custom:profile_type", "Value": "customer"},
+        ])["UserSub"]
+        cognito.admin_confirm_sign_up(UserPoolId=pool_id, Username=email)
+        dynamodb.Table("Users").put_item(Item={
+            "user_id": sub, "name": f"Customer {i}", "email": email, "profile_type": "customer",
+            "cognito_username": email, "created_at": now.isoformat() + "Z"})
+        customers.append(email)
+
+    with dynamodb.Table("Messages").batch_writer() as batch:
+        for customer in customers:
+            for j in range(args.messages):
+                counsellor = rng.choice(counsellors)
+                sender, receiver = (customer, counsellor) if j % 2 else (counsellor, customer)
+                batch.put_item(Item={
+                    "message_id": str(uuid.uuid4()), "sender_id": sender, "receiver_id": receiver,
+                    "conversation_id": "#".join(sorted([sender, receiver])),
+                    "timestamp": (now - datetime.timedelta(minutes=j)).isoformat() + "Z",
+                    "content": "How are you getting on this week?"})
+    # Past sessions; the flows book future slots, so these never collide with them.
+    with dynamodb.Table("Sessions").batch_writer() as batch:
+        for customer in customers:
+            for j in range(args.sessions):
+                batch.put_item(Item={
+                    "session_id": str(uuid.uuid4()), "customer_id": customer,
+                    "counsellor_id": rng.choice(counsellors), "status": "completed",
+                    "date_time": (now - datetime.timedelta(days=j + 1)).date().isoformat(),
+                    "session_time": "10:00"})
+    return customers, counsellors
+
+
+# ----------------------------------------------------------------
+#  Services
+# ----------------------------------------------------------------
+def start_services(args, endpoints, pool_id, client_id):
+    env = dict(os.environ, AWS_REGION=REGION, AWS_DEFAULT_REGION=REGION,
+               AWS_ACCESS_KEY_ID="bench", AWS_SECRET_ACCESS_KEY="bench",
+               DYNAMODB_ENDPOINT_URL=endpoints["dynamodb"], COGNITO_ENDPOINT_URL=endpoints["cognito"],
+               COGNITO_USER_POOL_ID=pool_id, COGNITO_USER_POOL_CLIENT_ID=client_id,
+               COGNITO_JWKS_URL=f"{endpoints['cognito']}/{pool_id}/.well-known/jwks.json",
+               GUNICORN_WORKERS=str(args.workers), GUNICORN_THREADS=str(args.threads),
+               GUNICORN_ACCESS_LOG="", PYTHONPATH=ROOT, RATE_LIMIT_ENABLED="0")
+    ports, processes = {}, []
+    for service in SERVICES:
+        port = free_port()
+        if args.server == "dev":
+            command = [sys.executable, "app.py"]
+        else:
+            command = [sys.executable, "-m", "gunicorn", "--config", os.path.join(ROOT, "common", "gunicorn_conf.py"),
+                       "--bind", f"127.0.0.1:{port}", "app:app"]
+        processes.append(subprocess.Popen(command, cwd=os.path.join(ROOT, service), env=dict(env, PORT=str(port)),
+                                          stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL))
+        ports[service] = port
+    for process, service in zip(processes, SERVICES):
+        wait_for_http(ports[service], "/health", args.startup_timeout, process)
+    return ports, processes
+
+
+# ----------------------------------------------------------------
+#  Virtual users
+# ----------------------------------------------------------------
+class Recorder:
+    def __init__(self):
+        self.samples = {}
+        self.errors = {}
+        self.flows = 0
+        self._lock = threading.Lock()
+
+    def add(self, endpoint, ms, ok):
+        with self._lock:
+            if ok:
+                self.samples.setdefault(endpoint, []).append(ms)
+            else:
+                self.errors[endpoint] = self.errors.get(endpoint, 0) + 1
+                self.samples.setdefault(endpoint, [])
+
+
+class VirtualUser:
+    def __init__(self, email, ports, recorder, args, rng):
+        self.email = email
+        self.recorder = recorder
+        self.args = args
+        self.rng = rng
+        self.conns = {service: http.client.HTTPConnection("127.0.0.1", port, timeout=30)
+                      for service, port in ports.items()}
+        self.headers = {"Content-Type": "application/json", "Accept-Encoding": "gzip"}
+
+    def call(self, service, method, path, name, body=None, expected=(200,)):
+        conn = self.conns[service]
+        t0 = time.perf_counter()
+        try:
+            conn.request(method, path, body=json.dumps(body) if body is not None else None, headers=self.headers)
+            response = conn.getresponse()
+            data = response.read()
+            status = response.status
+        except (OSError, http.client.HTTPException):
+            conn.close()
+            self.recorder.add(name, 0, False)
+            return None, None
+        self.recorder.add(name, (time.perf_counter() - t0) * 1000, status in expected)
+        if response.getheader("Content-Encoding") == "gzip":
+            data = gzip.decompress(data)
+        try:
+            return status, json.loads(data) if data else None
+        except ValueError:
+            return status, None
+
+    def flow(self):
+        status, body = self.call("user-service", "POST", "/login", "POST /login",
+                                 {"email": self.email, "password": PASSWORD})
+        if status != 200:
+            return
+        self.headers["Authorization"] = f"Bearer {body['id_token']}"
+
+        status, counsellors = self.call("counsellor-service", "GET", "/counsellors?limit=20",
+                                        "GET /counsellors")
+        if status != 200 or not counsellors["items"]:
+            return
+        counsellor = self.rng.choice(counsellors["items"])["user_id"]
+
+        day = (datetime.date.today() + datetime.timedelta(days=self.rng.randrange(1, 60))).isoformat()
+        status, availability = self.call("messaging-service", "GET",
+                                         f"/counsellors/{counsellor}/availability?from={day}&to={day}",
+                                         "GET /counsellors/<id>/availability")
+        free = availability["days"][0]["available"] if status == 200 else []
+        if free:
+            # 409 is a legitimate answer when another user took the slot first.
+            self.call("messaging-service", "POST", "/sessions", "POST /sessions", {
+                "customer_id": self.email, "counsellor_id": counsellor,
+                "date_time": day, "session_time": self.rng.choice(free),
+            }, expected=(201, 409))
+
+        for i in range(self.args.chat):
+            self.call("messaging-service", "POST", "/messages", "POST /messages", {
+                "sender_id": self.email, "receiver_id": counsellor, "content": f"Message {i}",
+            }, expected=(201, 202))
+        self.call("messaging-service", "GET", f"/messages?userId={self.email}&peerId={counsellor}&limit=20",
+                  "GET /messages")
+        self.call("messaging-service", "GET", f"/sessions?customerId={self.email}&limit=20", "GET /sessions")
+        with self.recorder._lock:
+            self.recorder.flows += 1
+
+    def run(self, stop_at):
+        while time.monotonic() < stop_at:
+            self.flow()
+            if self.args.think_ms:
+                time.sleep(self.args.think_ms / 1000)
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def report(recorder, args, setup_s):
+    results = []
+    for endpoint, samples in sorted(recorder.samples.items()):
+        results.append({
+            "benchmark": "e2e_load", "endpoint": endpoint, "requests": len(samples),
+            "errors": recorder.errors.get(endpoint, 0), "rps": round(len(samples) / args.duration, 1),
+            "p50_ms": round(percentile(samples, 50), 2) if samples else None,
+            "p95_ms": round(percentile(samples, 95), 2) if samples else None,
+            "p99_ms": round(percentile(samples, 99), 2) if samples else None,
+        })
+    summary = {
+        "benchmark": "e2e_load", "endpoint": "summary", "commit": git_commit(),
+        "flows": recorder.flows, "flows_per_s": round(recorder.flows / args.duration, 2),
+        "requests": sum(r["requests"] for r in results), "errors": sum(r["errors"] for r in results),
+        "setup_s": round(setup_s, 1),
+        "settings": {k: v for k, v in vars(args).items() if k != "output"},
+    }
+    for line in results + [summary]:
+        print(json.dumps(line), flush=True)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"summary": summary, "endpoints": results}, f, indent=2)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--users", type=int, default=8, help="concurrent virtual users")
+    parser.add_argument("--duration", type=float, default=30)
+    parser.add_argument("--think-ms", type=float, default=0, help="pause between flows")
+    parser.add_argument("--chat", type=int, default=3, help="messages sent per flow")
+    parser.add_argument("--customers", type=int, default=20)
+    parser.add_argument("--counsellors", type=int, default=10)
+    parser.add_argument("--messages", type=int, default=20, help="seeded messages per customer")
+    parser.add_argument("--sessions", type=int, default=5, help="seeded sessions per customer")
+    parser.add_argument("--server", choices=["gunicorn", "dev"], default="gunicorn")
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--dynamodb-endpoint", default=None, help="e.g. DynamoDB Local; moto otherwise")
+    parser.add_argument("--startup-timeout", type=float, default=60)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--output", default=None, help="also write the results to this JSON file")
+    args = parser.parse_args()
+    rng = random.Random(args.seed)
+
+    os.environ.setdefault("AWS_ACCESS_KEY_ID", "bench")
+    os.environ.setdefault("AWS_SECRET_ACCESS_KEY", "bench")
+    t0 = time.monotonic()
+    processes = []
+    try:
+        moto, moto_url = start_moto(args)
+        processes.append(moto)
+        endpoints = {"cognito": moto_url, "dynamodb": args.dynamodb_endpoint or moto_url}
+        dynamodb = boto3.resource("dynamodb", region_name=REGION, endpoint_url=endpoints["dynamodb"])
+        cognito = boto3.client("cognito-idp", region_name=REGION, endpoint_url=endpoints["cognito"])
+        create_tables(dynamodb)
+        pool_id, client_id = create_user_pool(cognito)
+        customers, _ = seed(dynamodb, cognito, pool_id, client_id, args, rng)
+        ports, services = start_services(args, endpoints, pool_id, client_id)
+        processes.extend(services)
+        setup_s = time.monotonic() - t0
+
+        recorder = Recorder()
+        stop_at = time.monotonic() + args.duration
+        users = [VirtualUser(customers[i % len(customers)], ports, recorder, args, random.Random(args.seed + i))
+                 for i in range(args.users)]
+        threads = [threading.Thread(target=user.run, args=(stop_at,)) for user in users]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        report(recorder, args, setup_s)
+    finally:
+        for process in reversed(processes):
+            process.send_signal(signal.SIGTERM)
+        for process in processes:
+            try:
+                process.wait(timeout=30)
+            except subprocess.TimeoutExpired:
+                process.kill()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+"""
+JSON serialization of DynamoDB items: Flask's default provider vs.
+common.json_provider.DynamoJSONProvider.
+
+Builds --items Messages- and Sessions-shaped items as the boto3 resource
+API returns them (numbers as Decimal, a string set on sessions) and times
+jsonify() of the whole list:
+
+  flask_default  Flask's provider (Decimals become strings; sets are
+                 dropped from the payload because it cannot encode them)
+  dynamo_stdlib  DynamoJSONProvider without orjson
+  dynamo_orjson  DynamoJSONProvider with orjson
+
+    python benchmarks/json_serialization.py
+    python benchmarks/json_serialization.py --items 50000 --rounds 9
+"""
+import argparse
+import datetime
+import json
+import os
+import statistics
+import sys
+import time
+import uuid
+from decimal import Decimal
+
+from flask import Flask, jsonify
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+from common import json_provider  # noqa: E402
+
+
+def message_items(count):
+    start = datetime.datetime(2025, 1, 1)
+    return [{
+        "message_id": str(uuid.UUID(int=i)),
+        "sender_id": f"user{i % 50}@example.com",
+        "receiver_id": f"user{(i + 1) % 50}@example.com",
+        "conversation_id": f"user{i % 50}@example.com#user{(i + 1) % 50}@example.com",
+        "timestamp": (start + datetime.timedelta(seconds=i)).isoformat() + "Z",
+        "content": "Thanks, see you on Tuesday. " * 3,
+        "attachments": Decimal(i % 3),
+        "read": i % 2 == 0,
+    } for i in range(count)]
+
+
+def session_items(count):
+    return [{
+        "session_id": str(uuid.UUID(int=i)),
+        "customer_id": f"customer{i % 500}@example.com",
+        "counsellor_id": f"counsellor{i % 40}@example.com",
+        "date_time": f"2025-{i % 12 + 1:02d}-{i % 28 + 1:02d}",
+        "session_time": f"{9 + i % 8:02d}:00",
+        "status": "booked",
+        "duration_minutes": Decimal(60),
+        "fee": Decimal("45.50"),
+        "topics": {"anxiety", "sleep"},
+    } for i in range(count)]
+
+
+def make_app(provider):
+    app = Flask(f"bench_{provider}")
+    if provider != "flask_default":
+        app.json = json_provider.DynamoJSONProvider(app)
+    return app
+
+
+def time_jsonify(app, items, rounds):
+    samples = []
+    with app.app_context():
+        jsonify(items[:100])  # warm up
+        for _ in range(rounds):
+            t0 = time.perf_counter()
+            body = jsonify(items).get_data()
+            samples.append((time.perf_counter() - t0) * 1000)
+    return statistics.median(samples), len(body)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--items", type=int, default=10000)
+    parser.add_argument("--rounds", type=int, default=5)
+    args = parser.parse_args()
+
+    orjson = json_provider.orjson
+    payloads = {"messages": message_items(args.items), "sessions": session_items(args.items)}
+    for payload, items in payloads.items():
+        results = {}
+        for provider in ("flask_default", "dynamo_stdlib", "dynamo_orjson"):
+            data = items
+            if provider == "flask_default":
+                data = [{k: v for k, v in item.items() if not isinstance(v, set)} for item in items]
+            json_provider.orjson = orjson if provider == "dynamo_orjson" else None
+            results[provider] = time_jsonify(make_app(provider), data, args.rounds)
+        json_provider.orjson = orjson
+        base = results["flask_default"][0]
+        for provider, (ms, size) in results.items():
+            print(json.dumps({
+                "benchmark": "json_serialization", "payload": payload, "items": args.items,
+                "provider": provider, "p50_ms": round(ms, 2), "body_bytes": size,
+                "speedup": round(base / ms, 2),
+            }), flush=True)
+
+
+if __name__ == "__main__":
+    main()
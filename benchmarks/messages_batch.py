@@ -0,0 +1,96 @@
+"""
+Bulk send and history fetch: one request per item vs. the batch endpoints.
+
+Drives messaging-service in-process (serving_app.py: moto plus a fixed
+per-call DynamoDB delay) and times, for --batch messages / --peers
+conversations:
+
+  single_send   one POST /messages per message
+  batch_send    one POST /messages/batch with all of them
+  single_get    one GET /messages?peerId=&limit= per conversation
+  batch_get     one POST /messages/batch-get for all conversations
+
+Each line also reports the DynamoDB calls made per round.
+
+    python benchmarks/messages_batch.py
+    BENCH_DYNAMODB_LATENCY_MS=5 python benchmarks/messages_batch.py --batch 300 --peers 20
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, HERE)
+from serving_load import CLIENT, POOL, REGION, make_identity  # noqa: E402
+
+
+def timed(fn, rounds):
+    samples = []
+    for _ in range(rounds):
+        t0 = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - t0) * 1000)
+    return statistics.median(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--batch", type=int, default=100, help="messages per bulk send")
+    parser.add_argument("--peers", type=int, default=10, help="conversations per history fetch")
+    parser.add_argument("--limit", type=int, default=20, help="messages per conversation")
+    parser.add_argument("--rounds", type=int, default=5)
+    args = parser.parse_args()
+
+    jwks_path, token = make_identity(tempfile.mkdtemp())
+    os.environ.update(COGNITO_JWKS_URL=jwks_path, COGNITO_USER_POOL_ID=POOL,
+                      COGNITO_USER_POOL_CLIENT_ID=CLIENT, AWS_REGION=REGION, RATE_LIMIT_ENABLED="0")
+    import serving_app  # starts moto and seeds the Messages table
+
+    client = serving_app.app.test_client()
+    headers = {"Authorization": f"Bearer {token}"}
+    calls = []
+    serving_app.service.dynamodb.meta.client.meta.events.register(
+        "before-call.dynamodb", lambda **kwargs: calls.append(1))
+
+    sender = "bench-counsellor@example.com"
+    peers = [f"bench-customer{i}@example.com" for i in range(args.peers)]
+    batch = [{"sender_id": sender, "receiver_id": peers[i % len(peers)], "content": f"notice {i}"}
+             for i in range(args.batch)]
+
+    def single_send():
+        for message in batch:
+            assert client.post("/messages", json=dict(message), headers=headers).status_code == 201
+
+    def batch_send():
+        assert client.post("/messages/batch", json={"messages": batch}, headers=headers).status_code == 201
+
+    def single_get():
+        for peer in peers:
+            client.get("/messages", query_string={"userId": sender, "peerId": peer, "limit": args.limit},
+                       headers=headers)
+
+    def batch_get():
+        client.post("/messages/batch-get", json={"user_id": sender, "peer_ids": peers, "limit": args.limit},
+                    headers=headers)
+
+    for name, fn, http_requests in (
+        ("single_send", single_send, args.batch),
+        ("batch_send", batch_send, 1),
+        ("single_get", single_get, args.peers),
+        ("batch_get", batch_get, 1),
+    ):
+        calls.clear()
+        p50 = timed(fn, args.rounds)
+        print(json.dumps({
+            "benchmark": "messages_batch", "method": name, "batch": args.batch,
+            "peers": args.peers, "rounds": args.rounds, "http_requests": http_requests,
+            "dynamodb_calls": len(calls) // args.rounds, "p50_ms": round(p50, 3),
+        }), flush=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,151 @@
+"""
+GET /messages read path: full-table scan vs. GSI query.
+
+Seeds a Messages table with N messages spread over enough users that each
+inbox holds roughly --inbox-size messages, then times, for random users:
+
+  scan        the old single `scan()` + Python filter (one 1 MB page only)
+  scan_all    a complete paged scan + filter (what a correct scan would cost)
+  query_50    newest 50 messages via the sender/receiver GSIs
+  query_all   full inbox via the sender/receiver GSIs
+
+Runs in-process against moto by default. Use --endpoint-url to point at
+DynamoDB Local for the larger sizes (moto holds everything in memory):
+
+    python benchmarks/messages_query.py --sizes 10000
+    python benchmarks/messages_query.py --sizes 10000,100000,1000000 \
+        --endpoint-url http://localhost:8000
+"""
+import argparse
+import contextlib
+import datetime
+import json
+import os
+import random
+import statistics
+import sys
+import time
+import uuid
+from itertools import islice
+
+import boto3
+
+ROOT = os.path.join(os.path.dirname(__file__), "..")
+sys.path[:0] = [ROOT, os.path.join(ROOT, "messaging-service")]
+import messages  # noqa: E402
+
+
+def create_messages_table(dynamodb, name):
+    index = lambda name, key: {  # noqa: E731
+        "IndexName": name,
+        "KeySchema": [{"AttributeName": key, "KeyType": "HASH"},
+                      {"AttributeName": "timestamp", "KeyType": "RANGE"}],
+        "Projection": {"ProjectionType": "ALL"},
+    }
+    table = dynamodb.create_table(
+        TableName=name,
+        BillingMode="PAY_PER_REQUEST",
+        AttributeDefinitions=[{"AttributeName": a, "AttributeType": "S"} for a in
+                              ("message_id", "sender_id", "receiver_id", "conversation_id", "timestamp")],
+        KeySchema=[{"AttributeName": "message_id", "KeyType": "HASH"}],
+        GlobalSecondaryIndexes=[
+            index(messages.SENDER_INDEX, "sender_id"),
+            index(messages.RECEIVER_INDEX, "receiver_id"),
+            index(messages.CONVERSATION_INDEX, "conversation_id"),
+        ],
+    )
+    table.wait_until_exists()
+    return table
+
+
+def seed(table, size, inbox_size, rng):
+    users = [f"user{i}@example.com" for i in range(max(2, size * 2 // inbox_size))]
+    start = datetime.datetime(2025, 1, 1)
+    with table.batch_writer() as batch:
+        for i in range(size):
+            sender, receiver = rng.sample(users, 2)
+            batch.put_item(Item={
+                "message_id": str(uuid.uuid4()),
+                "sender_id": sender,
+                "receiver_id": receiver,
+                "conversation_id": messages.conversation_id(sender, receiver),
+                "timestamp": (start + datetime.timedelta(seconds=i)).isoformat() + "Z",
+                "content": "x" * 80,
+            })
+    return users
+
+
+def scan_single_page(table, user_id):
+    items = table.scan().get("Items", [])
+    return [m for m in items if m.get("sender_id") == user_id or m.get("receiver_id") == user_id]
+
+
+def scan_all(table, user_id):
+    kwargs, found = {}, []
+    while True:
+        response = table.scan(**kwargs)
+        found.extend(m for m in response.get("Items", [])
+                     if m.get("sender_id") == user_id or m.get("receiver_id") == user_id)
+        if "LastEvaluatedKey" not in response:
+            return found
+        kwargs["ExclusiveStartKey"] = response["LastEvaluatedKey"]
+
+
+METHODS = {
+    "scan": scan_single_page,
+    "scan_all": scan_all,
+    "query_50": lambda t, u: list(islice(messages.iter_user_messages(t, u, page_size=50), 50)),
+    "query_all": lambda t, u: list(messages.iter_user_messages(t, u)),
+}
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+def run(dynamodb, size, args, rng):
+    table = create_messages_table(dynamodb, f"BenchMessages{size}")
+    try:
+        users = seed(table, size, args.inbox_size, rng)
+        for method, fn in METHODS.items():
+            samples = []
+            for _ in range(args.iterations):
+                user = rng.choice(users)
+                t0 = time.perf_counter()
+                fn(table, user)
+                samples.append((time.perf_counter() - t0) * 1000)
+            print(json.dumps({
+                "benchmark": "messages_query", "size": size, "method": method,
+                "iterations": args.iterations,
+                "p50_ms": round(statistics.median(samples), 3),
+                "p99_ms": round(percentile(samples, 99), 3),
+            }), flush=True)
+    finally:
+        table.delete()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--sizes", default="10000", help="comma-separated message counts")
+    parser.add_argument("--inbox-size", type=int, default=200)
+    parser.add_argument("--iterations", type=int, default=50)
+    parser.add_argument("--endpoint-url", default=None)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+    rng = random.Random(args.seed)
+
+    os.environ.setdefault("AWS_ACCESS_KEY_ID", "bench")
+    os.environ.setdefault("AWS_SECRET_ACCESS_KEY", "bench")
+    backend = contextlib.nullcontext()
+    if not args.endpoint_url:
+        from moto import mock_aws
+        backend = mock_aws()
+    with backend:
+        dynamodb = boto3.resource("dynamodb", region_name="us-east-1", endpoint_url=args.endpoint_url)
+        for size in (int(s) for s in args.sizes.split(",")):
+            run(dynamodb, size, args, rng)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""
+Cost of the request instrumentation.
+
+Times a trivial Flask route through the WSGI stack with and without
+instrument_app(), alternating rounds so drift affects both equally, and
+times the raw metric primitives on their own:
+
+    python benchmarks/metrics_overhead.py
+    python benchmarks/metrics_overhead.py --requests 20000 --rounds 7
+
+Prints one JSON line per measurement; overhead_us is the added time per
+request (median of rounds).
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+
+from flask import Flask
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+from common import metrics  # noqa: E402
+from common.instrumentation import instrument_app  # noqa: E402
+
+
+def make_app(instrumented):
+    app = Flask(f"bench_{instrumented}")
+
+    @app.route("/items/<item_id>")
+    def item(item_id):
+        return item_id
+
+    if instrumented:
+        instrument_app(app)
+    return app
+
+
+def per_request_us(client, requests):
+    start = time.perf_counter()
+    for i in range(requests):
+        client.get(f"/items/{i % 100}")
+    return (time.perf_counter() - start) / requests * 1e6
+
+
+def per_call_ns(fn, calls):
+    start = time.perf_counter()
+    for _ in range(calls):
+        fn()
+    return (time.perf_counter() - start) / calls * 1e9
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--rounds", type=int, default=5)
+    parser.add_argument("--calls", type=int, default=200000)
+    args = parser.parse_args()
+
+    plain = make_app(False).test_client()
+    instrumented = make_app(True).test_client()
+    per_request_us(plain, 500)  # warm up
+    per_request_us(instrumented, 500)
+
+    baseline, with_metrics = [], []
+    for _ in range(args.rounds):
+        baseline.append(per_request_us(plain, args.requests))
+        with_metrics.append(per_request_us(instrumented, args.requests))
+    base, inst = statistics.median(baseline), statistics.median(with_metrics)
+    print(json.dumps({
+        "benchmark": "metrics_overhead", "case": "flask_request",
+        "requests": args.requests, "rounds": args.rounds,
+        "baseline_us": round(base, 2), "instrumented_us": round(inst, 2),
+        "overhead_us": round(inst - base, 2),
+        "overhead_pct": round((inst - base) / base * 100, 2),
+    }), flush=True)
+
+    counter = metrics.Counter("bench_total", "", ["route", "status"])
+    histogram = metrics.Histogram("bench_seconds", "", ["route", "status"])
+    for name, fn in (
+        ("counter_inc", lambda: counter.inc(route="/items/<item_id>", status="200")),
+        ("histogram_observe", lambda: histogram.observe(0.004, route="/items/<item_id>", status="200")),
+    ):
+        print(json.dumps({
+            "benchmark": "metrics_overhead", "case": name, "calls": args.calls,
+            "ns_per_call": round(per_call_ns(fn, args.calls), 1),
+        }), flush=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+"""
+Push channel fan-out: connections, latency and memory per connection.
+
+Opens N subscriptions, each drained by its own thread (one thread per SSE
+connection, as with threaded/gthread workers), spread over --channels users.
+Then publishes events and measures publish -> receive latency for every
+subscriber of the channel, plus traced memory per open subscription.
+
+    python benchmarks/push_fanout.py --connections 100,1000,5000
+    EVENT_BROKER=redis EVENT_BROKER_URL=redis://localhost:6379/0 \
+        python benchmarks/push_fanout.py --connections 1000
+"""
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import threading
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "messaging-service"))
+import broker as broker_module  # noqa: E402
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+def run(connections, args, rng):
+    event_broker = broker_module.create_broker()
+    channels = [f"user{i}@example.com" for i in range(min(args.channels, connections))]
+    latencies, lock = [], threading.Lock()
+    stop = threading.Event()
+
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    subscriptions = [event_broker.subscribe(channels[i % len(channels)]) for i in range(connections)]
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    bytes_per_connection = sum(s.size_diff for s in after.compare_to(before, "filename")) / connections
+
+    def drain(subscription):
+        while not stop.is_set():
+            event = subscription.get(timeout=0.2)
+            if event is not None:
+                elapsed = (time.perf_counter() - event["data"]["sent_at"]) * 1000
+                with lock:
+                    latencies.append(elapsed)
+
+    threads = [threading.Thread(target=drain, args=(s,), daemon=True) for s in subscriptions]
+    for t in threads:
+        t.start()
+
+    t0 = time.perf_counter()
+    for _ in range(args.events):
+        channel = rng.choice(channels)
+        event_broker.publish(channel, {"type": "message", "data": {"sent_at": time.perf_counter()}})
+        time.sleep(args.interval)
+    publish_seconds = time.perf_counter() - t0
+    time.sleep(0.5)
+    stop.set()
+    for t in threads:
+        t.join()
+    for s in subscriptions:
+        s.close()
+
+    print(json.dumps({
+        "benchmark": "push_fanout",
+        "broker": os.environ.get("EVENT_BROKER", "memory"),
+        "connections": connections,
+        "channels": len(channels),
+        "events": args.events,
+        "deliveries": len(latencies),
+        "publish_rate": round(args.events / publish_seconds, 1),
+        "fanout_p50_ms": round(statistics.median(latencies), 3) if latencies else None,
+        "fanout_p99_ms": round(percentile(latencies, 99), 3) if latencies else None,
+        "bytes_per_connection": round(bytes_per_connection),
+    }), flush=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--connections", default="100,1000", help="comma-separated connection counts")
+    parser.add_argument("--channels", type=int, default=500, help="distinct users (channels)")
+    parser.add_argument("--events", type=int, default=500)
+    parser.add_argument("--interval", type=float, default=0.002, help="seconds between publishes")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+    rng = random.Random(args.seed)
+    for connections in (int(c) for c in args.connections.split(",")):
+        run(connections, args, rng)
+
+
+if __name__ == "__main__":
+    main()
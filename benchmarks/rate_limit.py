@@ -0,0 +1,80 @@
+"""
+Cost of rate limiting on the request path.
+
+Times a trivial Flask route through the WSGI stack with and without a
+RateLimiter (per-IP and total buckets, memory backend, limits too high
+to reject), alternating rounds so drift affects both equally, and times
+RateLimiter.check() and MemoryBackend.take() on their own:
+
+    python benchmarks/rate_limit.py
+    python benchmarks/rate_limit.py --requests 20000 --rounds 7
+
+Prints one JSON line per measurement; overhead_us is the added time per
+request (median of rounds).
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+
+from flask import Flask
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+from common.ratelimit import MemoryBackend, RateLimiter  # noqa: E402
+from metrics_overhead import per_call_ns, per_request_us  # noqa: E402
+
+UNREACHABLE = "1000000000/second"
+
+
+def make_app(limited):
+    app = Flask(f"bench_{limited}")
+    limiter = RateLimiter("bench", per_ip=UNREACHABLE, total=UNREACHABLE, backend=MemoryBackend())
+
+    def item(item_id):
+        return item_id
+
+    app.add_url_rule("/items/<item_id>", view_func=limiter(item) if limited else item)
+    return app, limiter
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--rounds", type=int, default=5)
+    parser.add_argument("--calls", type=int, default=200000)
+    args = parser.parse_args()
+
+    plain = make_app(False)[0].test_client()
+    limited_app, limiter = make_app(True)
+    limited = limited_app.test_client()
+    per_request_us(plain, 500)  # warm up
+    per_request_us(limited, 500)
+
+    baseline, with_limits = [], []
+    for _ in range(args.rounds):
+        baseline.append(per_request_us(plain, args.requests))
+        with_limits.append(per_request_us(limited, args.requests))
+    base, lim = statistics.median(baseline), statistics.median(with_limits)
+    print(json.dumps({
+        "benchmark": "rate_limit", "case": "flask_request",
+        "requests": args.requests, "rounds": args.rounds,
+        "baseline_us": round(base, 2), "limited_us": round(lim, 2),
+        "overhead_us": round(lim - base, 2),
+        "overhead_pct": round((lim - base) / base * 100, 2),
+    }), flush=True)
+
+    backend = MemoryBackend()
+    with limited_app.test_request_context("/items/1", headers={"X-Forwarded-For": "203.0.113.7"}):
+        for name, fn in (
+            ("limiter_check", limiter.check),
+            ("memory_take", lambda: backend.take("bench:ip:203.0.113.7", 1e-9, 1.0)),
+        ):
+            print(json.dumps({
+                "benchmark": "rate_limit", "case": name, "calls": args.calls,
+                "ns_per_call": round(per_call_ns(fn, args.calls), 1),
+            }), flush=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,51 @@
+"""
+messaging-service wired to an in-process moto backend, for serving_load.py.
+
+Importing this module starts moto, seeds a Messages table and adds a fixed
+per-call delay to every DynamoDB request (BENCH_DYNAMODB_LATENCY_MS) so the
+blocking I/O of a real network round trip is represented. It exposes the
+service's Flask `app`, so it can be served exactly like production:
+
+    gunicorn --config common/gunicorn_conf.py --chdir benchmarks serving_app:app
+    python benchmarks/serving_app.py          # Flask development server
+
+Each gunicorn worker imports (and seeds) its own copy unless GUNICORN_PRELOAD=1.
+"""
+import os
+import random
+import sys
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(HERE)
+sys.path[:0] = [ROOT, os.path.join(ROOT, "messaging-service"), HERE]
+
+for name, value in {"AWS_ACCESS_KEY_ID": "bench", "AWS_SECRET_ACCESS_KEY": "bench",
+                    "AWS_REGION": "us-east-1", "AWS_DEFAULT_REGION": "us-east-1"}.items():
+    os.environ.setdefault(name, value)
+
+from moto import mock_aws  # noqa: E402
+
+_backend = mock_aws()
+_backend.start()
+
+import app as service  # noqa: E402
+from messages_query import create_messages_table, seed  # noqa: E402
+
+MESSAGES = int(os.environ.get("BENCH_MESSAGES", 2000))
+INBOX_SIZE = int(os.environ.get("BENCH_INBOX_SIZE", 100))
+LATENCY = float(os.environ.get("BENCH_DYNAMODB_LATENCY_MS", 10)) / 1000
+
+table = create_messages_table(service.dynamodb, service.MESSAGES_TABLE_NAME)
+users = seed(table, MESSAGES, INBOX_SIZE, random.Random(7))
+
+
+def _network_delay(**kwargs):
+    time.sleep(LATENCY)
+
+
+service.dynamodb.meta.client.meta.events.register("before-call.dynamodb", _network_delay)
+app = service.app
+
+if __name__ == "__main__":
+    app.run(host="127.0.0.1", port=int(os.environ.get("PORT", 5002)))
@@ -0,0 +1,190 @@
+"""
+Serving-mode load test: Flask development server vs. gunicorn.
+
+Starts messaging-service (via serving_app.py: moto backend, seeded Messages
+table, BENCH_DYNAMODB_LATENCY_MS of simulated network time per DynamoDB
+call) under each serving mode in turn, and drives it with --concurrency
+keep-alive clients calling `GET /messages?userId=...&limit=20`, which makes
+two GSI queries per request. Tokens are RS256, signed with a throwaway key
+whose JWKS is served to the service from a local file.
+
+For each mode it prints one JSON line with throughput, p50/p99 latency,
+errors, and how long a SIGTERM took to drain the server.
+
+    python benchmarks/serving_load.py
+    python benchmarks/serving_load.py --modes dev,gthread --concurrency 32 \
+        --workers 2 --threads 16 --latency-ms 10 --duration 20
+
+Modes:
+  dev      python app.py (Werkzeug development server, one process)
+  sync     gunicorn, --workers sync workers (one request per process)
+  gthread  gunicorn, --workers x --threads
+  preload  gthread with GUNICORN_PRELOAD=1
+
+To size a t3.medium pod (2 vCPU, 4 GiB), run it in a container limited to
+two CPUs (e.g. `docker run --cpus 2`) with --workers 2 and raise --threads
+until p99 starts to climb; the load generator itself needs spare CPU too.
+"""
+import argparse
+import http.client
+import json
+import os
+import random
+import signal
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import rsa
+from jose import jwk, jwt
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(HERE)
+REGION, POOL, CLIENT = "us-east-1", "bench-pool", "bench-client"
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+def make_identity(directory):
+    """Writes a JWKS file and returns (jwks_path, bearer_token)."""
+    key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    pem = key.private_bytes(serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8,
+                            serialization.NoEncryption()).decode("ascii")
+    public = jwk.construct(pem, "RS256").public_key().to_dict()
+    public.update(kid="bench", use="sig", alg="RS256")
+    path = os.path.join(directory, "jwks.json")
+    with open(path, "w") as f:
+        json.dump({"keys": [public]}, f)
+    token = jwt.encode({
+        "sub": "bench", "aud": CLIENT, "token_use": "id",
+        "iss": f"https://cognito-idp.{REGION}.amazonaws.com/{POOL}",
+        "exp": int(time.time()) + 3600,
+    }, pem, algorithm="RS256", headers={"kid": "bench"})
+    return path, token
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_server(mode, port, args, jwks_path):
+    env = dict(os.environ, PORT=str(port), COGNITO_JWKS_URL=jwks_path,
+               COGNITO_USER_POOL_ID=POOL, COGNITO_USER_POOL_CLIENT_ID=CLIENT, AWS_REGION=REGION,
+               BENCH_MESSAGES=str(args.messages), BENCH_INBOX_SIZE=str(args.inbox_size),
+               BENCH_DYNAMODB_LATENCY_MS=str(args.latency_ms), GUNICORN_ACCESS_LOG="",
+               GUNICORN_WORKERS=str(args.workers), GUNICORN_THREADS=str(args.threads))
+    if mode == "dev":
+        command = [sys.executable, os.path.join(HERE, "serving_app.py")]
+    else:
+        env["GUNICORN_WORKER_CLASS"] = "sync" if mode == "sync" else "gthread"
+        env["GUNICORN_PRELOAD"] = "1" if mode == "preload" else "0"
+        command = [sys.executable, "-m", "gunicorn", "--config", os.path.join(ROOT, "common", "gunicorn_conf.py"),
+                   "--chdir", HERE, "--bind", f"127.0.0.1:{port}", "serving_app:app"]
+    server = subprocess.Popen(command, cwd=ROOT, env=env,
+                              stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    deadline = time.monotonic() + args.startup_timeout
+    while time.monotonic() < deadline:
+        try:
+            conn = http.client.HTTPConnection("127.0.0.1", port, timeout=1)
+            conn.request("GET", "/health")
+            if conn.getresponse().status == 200:
+                return server
+        except OSError:
+            time.sleep(0.2)
+    server.kill()
+    raise RuntimeError(f"{mode} server did not become healthy")
+
+
+def drive(port, token, args):
+    users = [f"user{i}@example.com" for i in range(max(2, args.messages * 2 // args.inbox_size))]
+    headers = {"Authorization": f"Bearer {token}"}
+    latencies, errors, lock = [], [0], threading.Lock()
+    stop_at = time.monotonic() + args.duration
+
+    def client(seed):
+        rng = random.Random(seed)
+        conn = http.client.HTTPConnection("127.0.0.1", port, timeout=30)
+        local, failed = [], 0
+        while time.monotonic() < stop_at:
+            t0 = time.perf_counter()
+            try:
+                conn.request("GET", f"/messages?userId={rng.choice(users)}&limit=20", headers=headers)
+                response = conn.getresponse()
+                response.read()
+                ok = response.status == 200
+            except (OSError, http.client.HTTPException):
+                conn.close()
+                ok = False
+            if ok:
+                local.append((time.perf_counter() - t0) * 1000)
+            else:
+                failed += 1
+        with lock:
+            latencies.extend(local)
+            errors[0] += failed
+
+    threads = [threading.Thread(target=client, args=(i,)) for i in range(args.concurrency)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return latencies, errors[0]
+
+
+def run(mode, token, jwks_path, args):
+    port = free_port()
+    server = start_server(mode, port, args, jwks_path)
+    try:
+        latencies, errors = drive(port, token, args)
+    finally:
+        t0 = time.monotonic()
+        server.send_signal(signal.SIGTERM)
+        try:
+            server.wait(timeout=60)
+        except subprocess.TimeoutExpired:
+            server.kill()
+        shutdown = time.monotonic() - t0
+    print(json.dumps({
+        "benchmark": "serving_load", "mode": mode,
+        "workers": 1 if mode == "dev" else args.workers,
+        "threads": args.threads if mode in ("gthread", "preload") else 1,
+        "concurrency": args.concurrency, "latency_ms": args.latency_ms,
+        "requests": len(latencies), "errors": errors,
+        "rps": round(len(latencies) / args.duration, 1),
+        "p50_ms": round(statistics.median(latencies), 3) if latencies else None,
+        "p99_ms": round(percentile(latencies, 99), 3) if latencies else None,
+        "shutdown_s": round(shutdown, 2),
+    }), flush=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--modes", default="dev,sync,gthread,preload")
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--duration", type=float, default=10)
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--threads", type=int, default=16)
+    parser.add_argument("--latency-ms", type=float, default=10)
+    parser.add_argument("--messages", type=int, default=2000)
+    parser.add_argument("--inbox-size", type=int, default=100)
+    parser.add_argument("--startup-timeout", type=float, default=60)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        jwks_path, token = make_identity(directory)
+        for mode in args.modes.split(","):
+            run(mode, token, jwks_path, args)
+
+
+if __name__ == "__main__":
+    main()
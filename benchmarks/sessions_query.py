@@ -0,0 +1,153 @@
+"""
+GET /sessions read path: full-table scan vs. GSI query.
+
+Seeds a Sessions table with N sessions spread over customers and
+counsellors (about --per-customer sessions each customer), then times,
+for random users:
+
+  scan             the old single `scan()` + Python filter (one 1 MB page only)
+  scan_all         a complete paged scan + filter (what a correct scan would cost)
+  query_customer   all of a customer's sessions via customer_id-date_time-index
+  query_month      one customer's sessions within a 30-day from/to window
+  query_counsellor a counsellor's "booked" sessions (status filter on the partition)
+
+Runs in-process against moto by default, or against DynamoDB Local:
+
+    python benchmarks/sessions_query.py --sizes 10000
+    python benchmarks/sessions_query.py --sizes 10000,100000 --endpoint-url http://localhost:8000
+"""
+import argparse
+import contextlib
+import datetime
+import json
+import os
+import random
+import statistics
+import sys
+import time
+import uuid
+
+import boto3
+
+ROOT = os.path.join(os.path.dirname(__file__), "..")
+sys.path[:0] = [ROOT, os.path.join(ROOT, "messaging-service")]
+import sessions  # noqa: E402
+
+
+def create_sessions_table(dynamodb, name):
+    index = lambda name, key: {  # noqa: E731
+        "IndexName": name,
+        "KeySchema": [{"AttributeName": key, "KeyType": "HASH"},
+                      {"AttributeName": "date_time", "KeyType": "RANGE"}],
+        "Projection": {"ProjectionType": "ALL"},
+    }
+    table = dynamodb.create_table(
+        TableName=name,
+        BillingMode="PAY_PER_REQUEST",
+        AttributeDefinitions=[{"AttributeName": a, "AttributeType": "S"} for a in
+                              ("session_id", "customer_id", "counsellor_id", "date_time")],
+        KeySchema=[{"AttributeName": "session_id", "KeyType": "HASH"}],
+        GlobalSecondaryIndexes=[
+            index(sessions.CUSTOMER_INDEX, "customer_id"),
+            index(sessions.COUNSELLOR_INDEX, "counsellor_id"),
+        ],
+    )
+    table.wait_until_exists()
+    return table
+
+
+def seed(table, size, per_customer, rng):
+    customers = [f"customer{i}@example.com" for i in range(max(1, size // per_customer))]
+    counsellors = [f"counsellor{i}@example.com" for i in range(max(1, len(customers) // 10))]
+    start = datetime.date(2025, 1, 1)
+    with table.batch_writer() as batch:
+        for _ in range(size):
+            batch.put_item(Item={
+                "session_id": str(uuid.uuid4()),
+                "customer_id": rng.choice(customers),
+                "counsellor_id": rng.choice(counsellors),
+                "date_time": (start + datetime.timedelta(days=rng.randrange(365))).isoformat(),
+                "session_time": f"{rng.randrange(9, 17):02d}:00",
+                "status": rng.choice(["booked", "booked", "booked", "cancelled"]),
+            })
+    return customers, counsellors
+
+
+def scan_single_page(table, customer_id):
+    items = table.scan().get("Items", [])
+    return [s for s in items if s.get("customer_id") == customer_id]
+
+
+def scan_all(table, customer_id):
+    kwargs, found = {}, []
+    while True:
+        response = table.scan(**kwargs)
+        found.extend(s for s in response.get("Items", []) if s.get("customer_id") == customer_id)
+        if "LastEvaluatedKey" not in response:
+            return found
+        kwargs["ExclusiveStartKey"] = response["LastEvaluatedKey"]
+
+
+def query(table, **kwargs):
+    items, _ = sessions.query_sessions(table, **kwargs)
+    return list(items)
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+def run(dynamodb, size, args, rng):
+    table = create_sessions_table(dynamodb, f"BenchSessions{size}")
+    try:
+        customers, counsellors = seed(table, size, args.per_customer, rng)
+        methods = {
+            "scan": lambda: scan_single_page(table, rng.choice(customers)),
+            "scan_all": lambda: scan_all(table, rng.choice(customers)),
+            "query_customer": lambda: query(table, customer_id=rng.choice(customers)),
+            "query_month": lambda: query(table, customer_id=rng.choice(customers),
+                                         start="2025-06-01", end="2025-06-30"),
+            "query_counsellor": lambda: query(table, counsellor_id=rng.choice(counsellors),
+                                              status="booked"),
+        }
+        for method, fn in methods.items():
+            samples = []
+            for _ in range(args.iterations):
+                t0 = time.perf_counter()
+                fn()
+                samples.append((time.perf_counter() - t0) * 1000)
+            print(json.dumps({
+                "benchmark": "sessions_query", "size": size, "method": method,
+                "iterations": args.iterations,
+                "p50_ms": round(statistics.median(samples), 3),
+                "p99_ms": round(percentile(samples, 99), 3),
+            }), flush=True)
+    finally:
+        table.delete()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--sizes", default="10000", help="comma-separated session counts")
+    parser.add_argument("--per-customer", type=int, default=20)
+    parser.add_argument("--iterations", type=int, default=50)
+    parser.add_argument("--endpoint-url", default=None)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+    rng = random.Random(args.seed)
+
+    os.environ.setdefault("AWS_ACCESS_KEY_ID", "bench")
+    os.environ.setdefault("AWS_SECRET_ACCESS_KEY", "bench")
+    backend = contextlib.nullcontext()
+    if not args.endpoint_url:
+        from moto import mock_aws
+        backend = mock_aws()
+    with backend:
+        dynamodb = boto3.resource("dynamodb", region_name="us-east-1", endpoint_url=args.endpoint_url)
+        for size in (int(s) for s in args.sizes.split(",")):
+            run(dynamodb, size, args, rng)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,168 @@
+"""
+Cold start of each service with FAST_START=0 (everything built at import)
+and FAST_START=1 (lazy AWS clients, JWKS fetched in the background).
+
+Per service and mode:
+
+  import_ms    wall time of `import app` in a fresh interpreter
+  top_imports  the heaviest top-level imports from `python -X importtime`
+               (with FAST_START=1 the warm-up thread's imports interleave)
+  health_ms    gunicorn launch until GET /health answers 200
+  ready_ms     gunicorn launch until GET /ready answers 200 (JWKS loaded,
+               DynamoDB reachable)
+
+DynamoDB and the user pool come from a local moto server (see
+e2e_load.py). The JWKS is served from moto through a local endpoint that
+answers after --jwks-latency-ms, standing in for the round trip to
+Cognito that a new pod makes. Medians over --rounds launches are
+comparable between commits and modes.
+
+    python benchmarks/startup.py
+    python benchmarks/startup.py --rounds 5 --services messaging-service
+"""
+import argparse
+import http.client
+import http.server
+import json
+import os
+import re
+import statistics
+import subprocess
+import sys
+import threading
+import time
+import urllib.request
+
+import boto3
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(HERE)
+sys.path.insert(0, HERE)
+from e2e_load import REGION, SERVICES, create_tables, create_user_pool, start_moto  # noqa: E402
+from serving_load import free_port  # noqa: E402
+
+_IMPORTTIME_RE = re.compile(r"import time:\s+\d+ \|\s+(\d+) \| (\s*)(\S+)")
+
+
+def serve_jwks(jwks_url, latency):
+    """Serves the pool's JWKS on a local port after `latency` seconds. Returns its URL."""
+    with urllib.request.urlopen(jwks_url) as resp:
+        body = resp.read()
+
+    class Handler(http.server.BaseHTTPRequestHandler):
+        def do_GET(self):
+            time.sleep(latency)
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            try:
+                self.wfile.write(body)
+            except ConnectionError:
+                pass  # an import-only run exits without waiting for its JWKS
+
+        def log_message(self, *args):
+            pass
+
+    server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return f"http://127.0.0.1:{server.server_port}/.well-known/jwks.json"
+
+
+def service_env(moto_url, jwks_url, pool_id, client_id, fast_start):
+    return dict(os.environ, AWS_REGION=REGION, AWS_DEFAULT_REGION=REGION,
+                AWS_ACCESS_KEY_ID="bench", AWS_SECRET_ACCESS_KEY="bench",
+                DYNAMODB_ENDPOINT_URL=moto_url, COGNITO_ENDPOINT_URL=moto_url,
+                COGNITO_USER_POOL_ID=pool_id, COGNITO_USER_POOL_CLIENT_ID=client_id,
+                COGNITO_JWKS_URL=jwks_url,
+                GUNICORN_WORKERS="1", GUNICORN_ACCESS_LOG="", PYTHONPATH=ROOT,
+                FAST_START="1" if fast_start else "0")
+
+
+def measure_import(service, env):
+    code = "import time; t = time.perf_counter(); import app; print((time.perf_counter() - t) * 1000)"
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", code], cwd=os.path.join(ROOT, service),
+                            env=env, capture_output=True, text=True, check=True)
+    top = {}
+    for match in _IMPORTTIME_RE.finditer(result.stderr):
+        cumulative, indent, module = match.groups()
+        # Modules imported directly by app.py are one level (two spaces) deep.
+        if len(indent) == 2:
+            top[module] = int(cumulative) / 1000
+    heaviest = sorted(top.items(), key=lambda kv: -kv[1])[:5]
+    import_ms = float(result.stdout.strip().splitlines()[-1])
+    return import_ms, {module: round(ms, 1) for module, ms in heaviest}
+
+
+def status(port, path):
+    try:
+        conn = http.client.HTTPConnection("127.0.0.1", port, timeout=1)
+        conn.request("GET", path)
+        return conn.getresponse().status
+    except OSError:
+        return None
+
+
+def measure_launch(service, env, timeout):
+    port = free_port()
+    command = [sys.executable, "-m", "gunicorn", "--config", os.path.join(ROOT, "common", "gunicorn_conf.py"),
+               "--bind", f"127.0.0.1:{port}", "app:app"]
+    t0 = time.perf_counter()
+    process = subprocess.Popen(command, cwd=os.path.join(ROOT, service), env=dict(env, PORT=str(port)),
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    health_ms = ready_ms = None
+    try:
+        while ready_ms is None and time.perf_counter() - t0 < timeout:
+            if health_ms is None and status(port, "/health") == 200:
+                health_ms = (time.perf_counter() - t0) * 1000
+            if health_ms is not None and status(port, "/ready") == 200:
+                ready_ms = (time.perf_counter() - t0) * 1000
+            time.sleep(0.01)
+    finally:
+        process.terminate()
+        process.wait(timeout=30)
+    return health_ms, ready_ms
+
+
+def median(values):
+    values = [v for v in values if v is not None]
+    return round(statistics.median(values), 1) if values else None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rounds", type=int, default=3)
+    parser.add_argument("--services", default=",".join(SERVICES))
+    parser.add_argument("--jwks-latency-ms", type=float, default=150)
+    parser.add_argument("--startup-timeout", type=float, default=60)
+    args = parser.parse_args()
+
+    os.environ.setdefault("AWS_ACCESS_KEY_ID", "bench")
+    os.environ.setdefault("AWS_SECRET_ACCESS_KEY", "bench")
+    moto, moto_url = start_moto(args)
+    try:
+        create_tables(boto3.resource("dynamodb", region_name=REGION, endpoint_url=moto_url))
+        pool_id, client_id = create_user_pool(
+            boto3.client("cognito-idp", region_name=REGION, endpoint_url=moto_url))
+        jwks_url = serve_jwks(f"{moto_url}/{pool_id}/.well-known/jwks.json", args.jwks_latency_ms / 1000)
+        for service in args.services.split(","):
+            for fast_start in (False, True):
+                env = service_env(moto_url, jwks_url, pool_id, client_id, fast_start)
+                imports, launches, top = [], [], {}
+                for _ in range(args.rounds):
+                    import_ms, top = measure_import(service, env)
+                    imports.append(import_ms)
+                    launches.append(measure_launch(service, env, args.startup_timeout))
+                print(json.dumps({
+                    "benchmark": "startup", "service": service, "fast_start": fast_start,
+                    "import_ms": median(imports), "top_imports": top,
+                    "health_ms": median(h for h, _ in launches),
+                    "ready_ms": median(r for _, r in launches),
+                }), flush=True)
+    finally:
+        moto.terminate()
+        moto.wait(timeout=30)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+"""
+Full-history export: buffered jsonify vs. streamed JSON.
+
+Seeds a Messages table (moto, or DynamoDB Local) with N messages between two users and
+exports one user's whole inbox the way GET /messages does without
+limit/cursor:
+
+  buffered   jsonify(list(items)) over 1 MB query pages, the previous path
+  stream     common.http.stream_json(items) over --page-size item pages
+  ndjson     the same with ?format=ndjson
+
+Each mode runs in its own process, after seeding, and reports the time to
+first byte, the total time and how much the process RSS high-water mark
+grew, then repeats the export under tracemalloc for the peak of Python
+allocations. moto re-reads the whole index on every Query call, so its
+timings favour few large pages; use DynamoDB Local for realistic ones:
+
+    python benchmarks/streaming_export.py --sizes 2000,10000
+    python benchmarks/streaming_export.py --sizes 100000 --endpoint-url http://localhost:8000
+"""
+import argparse
+import contextlib
+import json
+import os
+import random
+import resource
+import subprocess
+import sys
+import time
+import tracemalloc
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+def export(mode, size, page_size, endpoint_url):
+    import boto3
+    from flask import Flask, jsonify
+    if not endpoint_url:
+        from moto import mock_aws
+
+    sys.path.insert(0, HERE)
+    from messages_query import create_messages_table, seed
+    import messages
+    from common.http import stream_json
+
+    backend = contextlib.nullcontext() if endpoint_url else mock_aws()
+    with backend:
+        dynamodb = boto3.resource("dynamodb", region_name="us-east-1", endpoint_url=endpoint_url)
+        table = create_messages_table(dynamodb, f"BenchExport{mode}{size}")
+        user = seed(table, size, size * 2, random.Random(7))[0]
+        app = Flask(__name__)
+        query = "format=ndjson" if mode == "ndjson" else ""
+
+        def run():
+            with app.test_request_context(f"/messages?{query}"):
+                t0 = time.perf_counter()
+                if mode == "buffered":
+                    response = jsonify(list(messages.iter_user_messages(table, user)))
+                else:
+                    response = stream_json(messages.iter_user_messages(table, user, page_size=page_size))
+                body, first_byte = 0, None
+                for chunk in response.iter_encoded():
+                    first_byte = first_byte or time.perf_counter()
+                    body += len(chunk)
+                response.close()
+                return body, first_byte - t0, time.perf_counter() - t0
+
+        try:
+            rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+            body, ttfb, total = run()
+            rss_after = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+            tracemalloc.start()
+            run()
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+        finally:
+            table.delete()
+
+    return {
+        "benchmark": "streaming_export", "mode": mode, "size": size, "body_bytes": body,
+        "ttfb_ms": round(ttfb * 1000, 1), "total_ms": round(total * 1000, 1),
+        "peak_alloc_mb": round(peak / 2 ** 20, 2),
+        "rss_growth_mb": round((rss_after - rss_before) / 1024, 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--sizes", default="2000", help="comma-separated message counts")
+    parser.add_argument("--page-size", type=int, default=500, help="items per page when streaming")
+    parser.add_argument("--endpoint-url", default=None)
+    parser.add_argument("--mode", help=argparse.SUPPRESS)
+    parser.add_argument("--size", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    os.environ.setdefault("AWS_ACCESS_KEY_ID", "bench")
+    os.environ.setdefault("AWS_SECRET_ACCESS_KEY", "bench")
+    if args.mode:
+        root = os.path.dirname(HERE)
+        sys.path[:0] = [root, os.path.join(root, "messaging-service")]
+        print(json.dumps(export(args.mode, args.size, args.page_size, args.endpoint_url)), flush=True)
+        return
+
+    # One process per run, so the RSS high-water mark belongs to that mode alone.
+    for size in (int(s) for s in args.sizes.split(",")):
+        for mode in ("buffered", "stream", "ndjson"):
+            command = [sys.executable, __file__, "--mode", mode, "--size", str(size),
+                       "--page-size", str(args.page_size)]
+            if args.endpoint_url:
+                command += ["--endpoint-url", args.endpoint_url]
+            subprocess.run(command, check=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""
+POST /messages latency under a burst: synchronous put_item vs. write-behind.
+
+Runs messaging-service in-process (serving_app.py: moto plus a fixed
+per-call DynamoDB delay) once per MESSAGE_WRITE_MODE, in separate
+processes, and sends --messages messages from --clients threads at once.
+Reports request p50/p99, the DynamoDB write calls made, and for
+write-behind how long the queue took to drain after the burst.
+
+    python benchmarks/write_behind.py
+    BENCH_DYNAMODB_LATENCY_MS=20 python benchmarks/write_behind.py --messages 2000 --clients 32
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, HERE)
+from serving_load import CLIENT, POOL, REGION, make_identity, percentile  # noqa: E402
+
+
+def burst(mode, args):
+    jwks_path, token = make_identity(tempfile.mkdtemp())
+    os.environ.update(COGNITO_JWKS_URL=jwks_path, COGNITO_USER_POOL_ID=POOL,
+                      COGNITO_USER_POOL_CLIENT_ID=CLIENT, AWS_REGION=REGION,
+                      MESSAGE_WRITE_MODE=mode, BENCH_MESSAGES="0", RATE_LIMIT_ENABLED="0")
+    import serving_app
+
+    service = serving_app.service
+    writes = []
+    service.dynamodb.meta.client.meta.events.register(
+        "before-call.dynamodb.PutItem", lambda **kwargs: writes.append(1))
+    service.dynamodb.meta.client.meta.events.register(
+        "before-call.dynamodb.BatchWriteItem", lambda **kwargs: writes.append(1))
+
+    headers = {"Authorization": f"Bearer {token}"}
+    per_client = args.messages // args.clients
+    latencies, statuses = [], []
+    start = threading.Barrier(args.clients)
+
+    def client(n):
+        http = service.app.test_client()
+        start.wait()
+        for i in range(per_client):
+            body = {"sender_id": f"user{n}@example.com", "receiver_id": f"user{n + 1}@example.com",
+                    "content": f"burst {i}"}
+            t0 = time.perf_counter()
+            response = http.post("/messages", json=body, headers=headers)
+            latencies.append((time.perf_counter() - t0) * 1000)
+            statuses.append(response.status_code)
+
+    threads = [threading.Thread(target=client, args=(n,)) for n in range(args.clients)]
+    t0 = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    burst_s = time.perf_counter() - t0
+    drained_s = None
+    if service.message_writer is not None:
+        service.message_writer.drain()
+        drained_s = round(time.perf_counter() - t0, 3)
+
+    return {
+        "benchmark": "write_behind", "mode": mode, "messages": len(latencies),
+        "clients": args.clients, "statuses": {str(s): statuses.count(s) for s in set(statuses)},
+        "p50_ms": round(percentile(latencies, 50), 2), "p99_ms": round(percentile(latencies, 99), 2),
+        "burst_s": round(burst_s, 3), "stored_after_s": drained_s or round(burst_s, 3),
+        "dynamodb_writes": len(writes),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--messages", type=int, default=800)
+    parser.add_argument("--clients", type=int, default=16)
+    parser.add_argument("--mode", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.mode:
+        print(json.dumps(burst(args.mode, args)), flush=True)
+        return
+    for mode in ("sync", "write-behind"):
+        subprocess.run([sys.executable, __file__, "--mode", mode, "--messages", str(args.messages),
+                        "--clients", str(args.clients)], check=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,5 @@
 // src/pages/MessagesPage.js
-import React, { useState, useEffect, useContext } from "react";
+import React, { useState, useEffect, useContext, useRef } from "react";
 import messagingService from "../services/messagingService";
 import counsellorService from "../services/counsellorService";
 import { AuthContext } from "../AuthContext";
@@ -17,12 +17,32 @@ function MessagesPage() {
   const [newConvReceiver, setNewConvReceiver] = useState("");
   const [availableCounsellors, setAvailableCounsellors] = useState([]);
 
+  // Timestamp of the newest message we have; new messages are fetched after it.
+  const sinceRef = useRef(null);
+
+  // Add messages we have not seen yet and advance the sync position. Delta
+  // reads repeat the last few seconds before `since`, so duplicates are normal.
+  const mergeMessages = (incoming) => {
+    if (!incoming.length) return;
+    incoming.forEach((msg) => {
+      if (!sinceRef.current || msg.timestamp > sinceRef.current) {
+        sinceRef.current = msg.timestamp;
+      }
+    });
+    setAllMessages((prev) => {
+      const seen = new Set(prev.map((msg) => msg.message_id));
+      return [...prev, ...incoming.filter((msg) => !seen.has(msg.message_id))];
+    });
+  };
+
   // Fetch all messages for the logged-in user
   const fetchMessages = async () => {
     try {
       // Assuming userInfo.email is used as the unique identifier.
       const data = await messagingService.getMessages(token, userInfo.email);
-      setAllMessages(data);
+      mergeMessages(data);
+      // An empty inbox still needs a starting point for the sync below.
+      if (!sinceRef.current) sinceRef.current = "1970-01-01T00:00:00Z";
     } catch (err) {
       setError(err.response?.data?.error || err.message);
     }
@@ -61,6 +81,35 @@ function MessagesPage() {
     fetchCounsellors();
   }, [token]);
 
+  // Long-poll for new messages instead of re-downloading the whole history.
+  useEffect(() => {
+    let active = true;
+    const poll = async () => {
+      while (active) {
+        try {
+          if (!sinceRef.current) {
+            await new Promise((resolve) => setTimeout(resolve, 2000));
+            continue;
+          }
+          const data = await messagingService.getMessagesSince(
+            token, userInfo.email, sinceRef.current, 20
+          );
+          if (active) mergeMessages(data.items);
+          // The server had no room to hold the poll open; back off as told.
+          if (data.retry_after) {
+            await new Promise((resolve) => setTimeout(resolve, data.retry_after * 1000));
+          }
+        } catch (err) {
+          await new Promise((resolve) => setTimeout(resolve, 5000));
+        }
+      }
+    };
+    poll();
+    return () => {
+      active = false;
+    };
+  }, [token]);
+
   useEffect(() => {
     if (allMessages.length) {
       const convs = groupMessages(allMessages);
@@ -81,7 +130,10 @@ function MessagesPage() {
         content: newMessage,
       });
       setNewMessage("");
-      await fetchMessages();
+      const data = await messagingService.getMessagesSince(
+        token, userInfo.email, sinceRef.current || "1970-01-01T00:00:00Z"
+      );
+      mergeMessages(data.items);
     } catch (err) {
       setError(err.response?.data?.error || err.message);
     }
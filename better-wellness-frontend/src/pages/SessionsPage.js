@@ -13,6 +13,8 @@ function SessionsPage() {
   const [selectedTime, setSelectedTime] = useState("");
   const [error, setError] = useState("");
   const [rescheduleData, setRescheduleData] = useState({}); // { session_id, newDate, newTime }
+  const [availableTimes, setAvailableTimes] = useState([]);
+  const [rescheduleTimes, setRescheduleTimes] = useState([]);
 
   // Helper function to capitalize a status string
   const capitalizeStatus = (status) => {
@@ -41,11 +43,34 @@ function SessionsPage() {
     }
   };
 
+  // Free slot start times (HH:MM) of a counsellor on one date
+  const fetchAvailableTimes = async (counsellorId, date) => {
+    if (!counsellorId || !date) return [];
+    try {
+      const data = await messagingService.getAvailability(token, counsellorId, date);
+      return data.days[0]?.available || [];
+    } catch (err) {
+      setError(err.response?.data?.error || err.message);
+      return [];
+    }
+  };
+
   useEffect(() => {
     fetchSessions();
     fetchCounsellors();
   }, [token]);
 
+  // Sessions can only be booked into free slots, so offer just those.
+  useEffect(() => {
+    setSelectedTime("");
+    fetchAvailableTimes(selectedCounsellor, selectedDate).then(setAvailableTimes);
+  }, [token, selectedCounsellor, selectedDate]);
+
+  useEffect(() => {
+    const session = sessions.find((s) => s.session_id === rescheduleData.session_id);
+    fetchAvailableTimes(session?.counsellor_id, rescheduleData.newDate).then(setRescheduleTimes);
+  }, [token, rescheduleData.session_id, rescheduleData.newDate]);
+
   // Book a new session using the selected counsellor, date, and time.
   const handleBookSession = async () => {
     setError("");
@@ -88,7 +113,7 @@ function SessionsPage() {
     setRescheduleData({
       session_id: session.session_id,
       newDate: session.date_time,
-      newTime: session.session_time
+      newTime: ""
     });
   };
 
@@ -96,7 +121,7 @@ function SessionsPage() {
   const handleRescheduleSession = async () => {
     const { session_id, newDate, newTime } = rescheduleData;
     if (!newDate || !newTime) {
-      setError("Please provide both new date and time for rescheduling.");
+      setError("Please pick a new date and a free time for rescheduling.");
       return;
     }
     setError("");
@@ -133,7 +158,14 @@ function SessionsPage() {
       </div>
       <div>
         <label>Select Time:</label>
-        <input type="time" value={selectedTime} onChange={(e) => setSelectedTime(e.target.value)} />
+        <select value={selectedTime} onChange={(e) => setSelectedTime(e.target.value)}>
+          <option value="">
+            {selectedCounsellor && selectedDate && !availableTimes.length ? "-- No free slots --" : "-- Select --"}
+          </option>
+          {availableTimes.map((t) => (
+            <option key={t} value={t}>{t}</option>
+          ))}
+        </select>
       </div>
       <button onClick={handleBookSession}>Book Session</button>
 
@@ -171,17 +203,21 @@ function SessionsPage() {
                     type="date"
                     value={rescheduleData.newDate}
                     onChange={(e) =>
-                      setRescheduleData({ ...rescheduleData, newDate: e.target.value })
+                      setRescheduleData({ ...rescheduleData, newDate: e.target.value, newTime: "" })
                     }
                   />
                   <label>New Time:</label>
-                  <input
-                    type="time"
+                  <select
                     value={rescheduleData.newTime}
                     onChange={(e) =>
                       setRescheduleData({ ...rescheduleData, newTime: e.target.value })
                     }
-                  />
+                  >
+                    <option value="">-- Select --</option>
+                    {rescheduleTimes.map((t) => (
+                      <option key={t} value={t}>{t}</option>
+                    ))}
+                  </select>
                   <button onClick={handleRescheduleSession}>Update</button>
                   <button onClick={() => setRescheduleData({})} style={{ marginLeft: "1rem" }}>
                     Cancel
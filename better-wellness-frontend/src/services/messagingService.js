@@ -18,6 +18,52 @@ const getMessages = async (token, userId) => {
   return res.data;
 };
 
+// Only messages newer than `since`; with wait > 0 the server long-polls.
+const getMessagesSince = async (token, userId, since, wait = 0) => {
+  const res = await axios.get(`${BASE_URL}/messages`, {
+    headers: { Authorization: `Bearer ${token}` },
+    params: { userId, since, wait },
+  });
+  return res.data;
+};
+
+// Up to a few hundred messages in one request; per-item results come back in `results`.
+const createMessages = async (token, messages) => {
+  const res = await axios.post(`${BASE_URL}/messages/batch`, { messages }, {
+    headers: { Authorization: `Bearer ${token}` },
+    validateStatus: (status) => status === 201 || status === 207,
+  });
+  return res.data;
+};
+
+// Newest `limit` messages of each conversation between userId and peerIds.
+const getConversationsMessages = async (token, userId, peerIds, limit, cursors) => {
+  const res = await axios.post(`${BASE_URL}/messages/batch-get`, {
+    user_id: userId, peer_ids: peerIds, limit, cursors,
+  }, {
+    headers: { Authorization: `Bearer ${token}` },
+  });
+  return res.data;
+};
+
+// Inbox: one summary per conversation (last message, unread count), newest first.
+const getConversations = async (token, userId, limit, cursor) => {
+  const res = await axios.get(`${BASE_URL}/conversations`, {
+    headers: { Authorization: `Bearer ${token}` },
+    params: { userId, limit, cursor },
+  });
+  return res.data;
+};
+
+const markConversationRead = async (token, conversationId, userId) => {
+  const res = await axios.post(
+    `${BASE_URL}/conversations/${encodeURIComponent(conversationId)}/read`,
+    { user_id: userId },
+    { headers: { Authorization: `Bearer ${token}` } },
+  );
+  return res.data;
+};
+
 const bookSession = async (token, sessionData) => {
   const res = await axios.post(`${BASE_URL}/sessions`, sessionData, {
     headers: { Authorization: `Bearer ${token}` },
@@ -40,10 +86,25 @@ const updateSession = async (token, sessionId, updateData) => {
   return res.data;
 };
 
+// Free and booked slots per day; `to` defaults to `from` (both YYYY-MM-DD).
+const getAvailability = async (token, counsellorId, from, to) => {
+  const res = await axios.get(`${BASE_URL}/counsellors/${encodeURIComponent(counsellorId)}/availability`, {
+    headers: { Authorization: `Bearer ${token}` },
+    params: { from, to },
+  });
+  return res.data;
+};
+
 export default {
   createMessage,
   getMessages,
+  getMessagesSince,
+  createMessages,
+  getConversationsMessages,
+  getConversations,
+  markConversationRead,
   bookSession,
   getSessions,
   updateSession,
+  getAvailability,
 };
@@ -12,7 +12,7 @@ $CLIENT_ID  = "3h7k0et1t79tf6ah34bh35givr"                  # your Cognito App C
 $AMPLIFY_DOMAIN = "betterhealthservices.42web.io"
 
 # 2) Static arrays of the resources we created:
-$TABLES     = @("Users","Messages","Sessions")
+$TABLES     = @("Users","Messages","Sessions","SessionSlots","Conversations","RateLimits")
 $REPOS      = @("user-service","messaging-service","counsellor-service")
 
 # -------------------------------------------------------------------------------------------------
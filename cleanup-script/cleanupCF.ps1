@@ -32,7 +32,7 @@ foreach ($r in $repos) {
 #----------------------------
 # 3) Delete DynamoDB tables
 #----------------------------
-$tables = @("Users","Messages","Sessions")
+$tables = @("Users","Messages","Sessions","SessionSlots","Conversations","RateLimits")
 foreach ($t in $tables) {
   Write-Host "Deleting DynamoDB table $t…” -ForegroundColor Cyan
   aws dynamodb delete-table `
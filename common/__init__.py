@@ -0,0 +1 @@
+"""Code shared by the user, counsellor and messaging services."""
@@ -0,0 +1,79 @@
+import datetime
+import hashlib
+import time
+
+from jose import jwt
+from jose.utils import base64url_decode
+
+from common import metrics
+from common.cache import TTLCache
+from common.jwks import JWKSManager
+
+VERIFY_DURATION = metrics.histogram(
+    "token_verification_seconds",
+    "Bearer token verification time; outcome is cached, verified or rejected",
+    ["outcome"]
+)
+
+
+# ----------------------------------------------------------------
+#  Cognito token verification
+# ----------------------------------------------------------------
+class CognitoTokenVerifier:
+    """
+    Verifies Cognito-issued JWTs against the user pool's JWKS.
+
+    Successfully verified tokens are remembered (by SHA-256 digest) together
+    with their claims until the token's own `exp`, so a repeated bearer token
+    skips the RSA signature check. Public keys come from a JWKSManager, which
+    constructs each key once per `kid` and refreshes them in the background.
+    """
+
+    def __init__(self, region, user_pool_id, client_id, cache_size=1024, jwks_url=None):
+        self.client_id = client_id
+        self.issuer = f"https://cognito-idp.{region}.amazonaws.com/{user_pool_id}"
+        self.jwks = JWKSManager(jwks_url or f"{self.issuer}/.well-known/jwks.json")
+        self._claims_cache = TTLCache(maxsize=cache_size, name="token_claims")
+
+    def verify(self, token):
+        """
+        Verifies the JWT signature and its exp/aud/iss claims.
+        Returns the claims, or raises an exception if verification fails.
+        """
+        start = time.perf_counter()
+        digest = hashlib.sha256(token.encode("utf-8")).digest()
+        claims = self._claims_cache.get(digest)
+        if claims is not None:
+            VERIFY_DURATION.observe(time.perf_counter() - start, outcome="cached")
+            return claims
+        try:
+            claims = self._verify(token, digest)
+        except Exception:
+            VERIFY_DURATION.observe(time.perf_counter() - start, outcome="rejected")
+            raise
+        VERIFY_DURATION.observe(time.perf_counter() - start, outcome="verified")
+        return claims
+
+    def _verify(self, token, digest):
+        headers = jwt.get_unverified_header(token)
+        public_key = self.jwks.get_key(headers.get("kid"))
+        if public_key is None:
+            raise ValueError("Public key not found in JWKS")
+
+        message, encoded_signature = token.rsplit(".", 1)
+        decoded_signature = base64url_decode(encoded_signature.encode("utf-8"))
+        if not public_key.verify(message.encode("utf8"), decoded_signature):
+            raise ValueError("Signature verification failed")
+
+        claims = jwt.get_unverified_claims(token)
+        if claims["exp"] < datetime.datetime.utcnow().timestamp():
+            raise ValueError("Token is expired")
+        if "aud" not in claims:
+            raise ValueError("Token does not contain an 'aud' claim")
+        if claims["aud"] != self.client_id:
+            raise ValueError("Token was not issued for this audience")
+        if claims.get("iss") != self.issuer:
+            raise ValueError("Token issuer mismatch")
+
+        self._claims_cache.set(digest, claims, claims["exp"])
+        return claims
@@ -0,0 +1,258 @@
+"""
+Shared boto3 client/resource factory.
+
+Every client gets the same tuned botocore Config and per-call metrics:
+
+  AWS_MAX_POOL_CONNECTIONS  HTTP connections per client; defaults to the
+                            gunicorn thread count plus headroom for
+                            background threads, so request threads never
+                            queue for a connection
+  AWS_CONNECT_TIMEOUT       seconds (default 2)
+  AWS_READ_TIMEOUT          seconds (default 5)
+  AWS_MAX_ATTEMPTS          total attempts including retries (default 4)
+  AWS_RETRY_MODE            adaptive (default), standard or legacy. Adaptive
+                            adds jittered backoff and client-side rate limiting,
+                            so a throttling spike slows callers down instead of
+                            piling retries onto the service
+  AWS_TCP_KEEPALIVE         1 (default) to enable TCP keep-alive on pooled sockets
+  DYNAMODB_RETURN_CONSUMED_CAPACITY
+                            TOTAL (default), INDEXES or NONE; requested on every
+                            DynamoDB call that supports it
+  DYNAMODB_ENDPOINT_URL,    optional endpoint overrides, e.g. DynamoDB Local
+  COGNITO_ENDPOINT_URL      or a moto server
+
+Each API call is timed end to end (retries included) into
+aws_call_duration_seconds{service, operation, table, status}, and retries
+are counted in aws_call_retries_total. DynamoDB capacity units reported
+by each call are added to dynamodb_consumed_capacity_units_total, and to
+the current thread's capacity_meter() if one is open.
+
+With lifecycle.FAST_START, client() and resource() return lazy proxies
+that build the boto3 object (loading botocore's service model) on first
+attribute access, and resource().Table() is lazy too; warm() builds them
+ahead of traffic, e.g. from a readiness check.
+"""
+import contextlib
+import os
+import threading
+import time
+
+import boto3
+from botocore.config import Config
+
+from common import lifecycle, metrics
+
+AWS_REGION = os.environ.get('AWS_REGION', 'us-east-1')
+AWS_MAX_POOL_CONNECTIONS = int(os.environ.get(
+    'AWS_MAX_POOL_CONNECTIONS', max(10, int(os.environ.get('GUNICORN_THREADS', 8)) + 4)
+))
+AWS_CONNECT_TIMEOUT = float(os.environ.get('AWS_CONNECT_TIMEOUT', 2))
+AWS_READ_TIMEOUT = float(os.environ.get('AWS_READ_TIMEOUT', 5))
+AWS_MAX_ATTEMPTS = int(os.environ.get('AWS_MAX_ATTEMPTS', 4))
+AWS_RETRY_MODE = os.environ.get('AWS_RETRY_MODE', 'adaptive')
+AWS_TCP_KEEPALIVE = os.environ.get('AWS_TCP_KEEPALIVE', '1') == '1'
+DYNAMODB_RETURN_CONSUMED_CAPACITY = os.environ.get('DYNAMODB_RETURN_CONSUMED_CAPACITY', 'TOTAL')
+
+ENDPOINT_URLS = {
+    "dynamodb": os.environ.get('DYNAMODB_ENDPOINT_URL'),
+    "cognito-idp": os.environ.get('COGNITO_ENDPOINT_URL'),
+}
+
+CALL_DURATION = metrics.histogram(
+    "aws_call_duration_seconds",
+    "AWS API call latency including retries",
+    ["service", "operation", "table", "status"]
+)
+CALL_RETRIES = metrics.counter(
+    "aws_call_retries_total",
+    "Retries (throttling, 5xx, connection errors) taken by calls that got a response",
+    ["service", "operation"]
+)
+CONSUMED_CAPACITY = metrics.counter(
+    "dynamodb_consumed_capacity_units_total",
+    "DynamoDB capacity units consumed, as reported by ReturnConsumedCapacity",
+    ["operation", "table"]
+)
+
+_CONTEXT_KEY = "bw_call_started"
+_meter = threading.local()
+
+
+def client_config(**overrides):
+    settings = dict(
+        max_pool_connections=AWS_MAX_POOL_CONNECTIONS,
+        connect_timeout=AWS_CONNECT_TIMEOUT,
+        read_timeout=AWS_READ_TIMEOUT,
+        retries={"mode": AWS_RETRY_MODE, "total_max_attempts": AWS_MAX_ATTEMPTS},
+        tcp_keepalive=AWS_TCP_KEEPALIVE,
+    )
+    settings.update(overrides)
+    return Config(**settings)
+
+
+# ----------------------------------------------------------------
+#  Per-call timing (botocore event hooks)
+# ----------------------------------------------------------------
+def _table_of(params):
+    if "TableName" in params:
+        return params["TableName"]
+    # Batch calls name their tables in RequestItems.
+    return ",".join(sorted(params.get("RequestItems", ())))
+
+
+def _start_timer(params, context, **kwargs):
+    context[_CONTEXT_KEY] = (time.perf_counter(), _table_of(params))
+
+
+def _request_capacity(params, model, **kwargs):
+    if "ReturnConsumedCapacity" in model.input_shape.members:
+        params.setdefault("ReturnConsumedCapacity", DYNAMODB_RETURN_CONSUMED_CAPACITY)
+
+
+def _record_capacity(operation, consumed):
+    # A dict for single-table calls, a list of dicts for batch/transact calls.
+    for entry in consumed if isinstance(consumed, list) else [consumed]:
+        units = entry.get("CapacityUnits")
+        if units:
+            CONSUMED_CAPACITY.inc(units, operation=operation, table=entry.get("TableName", ""))
+            usage = getattr(_meter, "usage", None)
+            if usage is not None:
+                usage.units += units
+
+
+class CapacityUsage:
+    __slots__ = ("units",)
+
+    def __init__(self):
+        self.units = 0.0
+
+
+@contextlib.contextmanager
+def capacity_meter():
+    """
+    Sums the DynamoDB capacity units reported to this thread's calls inside
+    the block. Yields a CapacityUsage; meters nest, outer ones include inner.
+    """
+    usage, previous = CapacityUsage(), getattr(_meter, "usage", None)
+    _meter.usage = usage
+    try:
+        yield usage
+    finally:
+        _meter.usage = previous
+        if previous is not None:
+            previous.units += usage.units
+
+
+def _observe(service, model, context, status):
+    started = context.pop(_CONTEXT_KEY, None)
+    if started is None:
+        return
+    start, table = started
+    CALL_DURATION.observe(time.perf_counter() - start, service=service,
+                          operation=model.name, table=table, status=status)
+
+
+def _after_call(parsed, model, context, **kwargs):
+    service = model.service_model.service_id.hyphenize()
+    error = parsed.get("Error", {}).get("Code")
+    meta = parsed.get("ResponseMetadata", {})
+    retries = meta.get("RetryAttempts", 0)
+    if retries:
+        CALL_RETRIES.inc(retries, service=service, operation=model.name)
+    if "ConsumedCapacity" in parsed:
+        _record_capacity(model.name, parsed["ConsumedCapacity"])
+    _observe(service, model, context, error or str(meta.get("HTTPStatusCode", "")))
+
+
+def _after_call_error(exception, context, event_name, **kwargs):
+    # event_name is after-call-error.<service>.<operation>; no model is passed.
+    _, service, operation = event_name.split(".", 2)
+    started = context.pop(_CONTEXT_KEY, None)
+    if started is not None:
+        CALL_DURATION.observe(time.perf_counter() - started[0], service=service,
+                              operation=operation, table=started[1],
+                              status=type(exception).__name__)
+
+
+def instrument(client):
+    """Registers the timing hooks on a botocore client. Returns the client."""
+    events = client.meta.events
+    events.register("before-parameter-build", _start_timer)
+    events.register("after-call", _after_call)
+    events.register("after-call-error", _after_call_error)
+    if DYNAMODB_RETURN_CONSUMED_CAPACITY != "NONE":
+        events.register("before-parameter-build.dynamodb", _request_capacity)
+    return client
+
+
+# ----------------------------------------------------------------
+#  Lazy construction
+# ----------------------------------------------------------------
+class Lazy:
+    """Builds the wrapped object on first attribute access, once, thread-safely."""
+
+    __slots__ = ("_factory", "_value", "_lock")
+
+    def __init__(self, factory):
+        self._factory = factory
+        self._value = None
+        self._lock = threading.Lock()
+
+    def _build(self):
+        value = self._value
+        if value is None:
+            with self._lock:
+                if self._value is None:
+                    self._value = self._factory()
+                value = self._value
+        return value
+
+    def __getattr__(self, name):
+        return getattr(self._build(), name)
+
+
+class LazyResource(Lazy):
+    __slots__ = ()
+
+    def Table(self, name):
+        return Lazy(lambda: self._build().Table(name))
+
+
+def warm(*objects):
+    """Builds any lazy clients, resources or tables among `objects`."""
+    for obj in objects:
+        if isinstance(obj, Lazy):
+            obj._build()
+
+
+# ----------------------------------------------------------------
+#  Factory
+# ----------------------------------------------------------------
+def _client(service_name, region_name, overrides):
+    return instrument(boto3.client(
+        service_name, region_name=region_name,
+        endpoint_url=ENDPOINT_URLS.get(service_name),
+        config=client_config(**overrides)
+    ))
+
+
+def _resource(service_name, region_name, overrides):
+    res = boto3.resource(
+        service_name, region_name=region_name,
+        endpoint_url=ENDPOINT_URLS.get(service_name),
+        config=client_config(**overrides)
+    )
+    instrument(res.meta.client)
+    return res
+
+
+def client(service_name, region_name=AWS_REGION, **overrides):
+    if lifecycle.FAST_START:
+        return Lazy(lambda: _client(service_name, region_name, overrides))
+    return _client(service_name, region_name, overrides)
+
+
+def resource(service_name, region_name=AWS_REGION, **overrides):
+    if lifecycle.FAST_START:
+        return LazyResource(lambda: _resource(service_name, region_name, overrides))
+    return _resource(service_name, region_name, overrides)
@@ -0,0 +1,66 @@
+import threading
+import time
+from collections import OrderedDict
+
+from common import metrics
+
+CACHE_REQUESTS = metrics.counter(
+    "cache_requests_total", "In-process cache lookups by outcome", ["cache", "result"]
+)
+
+# ----------------------------------------------------------------
+#  Bounded LRU cache with per-entry expiry
+# ----------------------------------------------------------------
+class TTLCache:
+    """
+    Thread-safe LRU cache where every entry carries its own absolute
+    expiry time (epoch seconds). Expired entries are dropped on read,
+    and the least recently used entry is evicted once maxsize is reached.
+    A `name` reports hits and misses in cache_requests_total.
+    """
+
+    def __init__(self, maxsize=1024, clock=time.time, name=None):
+        self.maxsize = maxsize
+        self.name = name
+        self._clock = clock
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        value = self._get(key, default)
+        if self.name is not None:
+            CACHE_REQUESTS.inc(cache=self.name, result="miss" if value is default else "hit")
+        return value
+
+    def _get(self, key, default):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return default
+            value, expires_at = entry
+            if expires_at <= self._clock():
+                del self._data[key]
+                return default
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value, expires_at):
+        if expires_at <= self._clock():
+            return
+        with self._lock:
+            self._data[key] = (value, expires_at)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def pop(self, key, default=None):
+        with self._lock:
+            entry = self._data.pop(key, None)
+        return default if entry is None else entry[0]
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
@@ -0,0 +1,165 @@
+import hashlib
+import json
+import os
+import threading
+import time
+
+from boto3.dynamodb.conditions import Key
+
+from common.cache import CACHE_REQUESTS
+from common.pagination import iter_items, page_after
+from common.singleflight import SingleFlight
+
+PROFILE_TYPE_INDEX = os.environ.get('USERS_PROFILE_TYPE_INDEX', 'profile_type-created_at-index')
+DIRECTORY_TTL = float(os.environ.get('COUNSELLOR_CACHE_TTL', 60))
+DIRECTORY_STALE_TTL = float(os.environ.get('COUNSELLOR_CACHE_STALE_TTL', 300))
+# How often to query the GSI for counsellors registered since the last load (0 = never).
+DIRECTORY_DELTA_INTERVAL = float(os.environ.get('COUNSELLOR_DELTA_INTERVAL', 10))
+
+
+def _snapshot_state(items, loaded_at):
+    items = sorted(items, key=lambda item: item["user_id"])
+    body = json.dumps(items, sort_keys=True, default=str).encode("utf-8")
+    etag = hashlib.sha1(body).hexdigest()
+    watermark = max((item.get("created_at", "") for item in items), default="")
+    return (items, [item["user_id"] for item in items], etag, loaded_at, watermark)
+
+
+# ----------------------------------------------------------------
+#  Cached counsellor directory
+# ----------------------------------------------------------------
+class CounsellorDirectory:
+    """
+    In-process copy of all counsellors in the Users table, read with a
+    Query on the profile_type GSI rather than a filtered Scan.
+
+    A snapshot is fresh for `ttl` seconds. For a further `stale_ttl` seconds
+    it is still served while one background refresh runs; after that a read
+    refreshes synchronously. Between full loads, counsellors registered
+    elsewhere are picked up by a cheap `created_at >= watermark` query every
+    `delta_interval` seconds. Each snapshot carries a weak ETag so callers
+    can answer If-None-Match without serializing the list.
+
+    Listeners (objects with reset(items) and add(items)) are kept in step
+    with the snapshot, e.g. a search index.
+
+    Requests that find no usable snapshot (cold start, or expired past
+    the stale window) share a single load instead of each querying.
+    """
+
+    def __init__(self, table, index_name=PROFILE_TYPE_INDEX, ttl=DIRECTORY_TTL,
+                 stale_ttl=DIRECTORY_STALE_TTL, delta_interval=DIRECTORY_DELTA_INTERVAL):
+        self.table = table
+        self.index_name = index_name
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.delta_interval = delta_interval
+        self.listeners = []
+        # (items, ids, etag, loaded_at, created_at watermark), swapped atomically
+        self._state = None
+        self._lock = threading.Lock()
+        self._refreshing = False
+        self._generation = 0
+        self._last_delta = 0.0
+        self._flight = SingleFlight("counsellor_directory")
+
+    def _query(self, condition):
+        return list(iter_items(
+            self.table.query,
+            IndexName=self.index_name,
+            KeyConditionExpression=condition
+        ))
+
+    def _load(self):
+        generation = self._generation
+        items = self._query(Key("profile_type").eq("counsellor"))
+        state = _snapshot_state(items, time.monotonic())
+        with self._lock:
+            # Don't let a refresh that started before invalidate() overwrite it.
+            if generation == self._generation:
+                self._state = state
+                self._last_delta = state[3]
+                for listener in self.listeners:
+                    listener.reset(state[0])
+        return state
+
+    def _load_new(self):
+        state = self._state
+        if state is None:
+            return
+        self._last_delta = time.monotonic()
+        condition = Key("profile_type").eq("counsellor")
+        if state[4]:
+            condition = condition & Key("created_at").gte(state[4])
+        self.add(self._query(condition))
+
+    def _in_background(self, job):
+        with self._lock:
+            if self._refreshing:
+                return
+            self._refreshing = True
+
+        def run():
+            try:
+                job()
+            except Exception as e:
+                print(f"Counsellor directory refresh failed: {e}")
+            finally:
+                self._refreshing = False
+
+        threading.Thread(target=run, name="directory-refresh", daemon=True).start()
+
+    def _current(self):
+        state = self._state
+        now = time.monotonic()
+        if state is None or now - state[3] > self.ttl + self.stale_ttl:
+            CACHE_REQUESTS.inc(cache="counsellor_directory", result="miss")
+            return self._flight.do("load", self._load)
+        if now - state[3] > self.ttl:
+            CACHE_REQUESTS.inc(cache="counsellor_directory", result="stale")
+            self._in_background(self._load)
+            return state
+        CACHE_REQUESTS.inc(cache="counsellor_directory", result="hit")
+        if self.delta_interval and now - self._last_delta > self.delta_interval:
+            self._in_background(self._load_new)
+        return state
+
+    def snapshot(self):
+        """Returns (items sorted by user_id, etag)."""
+        items, _, etag, _, _ = self._current()
+        return items, etag
+
+    def page(self, limit, after_id=None):
+        """
+        Returns (items, last_id_or_None) for up to `limit` counsellors with
+        user_id greater than `after_id`, in the same order as snapshot().
+        """
+        items, ids, _, _, _ = self._current()
+        return page_after(items, ids, limit, after_id)
+
+    def ensure_loaded(self):
+        self._current()
+
+    def add(self, items):
+        """Merges newly registered (or updated) counsellors into the snapshot."""
+        items = [item for item in items if item.get("profile_type") == "counsellor"]
+        if not items:
+            return
+        with self._lock:
+            state = self._state
+            if state is None:
+                return
+            by_id = {item["user_id"]: item for item in state[0]}
+            changed = [item for item in items if by_id.get(item["user_id"]) != item]
+            if not changed:
+                return
+            by_id.update((item["user_id"], item) for item in changed)
+            self._state = _snapshot_state(by_id.values(), state[3])
+            for listener in self.listeners:
+                listener.add(changed)
+
+    def invalidate(self):
+        """Forces the next read to reload from DynamoDB."""
+        with self._lock:
+            self._generation += 1
+            self._state = None
@@ -0,0 +1,70 @@
+"""
+Production gunicorn settings shared by all services:
+
+    gunicorn --config common/gunicorn_conf.py app:app
+
+Tuned through environment variables so one image fits any pod size:
+
+  PORT                       listen port (each Dockerfile sets its own)
+  GUNICORN_WORKERS           worker processes; default 2, one per vCPU of a t3.medium
+  GUNICORN_WORKER_CLASS      gthread (default), sync, or gevent if it is installed
+  GUNICORN_THREADS           request threads per gthread worker (default 8)
+  GUNICORN_WORKER_CONNECTIONS  concurrent clients per gevent worker (default 1000)
+  GUNICORN_KEEPALIVE         seconds an idle client connection is kept open (default 75,
+                             longer than the ALB's 60 s idle timeout to avoid 502s)
+  GUNICORN_TIMEOUT           seconds before a silent worker is killed and replaced
+  GUNICORN_GRACEFUL_TIMEOUT  seconds a stopping worker gets to finish in-flight requests
+  GUNICORN_MAX_REQUESTS      recycle a worker after this many requests (0 = never)
+  GUNICORN_PRELOAD           1 to import the app once in the master and fork workers
+                             from it: JWKS, boto3 clients and caches are built once,
+                             and background threads are restarted in each worker
+
+Every blocking DynamoDB or Cognito call holds a request thread, so
+workers x threads is the number of requests a pod serves concurrently.
+"""
+import os
+import signal
+
+from common import lifecycle
+
+
+def _env_int(name, default):
+    return int(os.environ.get(name, default))
+
+
+bind = f"0.0.0.0:{os.environ.get('PORT', 5000)}"
+workers = _env_int('GUNICORN_WORKERS', 2)
+worker_class = os.environ.get('GUNICORN_WORKER_CLASS', 'gthread')
+threads = _env_int('GUNICORN_THREADS', 8)
+worker_connections = _env_int('GUNICORN_WORKER_CONNECTIONS', 1000)
+keepalive = _env_int('GUNICORN_KEEPALIVE', 75)
+timeout = _env_int('GUNICORN_TIMEOUT', 30)
+# Stay under the Kubernetes default terminationGracePeriodSeconds (30 s).
+graceful_timeout = _env_int('GUNICORN_GRACEFUL_TIMEOUT', 20)
+max_requests = _env_int('GUNICORN_MAX_REQUESTS', 0)
+max_requests_jitter = max_requests // 10
+preload_app = os.environ.get('GUNICORN_PRELOAD', '0') == '1'
+lifecycle.preloaded = preload_app
+lifecycle.worker_capacity = {'gthread': threads, 'gevent': worker_connections}.get(worker_class, 1)
+
+accesslog = os.environ.get('GUNICORN_ACCESS_LOG', '-') or None
+errorlog = '-'
+# Worker heartbeat files default to /tmp, which is disk-backed in some images.
+worker_tmp_dir = '/dev/shm' if os.path.isdir('/dev/shm') else None
+
+
+def post_fork(server, worker):
+    lifecycle.run_after_fork()
+
+
+def post_worker_init(worker):
+    # gunicorn's own SIGTERM handler only stops accepting new connections;
+    # chain ours so open streams and long-polls are told to wind down too.
+    previous = signal.getsignal(signal.SIGTERM)
+
+    def handle_term(signum, frame):
+        lifecycle.begin_shutdown()
+        if callable(previous):
+            previous(signum, frame)
+
+    signal.signal(signal.SIGTERM, handle_term)
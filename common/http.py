@@ -0,0 +1,179 @@
+import gzip
+import itertools
+import os
+import zlib
+
+from flask import Response, current_app, jsonify, request, stream_with_context
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+NDJSON_MIMETYPE = "application/x-ndjson"
+# Serialized items are buffered up to about this size before each write.
+STREAM_CHUNK_BYTES = int(os.environ.get('STREAM_CHUNK_BYTES', 64 * 1024))
+
+# Buffered bodies smaller than this are sent as they are.
+COMPRESS_MIN_BYTES = int(os.environ.get('COMPRESS_MIN_BYTES', 1024))
+GZIP_LEVEL = int(os.environ.get('GZIP_LEVEL', 6))
+# Brotli's 0-11 scale; 4-5 compresses better than gzip -6 at similar CPU cost.
+BROTLI_QUALITY = int(os.environ.get('BROTLI_QUALITY', 4))
+# Event streams are left alone: compressors buffer, which would hold events back.
+COMPRESSIBLE_MIMETYPES = {"application/json", NDJSON_MIMETYPE, "text/plain", "text/html", "text/csv"}
+
+
+# ----------------------------------------------------------------
+#  Conditional JSON responses
+# ----------------------------------------------------------------
+def json_with_etag(data, etag=None, status=200):
+    """
+    JSON response with a weak ETag that honours If-None-Match.
+    When the caller already knows the ETag (e.g. a cached snapshot), a
+    matching request gets its 304 without serializing the body.
+    """
+    if etag is not None and request.if_none_match.contains_weak(etag):
+        response = Response(status=304)
+        response.set_etag(etag, weak=True)
+        return response
+    response = jsonify(data)
+    response.status_code = status
+    if etag is None:
+        response.add_etag(weak=True)
+    else:
+        response.set_etag(etag, weak=True)
+    return response.make_conditional(request)
+
+
+# ----------------------------------------------------------------
+#  Streamed JSON lists
+# ----------------------------------------------------------------
+def wants_ndjson():
+    """True if the client asked for NDJSON (?format=ndjson or the Accept header)."""
+    if request.args.get("format") == "ndjson":
+        return True
+    return request.accept_mimetypes.best_match(["application/json", NDJSON_MIMETYPE]) == NDJSON_MIMETYPE
+
+
+_EMPTY = object()
+
+
+def _chunks(first, items, ndjson):
+    dumps = current_app.json.dumps
+    buffer, size = ([] if ndjson else ["["]), 0
+    if first is not _EMPTY:
+        for index, item in enumerate(itertools.chain([first], items)):
+            piece = dumps(item, separators=(",", ":"))
+            if ndjson:
+                piece += "\n"
+            elif index:
+                piece = "," + piece
+            buffer.append(piece)
+            size += len(piece)
+            if size >= STREAM_CHUNK_BYTES:
+                yield "".join(buffer)
+                buffer, size = [], 0
+    if not ndjson:
+        buffer.append("]\n")
+    yield "".join(buffer)
+
+
+def stream_json(items, etag=None, status=200):
+    """
+    Streams an iterable as a JSON array, or as NDJSON when wants_ndjson(),
+    serializing one item at a time so a generator over DynamoDB pages is
+    never held in memory as a whole. The first item is read before the
+    response starts, so a failing first query still raises to the caller.
+    A known weak `etag` is set and honoured as in json_with_etag.
+    """
+    if etag is not None and request.if_none_match.contains_weak(etag):
+        response = Response(status=304)
+        response.set_etag(etag, weak=True)
+        return response
+    items = iter(items)
+    first = next(items, _EMPTY)
+    ndjson = wants_ndjson()
+    response = Response(
+        stream_with_context(_chunks(first, items, ndjson)),
+        status=status,
+        mimetype=NDJSON_MIMETYPE if ndjson else current_app.json.mimetype,
+    )
+    if etag is not None:
+        response.set_etag(etag, weak=True)
+    return response
+
+
+# ----------------------------------------------------------------
+#  Response middleware: ETags and compression
+# ----------------------------------------------------------------
+def _accepted_encoding():
+    offered = ["br", "gzip"] if brotli is not None else ["gzip"]
+    return request.accept_encodings.best_match(offered)
+
+
+def _compress(data, encoding):
+    if encoding == "br":
+        return brotli.compress(data, quality=BROTLI_QUALITY)
+    return gzip.compress(data, compresslevel=GZIP_LEVEL, mtime=0)
+
+
+def _compress_stream(chunks, source, encoding):
+    if encoding == "br":
+        compressor = brotli.Compressor(quality=BROTLI_QUALITY)
+        process, flush, finish = compressor.process, compressor.flush, compressor.finish
+    else:
+        compressor = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+        process, finish = compressor.compress, compressor.flush
+        flush = lambda: compressor.flush(zlib.Z_SYNC_FLUSH)  # noqa: E731
+    try:
+        for chunk in chunks:
+            # Flush per chunk so each one reaches the client when it is produced.
+            out = process(chunk) + flush()
+            if out:
+                yield out
+        yield finish()
+    finally:
+        if hasattr(source, "close"):
+            source.close()
+
+
+def _after_request(response):
+    if response.direct_passthrough:
+        return response
+
+    # Conditional GET: a weak ETag over the body, unless the view set one.
+    # Streamed bodies are not hashed; views that stream pass stream_json() a
+    # validator they can get without reading the whole body.
+    if request.method == "GET" and response.status_code == 200 and not response.is_streamed \
+            and response.mimetype == "application/json" and response.get_etag()[0] is None:
+        response.add_etag(weak=True)
+        response.make_conditional(request)
+
+    if not 200 <= response.status_code < 300 or response.status_code == 204 \
+            or request.method == "HEAD" or response.mimetype not in COMPRESSIBLE_MIMETYPES \
+            or "Content-Encoding" in response.headers:
+        return response
+    response.vary.add("Accept-Encoding")
+    encoding = _accepted_encoding()
+    if encoding is None:
+        return response
+    if response.is_streamed:
+        source = response.response
+        response.response = _compress_stream(response.iter_encoded(), source, encoding)
+    else:
+        data = response.get_data()
+        if len(data) < COMPRESS_MIN_BYTES:
+            return response
+        response.set_data(_compress(data, encoding))
+    response.headers["Content-Encoding"] = encoding
+    return response
+
+
+def add_response_middleware(app):
+    """
+    Adds weak ETags with If-None-Match handling to buffered JSON GET
+    responses, and gzip or brotli compression (per Accept-Encoding) to
+    JSON, NDJSON and text bodies, streamed ones included.
+    """
+    app.after_request(_after_request)
+    return app
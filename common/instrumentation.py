@@ -0,0 +1,114 @@
+"""
+Per-request metrics for the Flask services and the /metrics endpoint.
+
+    instrument_app(app)
+
+records, for every request,
+
+  http_requests_total{method, route, status}
+  http_request_duration_seconds{method, route, status}
+  http_requests_in_flight
+
+and http_requests_active, which unlike in_flight keeps counting a
+streamed response until its body has been sent. Views that hold their
+thread only to wait for an event (long-polls, SSE) wrap the wait in
+`with parked():`, which moves the request to http_requests_parked for
+that time. common.readiness reports saturation from the two.
+
+`route` is the matched URL rule ("/sessions/<session_id>"), so
+cardinality stays bounded. Durations run until the view returns its
+response; for streamed bodies (SSE) that is the time to first byte.
+
+GET /metrics renders every metric in the shared registry (these plus the
+AWS, token and cache metrics) in Prometheus text format. Set
+METRICS_AUTH_TOKEN to require `Authorization: Bearer <token>` on it,
+since the ingress routes every path to the services.
+
+Metrics live in process memory, so with several gunicorn workers a scrape
+reports the worker that happened to serve it; rates stay meaningful, but
+for exact per-pod totals run one worker with more threads.
+"""
+import hmac
+import os
+import time
+from contextlib import contextmanager
+
+from flask import Response, g, request
+
+from common import metrics
+
+METRICS_AUTH_TOKEN = os.environ.get('METRICS_AUTH_TOKEN')
+
+REQUESTS = metrics.counter(
+    "http_requests_total", "HTTP requests handled", ["method", "route", "status"]
+)
+REQUEST_DURATION = metrics.histogram(
+    "http_request_duration_seconds", "HTTP request latency", ["method", "route", "status"]
+)
+IN_FLIGHT = metrics.gauge(
+    "http_requests_in_flight", "HTTP requests currently being handled"
+)
+ACTIVE = metrics.gauge(
+    "http_requests_active", "HTTP requests holding a request thread, until their body is sent"
+)
+PARKED = metrics.gauge(
+    "http_requests_parked", "HTTP requests holding a request thread while idly waiting for an event"
+)
+
+
+@contextmanager
+def parked():
+    """Counts the request as parked instead of active while the block waits."""
+    ACTIVE.dec()
+    PARKED.inc()
+    try:
+        yield
+    finally:
+        PARKED.dec()
+        ACTIVE.inc()
+
+
+def _before_request():
+    g.metrics_started = time.perf_counter()
+    IN_FLIGHT.inc()
+    ACTIVE.inc()
+
+
+def _after_request(response):
+    started = g.pop("metrics_started", None)
+    if started is not None:
+        IN_FLIGHT.dec()
+        if response.is_streamed:
+            response.call_on_close(ACTIVE.dec)
+        else:
+            ACTIVE.dec()
+        rule = request.url_rule
+        labels = dict(method=request.method,
+                      route=rule.rule if rule is not None else "unmatched",
+                      status=str(response.status_code))
+        REQUESTS.inc(**labels)
+        REQUEST_DURATION.observe(time.perf_counter() - started, **labels)
+    return response
+
+
+def metrics_authorized():
+    """True unless METRICS_AUTH_TOKEN is set and the request lacks it."""
+    if not METRICS_AUTH_TOKEN:
+        return True
+    supplied = request.headers.get("Authorization", "")
+    return hmac.compare_digest(supplied, f"Bearer {METRICS_AUTH_TOKEN}")
+
+
+def _metrics_view():
+    if not metrics_authorized():
+        return Response("Unauthorized\n", status=401, mimetype="text/plain")
+    return Response(metrics.REGISTRY.render(), mimetype="text/plain; version=0.0.4")
+
+
+def instrument_app(app):
+    """Adds request metrics and the /metrics route to a Flask app."""
+    # Registered first so that it runs before any other before_request hook.
+    app.before_request_funcs.setdefault(None, []).insert(0, _before_request)
+    app.after_request(_after_request)
+    app.add_url_rule("/metrics", "metrics", _metrics_view, methods=["GET"])
+    return app
@@ -0,0 +1,92 @@
+"""
+Flask JSON provider for DynamoDB items.
+
+Items from the boto3 resource API carry Decimal numbers, sets and Binary
+values, none of which the standard encoder handles. DynamoJSONProvider
+serializes them as
+
+  Decimal        int when integral, else float
+  set/frozenset  list (sorted when the members allow it, so output is stable)
+  Binary/bytes   base64 string
+
+and uses orjson when it is installed, falling back to the standard
+library otherwise (and for the rare value orjson rejects, such as an
+integer beyond 64 bits). Install it on an app with
+
+    app.json = DynamoJSONProvider(app)
+
+Everything else matches Flask's default provider: keys stay sorted,
+dates are HTTP dates, and responses are compact unless in debug mode.
+orjson writes non-ASCII characters as UTF-8 rather than \\u escapes.
+"""
+import base64
+import decimal
+
+from boto3.dynamodb.types import Binary
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - exercised where orjson is absent
+    orjson = None
+
+# Arguments of json.dumps that the orjson path can honour (or safely ignore).
+_ORJSON_KWARGS = {"indent", "separators", "sort_keys", "ensure_ascii", "default"}
+
+
+def dynamo_default(value):
+    """`default` hook for values json/orjson cannot serialize on their own."""
+    if isinstance(value, decimal.Decimal):
+        if value == value.to_integral_value():
+            return int(value)
+        return float(value)
+    if isinstance(value, (set, frozenset)):
+        try:
+            return sorted(value)
+        except TypeError:
+            return list(value)
+    if isinstance(value, Binary):
+        value = value.value
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return base64.b64encode(bytes(value)).decode("ascii")
+    return DefaultJSONProvider.default(value)
+
+
+class DynamoJSONProvider(DefaultJSONProvider):
+    default = staticmethod(dynamo_default)
+
+    def _orjson_dumps(self, obj, kwargs):
+        """orjson bytes for `obj`, or None where the standard encoder must be used."""
+        if orjson is None or not set(kwargs) <= _ORJSON_KWARGS:
+            return None
+        # Datetimes go through `default` so they stay HTTP dates, as with Flask.
+        option = orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME
+        if kwargs.get("sort_keys", self.sort_keys):
+            option |= orjson.OPT_SORT_KEYS
+        if kwargs.get("indent"):
+            option |= orjson.OPT_INDENT_2
+        try:
+            return orjson.dumps(obj, default=kwargs.get("default", self.default), option=option)
+        except TypeError:
+            return None  # e.g. integers beyond 64 bits; the standard encoder copes
+
+    def dumps(self, obj, **kwargs):
+        body = self._orjson_dumps(obj, kwargs)
+        return super().dumps(obj, **kwargs) if body is None else body.decode("utf-8")
+
+    def loads(self, s, **kwargs):
+        if orjson is None or kwargs:
+            return super().loads(s, **kwargs)
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        # Same as the default provider, but without a str round trip.
+        obj = self._prepare_response_obj(args, kwargs)
+        if (self.compact is None and self._app.debug) or self.compact is False:
+            kwargs = {"indent": 2}
+        else:
+            kwargs = {"separators": (",", ":")}
+        body = self._orjson_dumps(obj, kwargs)
+        if body is None:
+            body = super().dumps(obj, **kwargs).encode("utf-8")
+        return self._app.response_class(body + b"\n", mimetype=self.mimetype)
@@ -0,0 +1,181 @@
+import json
+import os
+import re
+import threading
+import time
+from urllib.parse import urlparse
+from urllib.request import url2pathname, urlopen
+
+from jose import jwk
+
+from common import lifecycle
+
+# ----------------------------------------------------------------
+#  Tuning (seconds)
+# ----------------------------------------------------------------
+JWKS_HTTP_TIMEOUT = float(os.environ.get('JWKS_HTTP_TIMEOUT', 3))
+JWKS_DEFAULT_MAX_AGE = float(os.environ.get('JWKS_DEFAULT_MAX_AGE', 3600))
+JWKS_MIN_REFRESH_INTERVAL = float(os.environ.get('JWKS_MIN_REFRESH_INTERVAL', 60))
+JWKS_RETRY_INTERVAL = float(os.environ.get('JWKS_RETRY_INTERVAL', 30))
+JWKS_KID_MISS_INTERVAL = float(os.environ.get('JWKS_KID_MISS_INTERVAL', 30))
+
+_MAX_AGE_RE = re.compile(r"max-age=(\d+)")
+
+
+class JWKSManager:
+    """
+    Holds the current JWKS as constructed public keys, keyed by `kid`.
+
+    Keys are loaded once at startup and refreshed on a background thread,
+    honouring the endpoint's Cache-Control max-age. A failed refresh keeps
+    the last good key set. A token with an unknown `kid` triggers at most
+    one (single-flight) refetch per JWKS_KID_MISS_INTERVAL.
+
+    `url` may be an http(s) URL, a file:// URL or a plain path to a local
+    JWKS file, which makes it easy to run against a stub.
+    """
+
+    def __init__(self, url, timeout=JWKS_HTTP_TIMEOUT,
+                 default_max_age=JWKS_DEFAULT_MAX_AGE,
+                 min_refresh_interval=JWKS_MIN_REFRESH_INTERVAL,
+                 retry_interval=JWKS_RETRY_INTERVAL,
+                 kid_miss_interval=JWKS_KID_MISS_INTERVAL):
+        self.url = url
+        self.timeout = timeout
+        self.default_max_age = default_max_age
+        self.min_refresh_interval = min_refresh_interval
+        self.retry_interval = retry_interval
+        self.kid_miss_interval = kid_miss_interval
+
+        self._jwks = {}   # kid -> raw JWK dict
+        self._keys = {}   # kid -> constructed key object
+        self.last_refresh = None
+        self.last_error = None
+
+        self._refresh_lock = threading.Lock()
+        self._miss_lock = threading.Lock()
+        self._last_miss_fetch = float("-inf")
+        self._next_refresh = 0.0
+        self._wakeup = threading.Event()
+        self._thread = None
+        self._pid = None
+
+    @property
+    def loaded(self):
+        return bool(self._keys)
+
+    @property
+    def key_count(self):
+        return len(self._keys)
+
+    # ------------------------------------------------------------
+    #  Lifecycle
+    # ------------------------------------------------------------
+    def start(self, wait=None):
+        """
+        Starts the background refresher, loading the key set first (bounded
+        by the HTTP timeout) if `wait`, which defaults to not FAST_START;
+        otherwise the refresher's first round loads it. Safe to call
+        repeatedly, and restarts the refresher in a forked worker process.
+        """
+        if wait is None:
+            wait = not lifecycle.FAST_START
+        if self._pid == os.getpid() and self._thread and self._thread.is_alive():
+            return
+        if self._pid is not None and self._pid != os.getpid():
+            # Forked while the refresher may have held a lock; start clean.
+            self._refresh_lock = threading.Lock()
+            self._miss_lock = threading.Lock()
+            self._wakeup = threading.Event()
+        self._pid = os.getpid()
+        if wait and not self.loaded:
+            self.refresh()
+        self._wakeup.clear()
+        self._thread = threading.Thread(target=self._run, name="jwks-refresh", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._pid = None
+        self._wakeup.set()
+
+    def _run(self):
+        pid = self._pid
+        while self._pid == pid:
+            delay = max(self._next_refresh - time.monotonic(), 0)
+            if self._wakeup.wait(delay):
+                break
+            self.refresh()
+
+    # ------------------------------------------------------------
+    #  Fetching
+    # ------------------------------------------------------------
+    def _fetch(self):
+        """Returns (keys, max_age) from the configured URL or file."""
+        parsed = urlparse(self.url)
+        if parsed.scheme in ("http", "https"):
+            # urlopen raises HTTPError for error statuses.
+            with urlopen(self.url, timeout=self.timeout) as resp:
+                match = _MAX_AGE_RE.search(resp.headers.get("Cache-Control", ""))
+                keys = json.load(resp)["keys"]
+            max_age = float(match.group(1)) if match else self.default_max_age
+            return keys, max_age
+        path = url2pathname(parsed.path) if parsed.scheme == "file" else self.url
+        with open(path) as f:
+            return json.load(f)["keys"], self.default_max_age
+
+    def refresh(self):
+        """
+        Fetches the JWKS and swaps in the new key set.
+        Returns False (keeping the previous keys) if the fetch fails.
+        """
+        with self._refresh_lock:
+            try:
+                raw_keys, max_age = self._fetch()
+                jwks = {key["kid"]: key for key in raw_keys}
+                keys = {}
+                for kid, data in jwks.items():
+                    # Reuse already constructed keys that did not change.
+                    if self._jwks.get(kid) == data and kid in self._keys:
+                        keys[kid] = self._keys[kid]
+                    else:
+                        keys[kid] = jwk.construct(data)
+            except Exception as e:
+                self.last_error = str(e)
+                self._next_refresh = time.monotonic() + self.retry_interval
+                print(f"Failed to load JWKS from {self.url}: {e}")
+                return False
+
+            self._jwks, self._keys = jwks, keys
+            self.last_refresh = time.time()
+            self.last_error = None
+            self._next_refresh = time.monotonic() + max(max_age, self.min_refresh_interval)
+            print(f"JWKS loaded successfully ({len(keys)} keys).")
+            return True
+
+    def probe(self):
+        """
+        Fetches the key set without installing it and returns the number of
+        keys; raises if the JWKS endpoint (Cognito) cannot be reached.
+        """
+        return len(self._fetch()[0])
+
+    # ------------------------------------------------------------
+    #  Lookup
+    # ------------------------------------------------------------
+    def get_key(self, kid):
+        """
+        Returns the public key for `kid`, or None if it is unknown.
+        An unknown kid refetches the JWKS at most once per kid_miss_interval,
+        and concurrent misses share that single fetch.
+        """
+        key = self._keys.get(kid)
+        if key is not None or kid is None:
+            return key
+        requested_at = time.monotonic()
+        with self._miss_lock:
+            key = self._keys.get(kid)
+            if key is None and requested_at - self._last_miss_fetch >= self.kid_miss_interval:
+                self._last_miss_fetch = time.monotonic()
+                self.refresh()
+                key = self._keys.get(kid)
+        return key
@@ -0,0 +1,63 @@
+"""
+Process lifecycle hooks, driven by the WSGI server (see gunicorn_conf.py).
+
+  after_fork(func)   run func in each worker process right after it is
+                     forked from a preloaded master. Background threads
+                     and sockets do not survive fork(), so anything that
+                     owns one registers its restart here.
+  on_shutdown(func)  run func when the worker is asked to stop, so
+                     long-lived requests (streams, long-polls) can end
+                     before the graceful timeout instead of being killed.
+
+Under the Flask development server neither hook fires.
+
+FAST_START (default 1) trades work at import for work just after it:
+AWS clients are built on first use and the first JWKS fetch runs on the
+refresher thread, so a new process answers /health at once and reports
+through /ready (common.readiness) when it can take traffic. Set it to 0
+to build everything before the app is importable.
+"""
+import os
+import threading
+
+FAST_START = os.environ.get('FAST_START', '1') == '1'
+# True in a gunicorn master that imports the app before forking workers
+# (set by gunicorn_conf.py); work started at import is redone after_fork.
+preloaded = False
+# Requests one worker process serves at once (threads for gthread), set by
+# gunicorn_conf.py; None under the development server.
+worker_capacity = None
+
+shutting_down = threading.Event()
+
+_after_fork = []
+_on_shutdown = []
+
+
+def after_fork(func):
+    _after_fork.append(func)
+    return func
+
+
+def on_shutdown(func):
+    _on_shutdown.append(func)
+    return func
+
+
+def _run(callbacks, stage):
+    for func in callbacks:
+        try:
+            func()
+        except Exception as e:
+            print(f"{stage} hook {getattr(func, '__qualname__', func)} failed: {e}")
+
+
+def run_after_fork():
+    _run(_after_fork, "after-fork")
+
+
+def begin_shutdown():
+    if shutting_down.is_set():
+        return
+    shutting_down.set()
+    _run(_on_shutdown, "shutdown")
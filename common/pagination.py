@@ -0,0 +1,141 @@
+import base64
+import bisect
+import json
+import os
+from decimal import Decimal
+from itertools import islice
+
+from boto3.dynamodb.types import TypeDeserializer, TypeSerializer
+from flask import jsonify
+
+MAX_PAGE_LIMIT = int(os.environ.get('MAX_PAGE_LIMIT', 500))
+
+_serializer = TypeSerializer()
+_deserializer = TypeDeserializer()
+
+
+# ----------------------------------------------------------------
+#  Opaque cursors
+# ----------------------------------------------------------------
+def encode_cursor(position):
+    """
+    Encodes a pagination position (a LastEvaluatedKey, or a dict of them)
+    as an opaque URL-safe string. Values keep their DynamoDB types.
+    """
+    if not position:
+        return None
+    wire = {name: _serializer.serialize(value) for name, value in position.items()}
+    raw = json.dumps(wire, separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor):
+    """Reverses encode_cursor. Raises ValueError for a malformed cursor."""
+    if not cursor:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        wire = json.loads(raw)
+        return {name: _deserializer.deserialize(value) for name, value in wire.items()}
+    except Exception:
+        raise ValueError("Invalid cursor")
+
+
+def check_start_key(position, names, **partition):
+    """
+    Checks a decoded position used as a start key: exactly the attributes
+    `names`, each a string or number, within the partition being read
+    (`partition` maps its key attribute to the queried value). A cursor
+    edited to resume somewhere else raises ValueError like a malformed one.
+    """
+    if position is None:
+        return None
+    if not isinstance(position, dict) or set(position) != set(names) \
+            or not all(isinstance(value, (str, Decimal)) for value in position.values()) \
+            or any(position[name] != value for name, value in partition.items()):
+        raise ValueError("Invalid cursor")
+    return position
+
+
+def parse_page_args(args):
+    """
+    Reads `limit` and `cursor` from the query string.
+    Returns (paginated, limit, position); paginated is False when the
+    client asked for neither, in which case the full result is expected.
+    Raises ValueError on bad input.
+    """
+    raw_limit = args.get("limit")
+    cursor = args.get("cursor")
+    if raw_limit is None and cursor is None:
+        return False, None, None
+    if raw_limit is None:
+        limit = MAX_PAGE_LIMIT
+    else:
+        try:
+            limit = int(raw_limit)
+        except ValueError:
+            raise ValueError("'limit' must be a positive integer")
+        if limit <= 0:
+            raise ValueError("'limit' must be a positive integer")
+    return True, min(limit, MAX_PAGE_LIMIT), decode_cursor(cursor)
+
+
+# ----------------------------------------------------------------
+#  Paging over DynamoDB results
+# ----------------------------------------------------------------
+def iter_items(operation, start_key=None, **kwargs):
+    """
+    Yields items from a table/index `scan` or `query` call, following
+    LastEvaluatedKey until the result set is exhausted.
+    """
+    if start_key:
+        kwargs["ExclusiveStartKey"] = start_key
+    while True:
+        response = operation(**kwargs)
+        yield from response.get("Items", [])
+        last_key = response.get("LastEvaluatedKey")
+        if not last_key:
+            return
+        kwargs["ExclusiveStartKey"] = last_key
+
+
+def take_page(items, limit, key_of):
+    """
+    Takes up to `limit` items from an iterator. Returns (page, next_key),
+    where next_key = key_of(last item) if more items remain, else None.
+    """
+    page = list(islice(items, limit + 1))
+    if len(page) <= limit:
+        return page, None
+    page = page[:limit]
+    return page, key_of(page[-1])
+
+
+def page_after(items, ids, limit, after_id=None):
+    """
+    Pages an in-memory list sorted by id (`ids` is the parallel id list).
+    Returns (page, last_id) where last_id is None on the final page.
+    """
+    start = bisect.bisect_right(ids, after_id) if after_id else 0
+    page = items[start:start + limit]
+    more = start + limit < len(items)
+    return page, (ids[start + len(page) - 1] if more and page else None)
+
+
+def key_fields(*names):
+    """Builds a key_of function that projects the given attributes."""
+    return lambda item: {name: item[name] for name in names}
+
+
+def page_payload(items, limit, next_position):
+    """Standard envelope for a paginated list endpoint."""
+    return {
+        "items": items,
+        "count": len(items),
+        "limit": limit,
+        "next_cursor": encode_cursor(next_position),
+    }
+
+
+def page_response(items, limit, next_position):
+    return jsonify(page_payload(items, limit, next_position))
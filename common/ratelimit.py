@@ -0,0 +1,288 @@
+"""
+Token-bucket rate limiting, per client IP, per user (JWT sub) and per
+endpoint.
+
+A limit such as "10/minute" is a bucket of 10 tokens refilled at 10 per
+minute: bursts up to 10 pass, after that one request every 6 seconds.
+Buckets are kept in GCRA form, one "theoretical arrival time" per key
+instead of a (tokens, last refill) pair, so a check is a single compare
+and store.
+
+A RateLimiter groups the limits of one endpoint:
+
+    login_limiter = RateLimiter("login", per_ip="10/minute", total="50/second")
+
+    @app.route("/login", methods=["POST"])
+    @login_limiter
+    def login(): ...
+
+and routes that key by user call check(user=claims["sub"]) once the token
+is verified. A rejected request gets 429 with Retry-After (whole seconds).
+The per-IP and per-user buckets are checked before the endpoint's total,
+so a client over its own limit does not use up everyone else's, and a
+rejected request gives back the tokens it took from the buckets before.
+
+Backends (RATE_LIMIT_BACKEND):
+
+  memory    buckets in this process (default). A check costs a few
+            microseconds, but every gunicorn worker of every replica has
+            its own buckets, so the effective limit is multiplied by them.
+  dynamodb  buckets in the RATE_LIMIT_TABLE_NAME table, shared by all
+            replicas; one GetItem and one conditional PutItem per bucket
+            checked. Meant for the Cognito-bound endpoints, whose own cost
+            dwarfs that. Fails open if DynamoDB cannot be reached.
+
+The memory backend is also the local stand-in for the shared one: both
+implement take(key, interval, tolerance, cost) and refund(key, interval,
+cost), so tests and development need no table. Limits given as "" or "0"
+are off, and RATE_LIMIT_ENABLED=0 turns all of them off (load tests).
+"""
+import functools
+import math
+import os
+import threading
+import time
+
+from botocore.exceptions import BotoCoreError, ClientError
+from flask import jsonify, request
+
+from common import aws, metrics
+
+RATE_LIMIT_ENABLED = os.environ.get('RATE_LIMIT_ENABLED', '1') == '1'
+RATE_LIMIT_BACKEND = os.environ.get('RATE_LIMIT_BACKEND', 'memory')
+RATE_LIMIT_TABLE_NAME = os.environ.get('RATE_LIMIT_TABLE_NAME', 'RateLimits')
+# Proxies that append to X-Forwarded-For in front of the services (the
+# nginx ingress). The client is the address the outermost of them saw.
+TRUSTED_PROXIES = int(os.environ.get('RATE_LIMIT_TRUSTED_PROXIES', 1))
+# Buckets the memory backend holds before it drops the ones that are full again.
+MEMORY_MAX_BUCKETS = int(os.environ.get('RATE_LIMIT_MAX_BUCKETS', 100_000))
+
+REJECTED = metrics.counter(
+    "rate_limited_requests_total", "Requests rejected with 429", ["limiter", "scope"]
+)
+BACKEND_ERRORS = metrics.counter(
+    "rate_limit_backend_errors_total", "Rate limit checks let through because the backend failed"
+)
+
+PERIODS = {"second": 1, "minute": 60, "hour": 3600, "day": 86400}
+# Arrival times add up float intervals (ten of 0.1s make slightly more than
+# 1s); waits below this are rounding, so a full burst is never cut short.
+ROUNDING_SECONDS = 1e-6
+
+
+class Limit:
+    """`count` requests per `period`, with bursts of up to `count`."""
+
+    def __init__(self, count, period):
+        self.count = count
+        self.period = period
+        self.interval = period / count             # seconds per token
+        self.tolerance = self.interval * count     # how far ahead a full burst may run
+
+    @classmethod
+    def parse(cls, spec):
+        """'10/minute' -> Limit(10, 60); '' or '0' -> None (no limit)."""
+        if spec is None or spec.strip() in ("", "0"):
+            return None
+        count, _, unit = spec.strip().partition("/")
+        try:
+            count, period = int(count), PERIODS[unit.strip().lower().rstrip("s") or "second"]
+        except (ValueError, KeyError):
+            raise ValueError(f"Invalid rate limit {spec!r}, expected e.g. '10/minute'") from None
+        return cls(count, period) if count > 0 else None
+
+    def __repr__(self):
+        return f"Limit({self.count}/{self.period}s)"
+
+
+# ----------------------------------------------------------------
+#  Backends
+# ----------------------------------------------------------------
+class MemoryBackend:
+    """Buckets in a dict of key -> theoretical arrival time (monotonic seconds)."""
+
+    def __init__(self, max_buckets=MEMORY_MAX_BUCKETS, clock=time.monotonic):
+        self.max_buckets = max_buckets
+        self._clock = clock
+        self._tat = {}
+        self._lock = threading.Lock()
+
+    def take(self, key, interval, tolerance, cost=1):
+        """Takes `cost` tokens. Returns 0.0 if they were there, else seconds until they are."""
+        now = self._clock()
+        with self._lock:
+            tat = max(self._tat.get(key, now), now) + interval * cost
+            wait = tat - tolerance - now
+            if wait > ROUNDING_SECONDS:
+                return wait
+            self._tat[key] = tat
+            if len(self._tat) > self.max_buckets:
+                self._sweep(now)
+        return 0.0
+
+    def refund(self, key, interval, cost=1):
+        """Gives back `cost` tokens taken from a bucket."""
+        with self._lock:
+            if key in self._tat:
+                self._tat[key] -= interval * cost
+
+    def _sweep(self, now):
+        # A bucket whose arrival time has passed is full, the same as no bucket.
+        self._tat = {key: tat for key, tat in self._tat.items() if tat > now}
+
+
+class DynamoDBBackend:
+    """
+    Buckets as items {bucket, tat, expires_at} shared by all replicas. The
+    arrival time is read and written back under a condition on its old
+    value, retried when another replica got there first. Configure TTL on
+    `expires_at` so idle buckets are deleted.
+    """
+
+    RETRIES = 3
+
+    def __init__(self, table, clock=time.time):
+        self.table = table
+        self._clock = clock
+
+    def take(self, key, interval, tolerance, cost=1):
+        try:
+            for _ in range(self.RETRIES):
+                wait = self._take(key, interval, tolerance, cost)
+                if wait is not None:
+                    return wait
+        except (BotoCoreError, ClientError) as e:
+            print(f"Rate limit check for {key} failed: {e}")
+        BACKEND_ERRORS.inc()
+        return 0.0
+
+    def refund(self, key, interval, cost=1):
+        try:
+            for _ in range(self.RETRIES):
+                item = self.table.get_item(Key={"bucket": key}, ConsistentRead=True).get("Item")
+                if item is None or self._store(key, item, float(item["tat"]) - interval * cost):
+                    return
+            print(f"Rate limit refund for {key} lost to concurrent updates")
+        except (BotoCoreError, ClientError) as e:
+            # The client is only charged for a request that was rejected anyway.
+            print(f"Rate limit refund for {key} failed: {e}")
+
+    def _take(self, key, interval, tolerance, cost):
+        item = self.table.get_item(Key={"bucket": key}, ConsistentRead=True).get("Item")
+        now = self._clock()
+        stored = float(item["tat"]) if item else None
+        tat = max(stored or now, now) + interval * cost
+        wait = tat - tolerance - now
+        if wait > ROUNDING_SECONDS:
+            return wait
+        return 0.0 if self._store(key, item, tat) else None
+
+    def _store(self, key, item, tat):
+        """Writes a new arrival time if `item` is still the stored one. Returns False if it was not."""
+        try:
+            self.table.put_item(
+                Item={"bucket": key, "tat": str(tat), "expires_at": math.ceil(tat) + 60},
+                ConditionExpression="attribute_not_exists(tat)" if item is None else "tat = :old",
+                **({"ExpressionAttributeValues": {":old": item["tat"]}} if item is not None else {}),
+            )
+        except ClientError as e:
+            if e.response["Error"]["Code"] != "ConditionalCheckFailedException":
+                raise
+            return False
+        return True
+
+
+def backend_from_env():
+    if RATE_LIMIT_BACKEND == "memory":
+        return MemoryBackend()
+    if RATE_LIMIT_BACKEND == "dynamodb":
+        region = os.environ.get('AWS_REGION', 'us-east-1')
+        return DynamoDBBackend(aws.resource('dynamodb', region_name=region).Table(RATE_LIMIT_TABLE_NAME))
+    raise ValueError(f"Unknown RATE_LIMIT_BACKEND {RATE_LIMIT_BACKEND!r}")
+
+
+_default_backend = None
+
+
+def default_backend():
+    """The process-wide backend chosen by RATE_LIMIT_BACKEND."""
+    global _default_backend
+    if _default_backend is None:
+        _default_backend = backend_from_env()
+    return _default_backend
+
+
+# ----------------------------------------------------------------
+#  Limiter
+# ----------------------------------------------------------------
+def client_ip():
+    """The client address, taken from X-Forwarded-For behind TRUSTED_PROXIES proxies."""
+    environ = request.environ
+    if TRUSTED_PROXIES:
+        hops = environ.get("HTTP_X_FORWARDED_FOR", "").split(",")
+        if len(hops) >= TRUSTED_PROXIES:
+            hop = hops[-TRUSTED_PROXIES].strip()
+            if hop:
+                return hop
+    return environ.get("REMOTE_ADDR") or "unknown"
+
+
+class RateLimiter:
+    """
+    The limits of one endpoint (`name`): per client IP, per user and in
+    total. Each is a spec string as for Limit.parse, or None.
+    """
+
+    def __init__(self, name, per_ip=None, per_user=None, total=None, backend=None):
+        self.name = name
+        self.limits = {
+            scope: limit for scope, limit in (
+                ("ip", Limit.parse(per_ip)), ("user", Limit.parse(per_user)), ("total", Limit.parse(total)),
+            ) if limit is not None and RATE_LIMIT_ENABLED
+        }
+        self.backend = backend or default_backend()
+        # (scope, key prefix, limit) in checking order; the total's prefix is its key.
+        self._buckets = [(scope, f"{name}:{scope}" if scope == "total" else f"{name}:{scope}:", limit)
+                         for scope, limit in self.limits.items()]
+
+    def check(self, user=None, cost=1):
+        """
+        Counts a request (of `cost` tokens, at most a full bucket). Returns
+        None if it may proceed, or the 429 response to send. The per-user
+        limit applies when a `user` is given. A rejected request is not
+        counted: tokens already taken from earlier buckets are refunded.
+        """
+        taken = []
+        for scope, prefix, limit in self._buckets:
+            if scope == "ip":
+                key = prefix + client_ip()
+            elif scope == "user":
+                if user is None:
+                    continue
+                key = prefix + user
+            else:
+                key = prefix
+            tokens = min(cost, limit.count)
+            wait = self.backend.take(key, limit.interval, limit.tolerance, tokens)
+            if wait > 0:
+                for taken_key, interval, taken_tokens in taken:
+                    self.backend.refund(taken_key, interval, taken_tokens)
+                REJECTED.inc(limiter=self.name, scope=scope)
+                retry_after = max(1, math.ceil(wait))
+                response = jsonify({"error": "Too many requests, please retry later",
+                                    "retry_after": retry_after})
+                response.status_code = 429
+                response.headers["Retry-After"] = str(retry_after)
+                return response
+            taken.append((key, limit.interval, tokens))
+        return None
+
+    def __call__(self, view):
+        """Decorates a view with the per-IP and total limits."""
+        @functools.wraps(view)
+        def limited(*args, **kwargs):
+            response = self.check()
+            if response is not None:
+                return response
+            return view(*args, **kwargs)
+        return limited
@@ -0,0 +1,257 @@
+"""
+Liveness, readiness and dependency health, kept apart:
+
+  GET /health       the process is up and serving HTTP (liveness probe)
+  GET /ready        200 when the process should get traffic, else 503 with
+                    the reasons (readiness probe)
+  GET /health/deep  every dependency probe's last result (status, latency,
+                    age, consecutive failures, details) and the worker's
+                    saturation; 200/503 like /ready
+
+Dependency probes (JWKS loaded and fresh, DescribeTable per table,
+Cognito reachable) run on one background thread per process, each every
+`interval` seconds and every PROBE_STARTUP_INTERVAL until it has passed
+once (non-critical probes only start once the critical ones have).
+Table probes run every TABLE_PROBE_INTERVAL (60s) instead: every worker
+of every replica describes every table, so at PROBE_INTERVAL a fleet
+sends a steady stream of control-plane calls for tables whose state
+rarely changes. Requests that hit a missing table fail, and show in the
+error metrics, long before the probe would notice.
+Both endpoints only read the cached results, so answering a load
+balancer never waits on DynamoDB or Cognito. The first round also builds
+the lazy AWS clients (lifecycle.FAST_START) before traffic arrives.
+
+The process is ready when
+
+  * every critical probe has passed at least once and none has failed
+    READY_FAILURE_THRESHOLD times in a row, so one slow DescribeTable does
+    not pull a pod out of rotation;
+  * it is not shutting down; and
+  * it is not saturated: requests doing work on a request thread
+    (streamed bodies included) are below READY_MAX_UTILIZATION of the
+    threads per worker (lifecycle.worker_capacity) that are not parked in
+    a long-poll or SSE wait (instrumentation.parked). Parked requests
+    only shrink the capacity, and the services cap how many may park, so
+    idle waiters alone never make a pod unready. The probe request counts
+    itself, so at the default 1.0 a worker reports not ready when the
+    probe got its last free thread. 0 disables the check. Kubernetes only
+    acts on consecutive failures (failureThreshold), so a momentary peak
+    does not take a pod out of rotation.
+
+Results are per process: a probe describes the worker that answered it.
+Like /metrics, /health/deep requires METRICS_AUTH_TOKEN when it is set,
+since it names tables and carries error messages.
+"""
+import os
+import threading
+import time
+
+from flask import jsonify
+
+from common import aws, instrumentation, lifecycle, metrics
+
+PROBE_INTERVAL = float(os.environ.get('PROBE_INTERVAL', 5))
+TABLE_PROBE_INTERVAL = float(os.environ.get('TABLE_PROBE_INTERVAL', 60))
+PROBE_STARTUP_INTERVAL = float(os.environ.get('PROBE_STARTUP_INTERVAL', 0.2))
+COGNITO_PROBE_INTERVAL = float(os.environ.get('COGNITO_PROBE_INTERVAL', 30))
+READY_FAILURE_THRESHOLD = int(os.environ.get('READY_FAILURE_THRESHOLD', 3))
+READY_MAX_UTILIZATION = float(os.environ.get('READY_MAX_UTILIZATION', 1.0))
+# Cognito keys are served with a one hour max-age; twice that without a
+# successful refresh means the refresh thread is stuck or Cognito is down.
+JWKS_STALE_AFTER = float(os.environ.get('JWKS_STALE_AFTER', 7200))
+
+PROBE_UP = metrics.gauge(
+    "dependency_up", "1 if the dependency's last probe passed, else 0", ["probe"]
+)
+PROBE_DURATION = metrics.histogram(
+    "dependency_probe_duration_seconds", "Dependency probe latency", ["probe"]
+)
+
+
+class Probe:
+    def __init__(self, name, func, interval, critical):
+        self.name = name
+        self.func = func
+        self.interval = interval
+        self.critical = critical
+        self.status = "pending"
+        self.passed = False      # has passed at least once
+        self.failures = 0        # consecutive
+        self.error = None
+        self.details = {}
+        self.latency_ms = None
+        self.checked_at = None
+        self.due = 0.0
+
+    @property
+    def healthy(self):
+        return self.passed and self.failures < READY_FAILURE_THRESHOLD
+
+    def run(self):
+        start = time.perf_counter()
+        try:
+            details = self.func() or {}
+        except Exception as e:
+            self.status, self.error = "failing", str(e) or type(e).__name__
+            self.failures += 1
+        else:
+            self.status, self.error, self.details = "ok", None, details
+            self.failures = 0
+            self.passed = True
+        elapsed = time.perf_counter() - start
+        self.latency_ms = round(elapsed * 1000, 1)
+        self.checked_at = time.time()
+        self.due = time.monotonic() + (self.interval if self.passed else PROBE_STARTUP_INTERVAL)
+        PROBE_UP.set(int(self.status == "ok"), probe=self.name)
+        PROBE_DURATION.observe(elapsed, probe=self.name)
+
+    def report(self):
+        return {
+            "status": self.status,
+            "critical": self.critical,
+            "latency_ms": self.latency_ms,
+            "age_s": round(time.time() - self.checked_at, 1) if self.checked_at else None,
+            "consecutive_failures": self.failures,
+            "error": self.error,
+            **self.details,
+        }
+
+
+class Readiness:
+    def __init__(self):
+        self.probes = {}
+        self.started_at = time.monotonic()
+        self.ready_after = None  # seconds from startup until first ready
+        self._pid = None
+
+    def probe(self, name, func, interval=None, critical=True):
+        """Registers `func` (returns a dict of details or None, raises on failure)."""
+        self.probes[name] = Probe(name, func, interval or PROBE_INTERVAL, critical)
+        return func
+
+    def run_due(self):
+        """Runs the probes that are due. Returns seconds until the next one is."""
+        # Non-critical probes wait until the critical ones have passed, so they
+        # do not delay readiness at startup.
+        starting = not all(probe.passed for probe in self.probes.values() if probe.critical)
+        for probe in self.probes.values():
+            if probe.due <= time.monotonic() and (probe.critical or not starting):
+                probe.run()
+        if self.ready_after is None and self.state()[0]:
+            self.ready_after = time.monotonic() - self.started_at
+            print(f"Ready after {self.ready_after:.2f}s")
+        return min((p.due for p in self.probes.values()), default=time.monotonic() + PROBE_INTERVAL) \
+            - time.monotonic()
+
+    def start(self):
+        """Starts the prober thread (once per process)."""
+        if self._pid == os.getpid():
+            return
+        self._pid = os.getpid()
+
+        def run():
+            while not lifecycle.shutting_down.is_set():
+                lifecycle.shutting_down.wait(max(self.run_due(), 0.05))
+
+        threading.Thread(target=run, name="readiness-probes", daemon=True).start()
+
+    def state(self):
+        """Returns (ready, reasons) from the cached probe results; does no I/O."""
+        reasons = [
+            f"{probe.name}: {probe.error or probe.status}"
+            for probe in self.probes.values() if probe.critical and not probe.healthy
+        ]
+        if lifecycle.shutting_down.is_set():
+            reasons.append("shutting down")
+        utilization = saturation()["utilization"]
+        if READY_MAX_UTILIZATION and utilization is not None and utilization >= READY_MAX_UTILIZATION:
+            reasons.append(f"saturated: utilization {utilization}")
+        return not reasons, reasons
+
+
+def saturation():
+    """Requests working in this worker, against its threads not parked in a wait."""
+    active = instrumentation.ACTIVE.value()
+    parked = instrumentation.PARKED.value()
+    capacity = lifecycle.worker_capacity
+    return {
+        "active": active,
+        "parked": parked,
+        "capacity": capacity,
+        "utilization": round(active / max(capacity - parked, 1), 3) if capacity else None,
+    }
+
+
+# ----------------------------------------------------------------
+#  Common probes
+# ----------------------------------------------------------------
+def jwks_probe(verifier):
+    """Keys are loaded; reports their age and flags them stale (not failing)."""
+    jwks = verifier.jwks
+
+    def probe():
+        if not jwks.loaded:
+            raise RuntimeError(f"JWKS not loaded: {jwks.last_error or 'pending'}")
+        age = time.time() - jwks.last_refresh
+        return {
+            "keys": jwks.key_count,
+            "refreshed_s_ago": round(age),
+            "stale": age > JWKS_STALE_AFTER,
+            "last_refresh_error": jwks.last_error,
+        }
+    return probe
+
+
+def table_probe(table):
+    """DescribeTable answers and the table is usable (building lazy resources on the way)."""
+    def probe():
+        table.load()
+        if table.table_status not in ("ACTIVE", "UPDATING"):
+            raise RuntimeError(f"table is {table.table_status}")
+        return {"table_status": table.table_status}
+    return probe
+
+
+def cognito_probe(verifier, *clients):
+    """Cognito answers: fetches the pool's JWKS, after building the given clients."""
+    def probe():
+        aws.warm(*clients)
+        return {"jwks_keys": verifier.jwks.probe()}
+    return probe
+
+
+def add_table_probes(readiness, tables):
+    """One critical probe per {table name: table}, named dynamodb:<name>, every TABLE_PROBE_INTERVAL."""
+    for name, table in tables.items():
+        readiness.probe(f"dynamodb:{name}", table_probe(table), interval=TABLE_PROBE_INTERVAL)
+
+
+def add_readiness_route(app, readiness):
+    """Registers GET /ready and /health/deep and starts the prober (again in each forked worker)."""
+
+    @app.route("/ready", methods=["GET"])
+    def ready():
+        ok, reasons = readiness.state()
+        checks = {name: probe.status for name, probe in readiness.probes.items()}
+        return jsonify({"ready": ok, "reasons": reasons, "checks": checks}), 200 if ok else 503
+
+    @app.route("/health/deep", methods=["GET"])
+    def deep_health():
+        if not instrumentation.metrics_authorized():
+            return jsonify({"error": "Unauthorized"}), 401
+        ok, reasons = readiness.state()
+        return jsonify({
+            "ready": ok,
+            "reasons": reasons,
+            "pid": os.getpid(),
+            "uptime_s": round(time.monotonic() - readiness.started_at, 1),
+            "ready_after_s": None if readiness.ready_after is None else round(readiness.ready_after, 2),
+            "saturation": saturation(),
+            "probes": {name: probe.report() for name, probe in readiness.probes.items()},
+        }), 200 if ok else 503
+
+    # A preloading master only imports the app; its workers start probing after the fork.
+    if not lifecycle.preloaded:
+        readiness.start()
+    lifecycle.after_fork(readiness.start)
+    return readiness
@@ -0,0 +1,91 @@
+"""
+Per-process request coalescing ("single-flight") for hot reads.
+
+Concurrent calls of SingleFlight.do() with the same key share one
+execution: the first caller (the leader) runs the function, the others
+wait for it and get the same result, or the same exception. With a
+`window`, a successful result is also reused for that many seconds after
+it completes, which absorbs bursts that arrive just after the call.
+
+Shared results are the same object for every caller, so they must be
+treated as read-only.
+
+Metrics, labelled with the flight's name:
+
+  singleflight_requests_total{flight, result}   leader, shared or cached;
+      the coalescing ratio is (shared + cached) / all
+  singleflight_saved_read_units_total{flight}   DynamoDB read units the
+      leader consumed, counted again for every caller that reused them
+"""
+import threading
+import time
+
+from common import aws, metrics
+from common.cache import TTLCache
+
+REQUESTS = metrics.counter(
+    "singleflight_requests_total", "Coalesced reads by outcome", ["flight", "result"]
+)
+SAVED_READ_UNITS = metrics.counter(
+    "singleflight_saved_read_units_total",
+    "DynamoDB read capacity not consumed thanks to coalescing", ["flight"]
+)
+
+
+class _Call:
+    __slots__ = ("done", "value", "error", "units")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error = None
+        self.units = 0.0
+
+
+class SingleFlight:
+    def __init__(self, name, window=0.0, maxsize=1024):
+        self.name = name
+        self.window = window
+        self._calls = {}
+        self._lock = threading.Lock()
+        self._recent = TTLCache(maxsize) if window > 0 else None
+
+    def do(self, key, fn):
+        """Returns fn(), shared with concurrent (and, with a window, recent) callers of `key`."""
+        if self._recent is not None:
+            call = self._recent.get(key)
+            if call is not None:
+                return self._reuse(call, "cached")
+
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+        if not leader:
+            call.done.wait()
+            return self._reuse(call, "shared")
+
+        REQUESTS.inc(flight=self.name, result="leader")
+        try:
+            with aws.capacity_meter() as usage:
+                call.value = fn()
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            call.units = usage.units
+            if call.error is None and self._recent is not None:
+                self._recent.set(key, call, time.time() + self.window)
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.value
+
+    def _reuse(self, call, result):
+        REQUESTS.inc(flight=self.name, result=result)
+        if call.error is not None:
+            raise call.error
+        if call.units:
+            SAVED_READ_UNITS.inc(call.units, flight=self.name)
+        return call.value
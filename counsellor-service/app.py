@@ -2,16 +2,26 @@ from flask import Flask, request, jsonify
 from flask_cors import CORS
 import uuid
 import os
-import boto3
-import requests
-import datetime
-from jose import jwk, jwt
-from jose.utils import base64url_decode
 from botocore.exceptions import ClientError
-from boto3.dynamodb.conditions import Attr  # For filter expressions
+
+from common import aws, lifecycle
+from common.auth import CognitoTokenVerifier
+from common.directory import CounsellorDirectory
+from common.http import add_response_middleware, json_with_etag, stream_json
+from common.instrumentation import instrument_app
+from common.json_provider import DynamoJSONProvider
+from common.pagination import check_start_key, page_after, page_payload, parse_page_args
+from common.readiness import (
+    COGNITO_PROBE_INTERVAL, Readiness, add_readiness_route, add_table_probes, cognito_probe, jwks_probe
+)
+from search_index import CounsellorSearchIndex
 
 app = Flask(__name__)
+# Serializes DynamoDB Decimals, sets and binaries, with orjson when available.
+app.json = DynamoJSONProvider(app)
 CORS(app)
+instrument_app(app)
+add_response_middleware(app)
 
 # ----------------------------------------------------------------
 #  Environment / AWS Config
@@ -22,65 +32,47 @@ USERS_TABLE_NAME = os.environ.get('USERS_TABLE_NAME', 'Users')
 COGNITO_USER_POOL_ID = os.environ.get('COGNITO_USER_POOL_ID')
 COGNITO_USER_POOL_CLIENT_ID = os.environ.get('COGNITO_USER_POOL_CLIENT_ID')
 
-JWKS_URL = f"https://cognito-idp.{AWS_REGION}.amazonaws.com/{COGNITO_USER_POOL_ID}/.well-known/jwks.json"
-JWKS = None
-
-dynamodb = boto3.resource('dynamodb', region_name=AWS_REGION)
+dynamodb = aws.resource('dynamodb', region_name=AWS_REGION)
 users_table = dynamodb.Table(USERS_TABLE_NAME)
 
-@app.before_first_request
-def load_jwks():
-    global JWKS
-    try:
-        resp = requests.get(JWKS_URL)
-        resp.raise_for_status()
-        JWKS = resp.json()["keys"]
-        print("JWKS loaded successfully.")
-    except Exception as e:
-        print(f"Failed to load JWKS from {JWKS_URL}: {e}")
+# Counsellors change rarely; serve them from a TTL cache fed by the profile_type GSI.
+counsellor_directory = CounsellorDirectory(users_table)
+# Specialization and name/specialization prefix lookups, kept in step with the directory.
+search_index = CounsellorSearchIndex()
+counsellor_directory.listeners.append(search_index)
 
-def verify_cognito_token(token):
-    global JWKS
-    if not JWKS:
-        load_jwks()
-    headers = jwt.get_unverified_header(token)
-    kid = headers.get('kid')
-    key_index = None
-    for i, key in enumerate(JWKS):
-        if kid == key['kid']:
-            key_index = i
-            break
-    if key_index is None:
-        raise ValueError("Public key not found in JWKS")
-    public_key = jwk.construct(JWKS[key_index])
-    message, encoded_signature = token.rsplit('.', 1)
-    decoded_signature = base64url_decode(encoded_signature.encode('utf-8'))
-    if not public_key.verify(message.encode("utf8"), decoded_signature):
-        raise ValueError("Signature verification failed")
-    claims = jwt.get_unverified_claims(token)
-    if claims['exp'] < datetime.datetime.utcnow().timestamp():
-        raise ValueError("Token is expired")
-    if 'aud' not in claims:
-        raise ValueError("Token does not contain an 'aud' claim")
-    if claims['aud'] != COGNITO_USER_POOL_CLIENT_ID:
-        raise ValueError("Token was not issued for this audience")
-    iss = f"https://cognito-idp.{AWS_REGION}.amazonaws.com/{COGNITO_USER_POOL_ID}"
-    if claims.get('iss') != iss:
-        raise ValueError("Token issuer mismatch")
-    return claims
+token_verifier = CognitoTokenVerifier(
+    AWS_REGION, COGNITO_USER_POOL_ID, COGNITO_USER_POOL_CLIENT_ID,
+    cache_size=int(os.environ.get('TOKEN_CACHE_SIZE', 1024)),
+    jwks_url=os.environ.get('COGNITO_JWKS_URL')  # override for a local JWKS file or stub
+)
+verify_cognito_token = token_verifier.verify
+token_verifier.jwks.start()
+lifecycle.after_fork(token_verifier.jwks.start)
 
 # ----------------------------------------------------------------
-#  Health Check
+#  Health Check (liveness) and readiness
 # ----------------------------------------------------------------
 @app.route("/health", methods=["GET"])
 def health():
     return "Counsellors Service is healthy!", 200
 
+readiness = Readiness()
+readiness.probe("jwks", jwks_probe(token_verifier))
+add_table_probes(readiness, {USERS_TABLE_NAME: users_table})
+readiness.probe("cognito", cognito_probe(token_verifier), interval=COGNITO_PROBE_INTERVAL, critical=False)
+add_readiness_route(app, readiness)
+
 @app.route("/counsellors", methods=["GET"])
 def list_counsellors():
     """
     Retrieves counsellors from the Users table where profile_type equals 'counsellor'.
     A valid Cognito ID token must be provided in the Authorization header.
+    Pass `limit` (and the returned `next_cursor` as `cursor`) to page through results.
+    Responses carry an ETag; a matching If-None-Match gets 304.
+    The unpaginated list is streamed; ?format=ndjson returns one counsellor per line.
+    Filter with `specialization` (exact) and/or `q` (name/specialization
+    word prefixes, all of which must match).
     """
     auth_header = request.headers.get('Authorization')
     if not auth_header:
@@ -94,11 +86,27 @@ def list_counsellors():
     except Exception as e:
         return jsonify({"error": f"Token verification failed: {e}"}), 401
     try:
-        response = users_table.scan(
-            FilterExpression=Attr("profile_type").eq("counsellor")
-        )
-        counsellors = response.get("Items", [])
-        return jsonify(counsellors), 200
+        paginated, limit, position = parse_page_args(request.args)
+        check_start_key(position, ("user_id",))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    specialization = request.args.get("specialization")
+    query = request.args.get("q")
+    after_id = position.get("user_id") if position else None
+    try:
+        if specialization or query:
+            counsellor_directory.ensure_loaded()
+            matches = search_index.search(specialization, query)
+            if not paginated:
+                return json_with_etag(matches)
+            ids = [c["user_id"] for c in matches]
+            page, last_id = page_after(matches, ids, limit, after_id)
+            return json_with_etag(page_payload(page, limit, last_id and {"user_id": last_id}))
+        if not paginated:
+            counsellors, etag = counsellor_directory.snapshot()
+            return stream_json(counsellors, etag)
+        page, last_id = counsellor_directory.page(limit, after_id)
+        return json_with_etag(page_payload(page, limit, last_id and {"user_id": last_id}))
     except Exception as e:
         return jsonify({"error": "Error fetching counsellors: " + str(e)}), 500
 
@@ -0,0 +1,105 @@
+import bisect
+import re
+import threading
+
+_TOKEN_RE = re.compile(r"\w+")
+
+
+def tokenize(text):
+    return _TOKEN_RE.findall(str(text or "").lower())
+
+
+# ----------------------------------------------------------------
+#  In-memory counsellor search index
+# ----------------------------------------------------------------
+class CounsellorSearchIndex:
+    """
+    Inverted index over the counsellor directory:
+
+      specialization (normalized) -> user ids
+      name/specialization token   -> user ids, with a sorted token list
+                                     for prefix lookups via bisect
+
+    Registered as a CounsellorDirectory listener, so it is rebuilt on a
+    full reload and updated incrementally when counsellors are added.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._by_id = {}
+        self._by_specialization = {}
+        self._by_token = {}
+        self._tokens = []  # sorted keys of _by_token
+
+    @staticmethod
+    def _normalize(specialization):
+        return " ".join(tokenize(specialization))
+
+    def _remove(self, user_id):
+        old = self._by_id.pop(user_id, None)
+        if old is None:
+            return
+        spec = self._normalize(old.get("specialization"))
+        self._by_specialization.get(spec, set()).discard(user_id)
+        for token in set(tokenize(old.get("name")) + tokenize(old.get("specialization"))):
+            ids = self._by_token.get(token)
+            if ids is not None:
+                ids.discard(user_id)
+                if not ids:
+                    del self._by_token[token]
+                    del self._tokens[bisect.bisect_left(self._tokens, token)]
+
+    def _insert(self, item):
+        user_id = item["user_id"]
+        self._remove(user_id)
+        self._by_id[user_id] = item
+        spec = self._normalize(item.get("specialization"))
+        self._by_specialization.setdefault(spec, set()).add(user_id)
+        for token in set(tokenize(item.get("name")) + tokenize(item.get("specialization"))):
+            if token not in self._by_token:
+                self._by_token[token] = set()
+                bisect.insort(self._tokens, token)
+            self._by_token[token].add(user_id)
+
+    def reset(self, items):
+        with self._lock:
+            self._by_id, self._by_specialization = {}, {}
+            self._by_token, self._tokens = {}, []
+            for item in items:
+                self._insert(item)
+
+    def add(self, items):
+        with self._lock:
+            for item in items:
+                self._insert(item)
+
+    def _prefix_ids(self, prefix):
+        ids = set()
+        start = bisect.bisect_left(self._tokens, prefix)
+        for token in self._tokens[start:]:
+            if not token.startswith(prefix):
+                break
+            ids |= self._by_token[token]
+        return ids
+
+    def search(self, specialization=None, query=None):
+        """
+        Returns counsellors matching an exact specialization and/or every
+        token prefix in `query`, sorted by user_id. A filter with no tokens
+        in it (only punctuation or whitespace) matches nothing.
+        """
+        prefixes = tokenize(query)
+        if (specialization and not self._normalize(specialization)) or (query and not prefixes):
+            return []
+        with self._lock:
+            candidates = None
+            if specialization:
+                candidates = set(self._by_specialization.get(self._normalize(specialization), ()))
+            for prefix in prefixes:
+                if candidates is not None and not candidates:
+                    break
+                ids = self._prefix_ids(prefix)
+                candidates = ids if candidates is None else candidates & ids
+            if candidates is None:
+                candidates = self._by_id.keys()
+            return [self._by_id[user_id] for user_id in sorted(candidates)]
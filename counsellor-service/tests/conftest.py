@@ -0,0 +1,11 @@
+"""
+Tests import the service's modules (search_index, ...) as the service does
+when run from its directory. The directory is appended rather than
+prepended: messaging-service's tests also import a top-level `app`.
+"""
+import os
+import sys
+
+SERVICE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if SERVICE_DIR not in sys.path:
+    sys.path.append(SERVICE_DIR)
@@ -0,0 +1,47 @@
+"""
+The counsellor search index: specialization and token-prefix filters, and
+filters that normalize to nothing.
+"""
+import pytest
+
+from search_index import CounsellorSearchIndex
+
+COUNSELLORS = [
+    {"user_id": "c1", "name": "Ada Lovelace", "specialization": "Anxiety"},
+    {"user_id": "c2", "name": "Alan Turing", "specialization": "Grief & Loss"},
+    {"user_id": "c3", "name": "Grace Hopper", "specialization": "anxiety"},
+    {"user_id": "c4", "name": "No Specialty"},
+]
+
+
+@pytest.fixture
+def index():
+    index = CounsellorSearchIndex()
+    index.reset(COUNSELLORS)
+    return index
+
+
+def ids(results):
+    return [c["user_id"] for c in results]
+
+
+def test_filters(index):
+    assert ids(index.search("ANXIETY")) == ["c1", "c3"]
+    assert ids(index.search("grief loss")) == ["c2"]
+    assert ids(index.search(query="a")) == ["c1", "c2", "c3"]
+    assert ids(index.search(query="gr ho")) == ["c3"]
+    assert ids(index.search("anxiety", query="lov")) == ["c1"]
+    assert ids(index.search()) == ["c1", "c2", "c3", "c4"]
+
+
+@pytest.mark.parametrize("specialization, query", [
+    (None, "!!!"), (None, "   "), (None, "-"), ("anxiety", "?"), ("&", None), (" ", None),
+])
+def test_filters_without_tokens_match_nothing(index, specialization, query):
+    assert index.search(specialization, query) == []
+
+
+def test_updates(index):
+    index.add([{"user_id": "c3", "name": "Grace Hopper", "specialization": "Grief"}])
+    assert ids(index.search("anxiety")) == ["c1"]
+    assert ids(index.search(query="grie")) == ["c2", "c3"]
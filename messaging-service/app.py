@@ -1,16 +1,39 @@
-from flask import Flask, request, jsonify
+from flask import Flask, Response, request, jsonify, stream_with_context
 from flask_cors import CORS
+import itertools
 import os
+import threading
 import uuid
 import datetime
-import boto3
-import requests
-from jose import jwk, jwt
-from jose.utils import base64url_decode
+import time
 from botocore.exceptions import ClientError
 
+from common import aws, lifecycle
+from common.auth import CognitoTokenVerifier
+from common.http import add_response_middleware, stream_json
+from common.instrumentation import instrument_app, parked
+from common.json_provider import DynamoJSONProvider
+from common.pagination import (
+    MAX_PAGE_LIMIT, decode_cursor, encode_cursor, page_payload, page_response, parse_page_args, take_page
+)
+from common.ratelimit import RateLimiter
+from common.readiness import (
+    COGNITO_PROBE_INTERVAL, Readiness, add_readiness_route, add_table_probes, cognito_probe, jwks_probe
+)
+from common.singleflight import SingleFlight
+import conversations
+import messages
+import scheduling
+import sessions
+import write_behind
+from broker import create_broker
+
 app = Flask(__name__)
+# Serializes DynamoDB Decimals, sets and binaries, with orjson when available.
+app.json = DynamoJSONProvider(app)
 CORS(app)
+instrument_app(app)
+add_response_middleware(app)
 
 # ----------------------------------------------------------------
 #  Environment / AWS Config
@@ -18,72 +41,90 @@ CORS(app)
 AWS_REGION = os.environ.get('AWS_REGION', 'us-east-1')
 MESSAGES_TABLE_NAME = os.environ.get('MESSAGES_TABLE_NAME', 'Messages')
 SESSIONS_TABLE_NAME = os.environ.get('SESSIONS_TABLE_NAME', 'Sessions')
+SESSION_SLOTS_TABLE_NAME = os.environ.get('SESSION_SLOTS_TABLE_NAME', 'SessionSlots')
+CONVERSATIONS_TABLE_NAME = os.environ.get('CONVERSATIONS_TABLE_NAME', 'Conversations')
+# Upper bound for GET /messages?wait=; keep below the ingress read timeout.
+MAX_LONG_POLL_SECONDS = float(os.environ.get('MAX_LONG_POLL_SECONDS', 25))
+# Long-polls and /events streams that may wait at once per worker, so idle
+# waiters never take every request thread (default: half of them).
+MAX_WAITERS = int(os.environ.get('MAX_WAITERS', (lifecycle.worker_capacity or 32) // 2))
+# Seconds a long-poll turned away by MAX_WAITERS is told to wait before polling again.
+WAITERS_FULL_RETRY_SECONDS = int(os.environ.get('WAITERS_FULL_RETRY_SECONDS', 5))
+# Items per DynamoDB page while streaming an unpaginated list; bounds memory and time to first byte.
+STREAM_PAGE_SIZE = int(os.environ.get('STREAM_PAGE_SIZE', 500))
+# 'sync' stores each POST /messages before replying; 'write-behind' queues it and replies 202.
+MESSAGE_WRITE_MODE = os.environ.get('MESSAGE_WRITE_MODE', 'sync')
+# Bounds for POST /messages/batch and POST /messages/batch-get.
+MAX_BATCH_MESSAGES = int(os.environ.get('MAX_BATCH_MESSAGES', 500))
+MAX_BATCH_CONVERSATIONS = int(os.environ.get('MAX_BATCH_CONVERSATIONS', 50))
+# Identical concurrent GET /sessions share one Query; a window (ms) also reuses
+# the result briefly after it completes. 0 = coalesce in-flight reads only.
+SESSIONS_COALESCE_WINDOW = float(os.environ.get('SESSIONS_COALESCE_WINDOW_MS', 0)) / 1000
+# Comment lines sent on idle /events streams so proxies keep them open.
+SSE_HEARTBEAT_SECONDS = float(os.environ.get('SSE_HEARTBEAT_SECONDS', 15))
 
 COGNITO_USER_POOL_ID = os.environ.get('COGNITO_USER_POOL_ID')
 COGNITO_USER_POOL_CLIENT_ID = os.environ.get('COGNITO_USER_POOL_CLIENT_ID')
 
-JWKS_URL = f"https://cognito-idp.{AWS_REGION}.amazonaws.com/{COGNITO_USER_POOL_ID}/.well-known/jwks.json"
-JWKS = None
-
-dynamodb = boto3.resource('dynamodb', region_name=AWS_REGION)
+dynamodb = aws.resource('dynamodb', region_name=AWS_REGION)
 messages_table = dynamodb.Table(MESSAGES_TABLE_NAME)
 sessions_table = dynamodb.Table(SESSIONS_TABLE_NAME)
-
-# ----------------------------------------------------------------
-#  Load JWKS on startup
-# ----------------------------------------------------------------
-@app.before_first_request
-def load_jwks():
-    global JWKS
+session_slots_table = dynamodb.Table(SESSION_SLOTS_TABLE_NAME)
+conversations_table = dynamodb.Table(CONVERSATIONS_TABLE_NAME)
+
+# Books sessions against a per-counsellor slot index so double bookings fail atomically.
+scheduler = scheduling.Scheduler(sessions_table, session_slots_table)
+sessions_flight = SingleFlight("sessions", window=SESSIONS_COALESCE_WINDOW)
+# Messages a user may send per token bucket, singly or in batches (each
+# message counts); see common/ratelimit.py. "" turns the limit off.
+message_limiter = RateLimiter("messages", per_user=os.environ.get('MESSAGE_RATE_LIMIT_PER_USER', '120/minute'))
+
+# Fans out message and session events to /events streams and long-polls.
+event_broker = create_broker(app.json.dumps)
+waiter_slots = threading.BoundedSemaphore(MAX_WAITERS) if MAX_WAITERS > 0 else None
+lifecycle.after_fork(event_broker.after_fork)
+# End open streams and long-polls on SIGTERM; clients reconnect to another pod.
+lifecycle.on_shutdown(event_broker.shutdown)
+
+def publish_message(message):
+    event_broker.publish_many([message["sender_id"], message["receiver_id"]],
+                              {"type": "message", "data": message})
+
+def record_conversations(stored):
+    # Summaries are derived data: a failed update is logged, not returned to the
+    # sender, and migrations/backfill_conversations.py rebuilds them.
     try:
-        resp = requests.get(JWKS_URL)
-        resp.raise_for_status()
-        JWKS = resp.json()["keys"]
-        print("Messaging-Service: JWKS loaded.")
+        conversations.record_messages(conversations_table, stored)
     except Exception as e:
-        print(f"Failed to load JWKS: {e}")
+        print(f"Updating conversation summaries failed: {e}")
+
+def messages_written(stored):
+    # One summary update per conversation touched, however many messages it got.
+    record_conversations(stored)
+    for message in stored:
+        publish_message(message)
+
+# Optional write-behind queue for POST /messages; drained on shutdown.
+message_writer = None
+if MESSAGE_WRITE_MODE == "write-behind":
+    message_writer = write_behind.MessageWriter(messages_table, on_written=messages_written)
+    message_writer.start()
+    lifecycle.after_fork(message_writer.start)
+    lifecycle.on_shutdown(message_writer.close)
+elif MESSAGE_WRITE_MODE != "sync":
+    raise RuntimeError(f"Unknown MESSAGE_WRITE_MODE '{MESSAGE_WRITE_MODE}'")
 
 # ----------------------------------------------------------------
-#  Helper: verify token
+#  Token verification (JWKS refreshed in the background)
 # ----------------------------------------------------------------
-def verify_cognito_token(token):
-    global JWKS
-    if not JWKS:
-        load_jwks()
-
-    headers = jwt.get_unverified_header(token)
-    kid = headers.get('kid')
-    key_index = None
-    for i, key in enumerate(JWKS):
-        if kid == key['kid']:
-            key_index = i
-            break
-    if key_index is None:
-        raise ValueError("Public key not found in JWKS")
-
-    public_key = jwk.construct(JWKS[key_index])
-    message, encoded_signature = token.rsplit('.', 1)
-    decoded_signature = base64url_decode(encoded_signature.encode('utf-8'))
-
-    if not public_key.verify(message.encode("utf8"), decoded_signature):
-        raise ValueError("Signature verification failed")
-
-    claims = jwt.get_unverified_claims(token)
-    now = datetime.datetime.utcnow().timestamp()
-    if claims['exp'] < now:
-        raise ValueError("Token is expired")
-
-    if 'aud' not in claims:
-        raise ValueError("Token does not contain an 'aud' claim")
-
-    if claims['aud'] != COGNITO_USER_POOL_CLIENT_ID:
-        raise ValueError("Token was not issued for this audience")
-
-    iss = f"https://cognito-idp.{AWS_REGION}.amazonaws.com/{COGNITO_USER_POOL_ID}"
-    if claims.get('iss') != iss:
-        raise ValueError("Token issuer mismatch")
-
-    return claims
+token_verifier = CognitoTokenVerifier(
+    AWS_REGION, COGNITO_USER_POOL_ID, COGNITO_USER_POOL_CLIENT_ID,
+    cache_size=int(os.environ.get('TOKEN_CACHE_SIZE', 1024)),
+    jwks_url=os.environ.get('COGNITO_JWKS_URL')  # override for a local JWKS file or stub
+)
+verify_cognito_token = token_verifier.verify
+token_verifier.jwks.start()
+lifecycle.after_fork(token_verifier.jwks.start)
 
 def parse_bearer_token(header):
     parts = header.split()
@@ -92,12 +133,23 @@ def parse_bearer_token(header):
     return None
 
 # ----------------------------------------------------------------
-#  Health Check
+#  Health Check (liveness) and readiness
 # ----------------------------------------------------------------
 @app.route("/health", methods=["GET"])
 def health():
     return "Messaging Service is healthy!", 200
 
+readiness = Readiness()
+readiness.probe("jwks", jwks_probe(token_verifier))
+add_table_probes(readiness, {
+    MESSAGES_TABLE_NAME: messages_table,
+    SESSIONS_TABLE_NAME: sessions_table,
+    SESSION_SLOTS_TABLE_NAME: session_slots_table,
+    CONVERSATIONS_TABLE_NAME: conversations_table,
+})
+readiness.probe("cognito", cognito_probe(token_verifier), interval=COGNITO_PROBE_INTERVAL, critical=False)
+add_readiness_route(app, readiness)
+
 # ----------------------------------------------------------------
 #  Messages (Protected)
 # ----------------------------------------------------------------
@@ -110,24 +162,157 @@ def create_message():
         return jsonify({"error": "Missing or invalid Authorization header"}), 401
 
     try:
-        verify_cognito_token(token)
+        claims = verify_cognito_token(token)
     except Exception as e:
         return jsonify({"error": f"Token verification failed: {e}"}), 401
 
+    limited = message_limiter.check(user=claims["sub"])
+    if limited is not None:
+        return limited
+
     data = request.json
-    if not data:
+    if not isinstance(data, dict) or not data:
         return jsonify({"error": "No JSON body provided"}), 400
+    if not isinstance(data.get("sender_id"), str) or not isinstance(data.get("receiver_id"), str):
+        return jsonify({"error": "sender_id and receiver_id are required"}), 400
 
-    message_id = str(uuid.uuid4())
-    data["message_id"] = message_id
-    data["timestamp"] = datetime.datetime.utcnow().isoformat() + "Z"
+    data = messages.new_message(data)
+
+    if message_writer is not None:
+        # Stored (and published) by the flusher within MESSAGE_FLUSH_INTERVAL_MS.
+        try:
+            message_writer.submit(data)
+        except write_behind.Backpressure as e:
+            return jsonify({"error": str(e)}), 503, {"Retry-After": "1"}
+        return jsonify({"message": "Message accepted", "message_id": data["message_id"], "data": data}), 202
 
     try:
         messages_table.put_item(Item=data)
+        messages_written([data])
         return jsonify({"message": "Message created!", "data": data}), 201
     except ClientError as e:
         return jsonify({"error": f"Error saving message: {e}"}), 500
 
+@app.route("/messages/batch", methods=["POST"])
+def create_messages_batch():
+    """
+    Stores up to MAX_BATCH_MESSAGES messages in one request. The body is
+    either {"messages": [...]} or, for a broadcast, {"message": {...},
+    "receiver_ids": [...]}. Responds 201 when every message was stored,
+    otherwise 207 with a per-item status in `results` (request order).
+    """
+    auth_header = request.headers.get("Authorization", "")
+    token = parse_bearer_token(auth_header)
+    if not token:
+        return jsonify({"error": "Missing or invalid Authorization header"}), 401
+
+    try:
+        claims = verify_cognito_token(token)
+    except Exception as e:
+        return jsonify({"error": f"Token verification failed: {e}"}), 401
+
+    data = request.json
+    if not isinstance(data, dict):
+        return jsonify({"error": "No JSON body provided"}), 400
+    if "receiver_ids" in data:
+        template, receiver_ids = data.get("message"), data["receiver_ids"]
+        if not isinstance(template, dict) or not isinstance(receiver_ids, list):
+            return jsonify({"error": "A broadcast needs a 'message' object and a 'receiver_ids' list"}), 400
+        batch = [dict(template, receiver_id=receiver_id) for receiver_id in receiver_ids]
+    else:
+        batch = data.get("messages")
+        if not isinstance(batch, list):
+            return jsonify({"error": "'messages' must be a list"}), 400
+    if not batch:
+        return jsonify({"error": "The batch is empty"}), 400
+    if len(batch) > MAX_BATCH_MESSAGES:
+        return jsonify({"error": f"A batch holds at most {MAX_BATCH_MESSAGES} messages"}), 400
+
+    limited = message_limiter.check(user=claims["sub"], cost=len(batch))
+    if limited is not None:
+        return limited
+
+    results = [None] * len(batch)
+    valid = []
+    for index, item in enumerate(batch):
+        if not isinstance(item, dict) or not isinstance(item.get("sender_id"), str) \
+                or not isinstance(item.get("receiver_id"), str):
+            results[index] = {"index": index, "status": 400, "error": "sender_id and receiver_id are required"}
+        else:
+            valid.append(index)
+
+    stored = messages.new_messages([batch[index] for index in valid])
+    try:
+        failed = messages.write_batch(messages_table, stored)
+    except ClientError as e:
+        return jsonify({"error": f"Error saving messages: {e}"}), 500
+
+    written = []
+    for index, message in zip(valid, stored):
+        error = failed.get(message["message_id"])
+        if error:
+            results[index] = {"index": index, "status": 503, "error": error}
+            continue
+        results[index] = {"index": index, "status": 201, "message_id": message["message_id"],
+                          "timestamp": message["timestamp"]}
+        written.append(message)
+    messages_written(written)
+
+    created = sum(1 for r in results if r["status"] == 201)
+    return jsonify({
+        "results": results,
+        "created": created,
+        "failed": len(results) - created,
+    }), 201 if created == len(results) else 207
+
+@app.route("/messages/batch-get", methods=["POST"])
+def get_messages_batch():
+    """
+    Newest messages of several conversations in one call. Body:
+    {"user_id": ..., "peer_ids": [...], "limit": n, "cursors": {peer_id: cursor}}.
+    Each conversation comes back in the GET /messages page envelope.
+    """
+    auth_header = request.headers.get("Authorization", "")
+    token = parse_bearer_token(auth_header)
+    if not token:
+        return jsonify({"error": "Missing or invalid Authorization header"}), 401
+
+    try:
+        verify_cognito_token(token)
+    except Exception as e:
+        return jsonify({"error": f"Token verification failed: {e}"}), 401
+
+    data = request.json
+    if not isinstance(data, dict):
+        return jsonify({"error": "No JSON body provided"}), 400
+    user_id, peer_ids = data.get("user_id"), data.get("peer_ids")
+    if not isinstance(user_id, str) or not user_id:
+        return jsonify({"error": "'user_id' is required"}), 400
+    if not isinstance(peer_ids, list) or not peer_ids or not all(isinstance(p, str) for p in peer_ids):
+        return jsonify({"error": "'peer_ids' must be a non-empty list of ids"}), 400
+    if len(peer_ids) > MAX_BATCH_CONVERSATIONS:
+        return jsonify({"error": f"A batch covers at most {MAX_BATCH_CONVERSATIONS} conversations"}), 400
+    peer_ids = list(dict.fromkeys(peer_ids))
+
+    cursors = data.get("cursors") or {}
+    try:
+        _, limit, _ = parse_page_args({"limit": str(data.get("limit", MAX_PAGE_LIMIT))})
+        if not isinstance(cursors, dict):
+            raise ValueError("'cursors' must map peer ids to cursors")
+        positions = {peer_id: messages.check_position(decode_cursor(cursor), user_id, peer_id)
+                     for peer_id, cursor in cursors.items()}
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    try:
+        pages = messages.fetch_conversations(messages_table, user_id, peer_ids, limit, positions)
+    except Exception as e:
+        return jsonify({"error": f"Error fetching messages: {e}"}), 500
+    return jsonify({"conversations": {
+        peer_id: page_payload(page, limit, next_position)
+        for peer_id, (page, next_position) in pages.items()
+    }}), 200
+
 @app.route("/messages", methods=["GET"])
 def get_messages():
     # Validate token
@@ -144,14 +329,228 @@ def get_messages():
     user_id = request.args.get("userId")
     if not user_id:
         return jsonify({"error": "Missing query param 'userId'"}), 400
+    peer_id = request.args.get("peerId")
+    try:
+        paginated, limit, position = parse_page_args(request.args)
+        messages.check_position(position, user_id, peer_id)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    since = request.args.get("since")
+    if since is not None:
+        return sync_messages(user_id, peer_id, since, limit or MAX_PAGE_LIMIT)
+
+    # Newest first. Without limit/cursor the whole history is streamed as a
+    # list (NDJSON with ?format=ndjson), one DynamoDB page in memory at a time,
+    # under an ETag from the conversation summaries so an unchanged history
+    # gets a 304 without being read.
+    try:
+        if not paginated:
+            etag = conversations.history_etag(conversations_table, user_id,
+                                              peer_id and messages.conversation_id(user_id, peer_id))
+            if peer_id:
+                items = messages.iter_conversation(messages_table, user_id, peer_id,
+                                                   page_size=STREAM_PAGE_SIZE)
+            else:
+                items = messages.iter_user_messages(messages_table, user_id, page_size=STREAM_PAGE_SIZE)
+            return stream_json(items, etag)
+        if peer_id:
+            page, next_position = messages.conversation_page(messages_table, user_id, peer_id, limit, position)
+        else:
+            page, next_position = messages.user_messages_page(messages_table, user_id, limit, position)
+        return page_response(page, limit, next_position), 200
+    except Exception as e:
+        return jsonify({"error": f"Error fetching messages: {e}"}), 500
+
+def sync_messages(user_id, peer_id, since, limit):
+    """
+    Delta read for GET /messages?since=<timestamp>: returns only messages
+    newer than `since`, oldest first. With wait=<seconds>, an empty result
+    holds the request open until a message for the user is written or the
+    wait expires. Clients pass the returned next_since on the next call.
+    `items` also repeats the messages of the last MESSAGES_SYNC_OVERLAP_SECONDS
+    before `since`, so one stored late is not skipped; clients merge them
+    by message_id. `count` and `has_more` refer to the new ones.
+    When MAX_WAITERS requests are already waiting, it answers at once with
+    `retry_after` (seconds) for the client to wait before its next poll.
+    """
+    try:
+        wait = min(max(float(request.args.get("wait", 0)), 0), MAX_LONG_POLL_SECONDS)
+    except ValueError:
+        return jsonify({"error": "'wait' must be a number of seconds"}), 400
 
+    # Subscribe before the first read so a concurrent write still wakes us.
+    subscription = event_broker.subscribe(user_id)
+    retry_after = None
     try:
-        response = messages_table.scan()
-        all_messages = response.get("Items", [])
-        user_messages = [msg for msg in all_messages if msg.get("sender_id") == user_id or msg.get("receiver_id") == user_id]
-        return jsonify(user_messages), 200
+        items, new = messages.messages_since(messages_table, user_id, since, limit, peer_id)
+        if not new and wait:
+            if acquire_waiter_slot():
+                try:
+                    with parked():
+                        woken = wait_for_message(subscription, wait)
+                finally:
+                    waiter_slots.release()
+                if woken:
+                    items, new = messages.messages_since(messages_table, user_id, since, limit, peer_id)
+            else:
+                retry_after = WAITERS_FULL_RETRY_SECONDS
     except Exception as e:
         return jsonify({"error": f"Error fetching messages: {e}"}), 500
+    finally:
+        subscription.close()
+
+    payload = {
+        "items": items,
+        "count": len(new),
+        "next_since": new[-1]["timestamp"] if new else since,
+        "has_more": len(new) == limit,
+    }
+    if retry_after is not None:
+        payload["retry_after"] = retry_after
+    return jsonify(payload), 200
+
+def acquire_waiter_slot():
+    return waiter_slots is not None and waiter_slots.acquire(blocking=False)
+
+def wait_for_message(subscription, timeout):
+    deadline = time.monotonic() + timeout
+    while True:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            return False
+        event = subscription.get(timeout=remaining)
+        if event is None:
+            continue
+        if event["type"] == "message":
+            return True
+        if event["type"] == "shutdown":
+            return False
+
+# ----------------------------------------------------------------
+#  Push channel (Server-Sent Events)
+# ----------------------------------------------------------------
+@app.route("/events", methods=["GET"])
+def stream_events():
+    """
+    Streams `message` and `session` events for a user as Server-Sent Events.
+    Browsers' EventSource cannot set headers, so the token may also be
+    passed as the `access_token` query parameter. Streams share the
+    MAX_WAITERS slots with long-polls; without a free one the request gets
+    503 with Retry-After.
+    """
+    token = parse_bearer_token(request.headers.get("Authorization", "")) or request.args.get("access_token")
+    if not token:
+        return jsonify({"error": "Missing or invalid Authorization header"}), 401
+
+    try:
+        verify_cognito_token(token)
+    except Exception as e:
+        return jsonify({"error": f"Token verification failed: {e}"}), 401
+
+    user_id = request.args.get("userId")
+    if not user_id:
+        return jsonify({"error": "Missing query param 'userId'"}), 400
+
+    if not acquire_waiter_slot():
+        return jsonify({"error": "Too many open event streams, retry later"}), 503, \
+            {"Retry-After": str(WAITERS_FULL_RETRY_SECONDS)}
+    subscription = event_broker.subscribe(user_id)
+
+    def generate():
+        try:
+            yield "retry: 3000\n\n"
+            while True:
+                with parked():
+                    event = subscription.get(timeout=SSE_HEARTBEAT_SECONDS)
+                if event is None:
+                    yield ": keep-alive\n\n"
+                    continue
+                if event["type"] == "shutdown":
+                    return
+                yield f"event: {event['type']}\ndata: {app.json.dumps(event['data'])}\n\n"
+        finally:
+            subscription.close()
+
+    response = Response(
+        stream_with_context(generate()),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+    # Released on close even if the stream never started.
+    response.call_on_close(waiter_slots.release)
+    return response
+
+# ----------------------------------------------------------------
+#  Conversations (Protected)
+# ----------------------------------------------------------------
+@app.route("/conversations", methods=["GET"])
+def get_conversations():
+    """
+    A user's inbox: one summary per conversation (peer, last message
+    preview and time, unread count), most recently active first, read
+    with a single Query. Paginated with limit/cursor; streamed otherwise.
+    """
+    auth_header = request.headers.get("Authorization", "")
+    token = parse_bearer_token(auth_header)
+    if not token:
+        return jsonify({"error": "Missing or invalid Authorization header"}), 401
+
+    try:
+        verify_cognito_token(token)
+    except Exception as e:
+        return jsonify({"error": f"Token verification failed: {e}"}), 401
+
+    user_id = request.args.get("userId")
+    if not user_id:
+        return jsonify({"error": "Missing query param 'userId'"}), 400
+    try:
+        paginated, limit, position = parse_page_args(request.args)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    try:
+        items = conversations.query_inbox(conversations_table, user_id,
+                                          page_size=limit + 1 if paginated else STREAM_PAGE_SIZE,
+                                          start_key=position)
+        if not paginated:
+            return stream_json(items)
+        page, next_key = take_page(items, limit, conversations.inbox_key)
+        return page_response(page, limit, next_key), 200
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        return jsonify({"error": f"Error fetching conversations: {e}"}), 500
+
+@app.route("/conversations/<conversation_id>/read", methods=["POST"])
+def mark_conversation_read(conversation_id):
+    """
+    Resets the caller's unread count for a conversation. The id is the
+    conversation_id of its messages (URL-encoded, since it contains '#');
+    the body names the reader: {"user_id": ...}.
+    """
+    auth_header = request.headers.get("Authorization", "")
+    token = parse_bearer_token(auth_header)
+    if not token:
+        return jsonify({"error": "Missing or invalid Authorization header"}), 401
+
+    try:
+        verify_cognito_token(token)
+    except Exception as e:
+        return jsonify({"error": f"Token verification failed: {e}"}), 401
+
+    data = request.get_json(silent=True) or {}
+    user_id = data.get("user_id") or request.args.get("userId")
+    if not isinstance(user_id, str) or not user_id:
+        return jsonify({"error": "'user_id' is required"}), 400
+
+    try:
+        summary = conversations.mark_read(conversations_table, user_id, conversation_id)
+    except conversations.NotFound as e:
+        return jsonify({"error": str(e)}), 404
+    except Exception as e:
+        return jsonify({"error": f"Error updating conversation: {e}"}), 500
+    return jsonify({"message": "Conversation marked as read", "data": summary}), 200
 
 # ----------------------------------------------------------------
 #  Sessions (Protected)
@@ -178,11 +577,18 @@ def book_session():
     data["created_at"] = datetime.datetime.utcnow().isoformat() + "Z"
     # Expecting date_time and session_time to be provided separately in the JSON body.
     # For example: { "customer_id": "user@example.com", "counsellor_id": "counsellor@example.com", "date_time": "2025-04-30", "session_time": "14:00", "status": "booked" }
+    # The counsellor's slot is claimed in the same transaction; a taken slot gets 409.
     try:
-        sessions_table.put_item(Item=data)
-        return jsonify({"message": "Session booked!", "data": data}), 201
+        scheduler.book(data)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except scheduling.SlotConflict as e:
+        return jsonify({"error": str(e)}), 409
     except Exception as e:
         return jsonify({"error": f"Error booking session: {e}"}), 500
+    event_broker.publish_many([data.get("customer_id"), data.get("counsellor_id")],
+                              {"type": "session", "data": data})
+    return jsonify({"message": "Session booked!", "data": data}), 201
 
 @app.route("/sessions", methods=["GET"])
 def get_sessions():
@@ -197,22 +603,47 @@ def get_sessions():
     except Exception as e:
         return jsonify({"error": f"Token verification failed: {e}"}), 401
 
+    # One Query on the customer's (or counsellor's) date-sorted index.
+    # Optional: status, from/to (inclusive YYYY-MM-DD); both ids = sessions between them.
+    # Without limit/cursor the result is streamed like GET /messages.
+    # Concurrent identical reads (same normalized query) share one Query of the
+    # first page; the rest of a longer stream is read per request. A stream that
+    # fits in its first page gets an ETag over that page, so repeats can 304.
     customer_id = request.args.get("customerId")
     counsellor_id = request.args.get("counsellorId")
+    status = request.args.get("status")
+    try:
+        paginated, limit, position = parse_page_args(request.args)
+        start = request.args.get("from")
+        end = request.args.get("to")
+        start = start and scheduling.parse_date(start, "from").isoformat()
+        end = end and scheduling.parse_date(end, "to").isoformat()
+        page_limit = limit if paginated else STREAM_PAGE_SIZE
+
+        def query(start_key):
+            return sessions.query_sessions(
+                sessions_table, customer_id, counsellor_id, status=status, start=start, end=end,
+                page_size=page_limit + 1, start_key=start_key
+            )
+        query(position)  # lazy: raises for missing ids without calling DynamoDB
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    def first_page():
+        items, key_of = query(position)
+        page, next_key = take_page(items, page_limit, key_of)
+        complete = not paginated and not next_key
+        return page, next_key, sessions.sessions_etag(page) if complete else None
+
+    key = (customer_id, counsellor_id, status, start, end, paginated, page_limit, encode_cursor(position))
     try:
-        response = sessions_table.scan()
-        all_sessions = response.get("Items", [])
-        filtered = []
-        for sess in all_sessions:
-            if customer_id and sess.get("customer_id") == customer_id:
-                filtered.append(sess)
-            elif counsellor_id and sess.get("counsellor_id") == counsellor_id:
-                filtered.append(sess)
-        if not customer_id and not counsellor_id:
-            filtered = all_sessions
-        return jsonify(filtered), 200
+        page, next_key, etag = sessions_flight.do(key, first_page)
+        if not paginated:
+            return stream_json(itertools.chain(page, query(next_key)[0]) if next_key else page, etag)
+        return page_response(page, limit, next_key), 200
     except Exception as e:
         return jsonify({"error": f"Error fetching sessions: {e}"}), 500
+
 @app.route("/sessions/<session_id>", methods=["PUT"])
 def update_session(session_id):
     """
@@ -236,41 +667,60 @@ def update_session(session_id):
     if not data:
         return jsonify({"error": "No JSON body provided"}), 400
 
-    # Build update expression for allowed fields.
-    # Allowed fields: date_time, session_time, status
-    update_expression = []
-    expression_attribute_values = {}
-    expression_attribute_names = {}
-
-    if "date_time" in data:
-        update_expression.append("date_time = :d")
-        expression_attribute_values[":d"] = data["date_time"]
-    if "session_time" in data:
-        update_expression.append("session_time = :t")
-        expression_attribute_values[":t"] = data["session_time"]
-    if "status" in data:
-        # Use ExpressionAttributeNames to avoid reserved keyword conflict
-        update_expression.append("#st = :s")
-        expression_attribute_values[":s"] = data["status"]
-        expression_attribute_names["#st"] = "status"
-
-    if not update_expression:
+    # Allowed fields: date_time, session_time, status. Rescheduling moves the
+    # counsellor's slot and cancelling releases it, atomically with the update.
+    changes = {field: data[field] for field in scheduling.UPDATABLE_FIELDS if field in data}
+    if not changes:
         return jsonify({"error": "No valid fields provided for update"}), 400
 
-    update_expr = "set " + ", ".join(update_expression)
     try:
-        result = sessions_table.update_item(
-            Key={"session_id": session_id},
-            UpdateExpression=update_expr,
-            ExpressionAttributeValues=expression_attribute_values,
-            ExpressionAttributeNames=expression_attribute_names if expression_attribute_names else None,
-            ReturnValues="ALL_NEW"
-        )
-        updated_session = result.get("Attributes", {})
-        return jsonify({"message": "Session updated", "data": updated_session}), 200
+        updated_session = scheduler.update(session_id, changes)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except scheduling.SessionNotFound as e:
+        return jsonify({"error": str(e)}), 404
+    except scheduling.SlotConflict as e:
+        return jsonify({"error": str(e)}), 409
     except Exception as e:
         return jsonify({"error": f"Error updating session: {e}"}), 500
+    event_broker.publish_many(
+        [updated_session.get("customer_id"), updated_session.get("counsellor_id")],
+        {"type": "session", "data": updated_session}
+    )
+    return jsonify({"message": "Session updated", "data": updated_session}), 200
+
+@app.route("/counsellors/<counsellor_id>/availability", methods=["GET"])
+def counsellor_availability(counsellor_id):
+    """
+    Free and booked slots per day for ?from=YYYY-MM-DD&to=YYYY-MM-DD
+    (both inclusive; `to` defaults to `from`).
+    """
+    auth_header = request.headers.get("Authorization", "")
+    token = parse_bearer_token(auth_header)
+    if not token:
+        return jsonify({"error": "Missing or invalid Authorization header"}), 401
+
+    try:
+        verify_cognito_token(token)
+    except Exception as e:
+        return jsonify({"error": f"Token verification failed: {e}"}), 401
 
+    try:
+        start = scheduling.parse_date(request.args.get("from"), "from")
+        end = scheduling.parse_date(request.args.get("to", request.args.get("from")), "to")
+        days = scheduler.availability(counsellor_id, start, end)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        return jsonify({"error": f"Error fetching availability: {e}"}), 500
+
+    return jsonify({
+        "counsellor_id": counsellor_id,
+        "from": start.isoformat(),
+        "to": end.isoformat(),
+        "slot_minutes": scheduling.SESSION_SLOT_MINUTES,
+        "days": days,
+    }), 200
 
 # ----------------------------------------------------------------
 #  Main
@@ -0,0 +1,244 @@
+"""
+Event fan-out for the messaging service.
+
+Events are plain dicts ({"type": ..., "data": ...}) published to a channel,
+which is a user id. Every open subscription on that channel gets a copy.
+
+  InMemoryBroker  fans out within one process (a single pod).
+  RedisBroker     relays events through Redis pub/sub so subscribers on any
+                  replica receive them. Any Redis-protocol server works as a
+                  local stand-in (redis-server, or fakeredis in tests).
+
+Select with EVENT_BROKER=memory|redis and EVENT_BROKER_URL. Both brokers
+deliver the same events: RedisBroker encodes them with the `dumps` it is
+given (the app's JSON provider), so a Decimal arrives as the number the
+API would have returned, not a string.
+"""
+import abc
+import json
+import os
+import queue
+import threading
+import time
+
+SUBSCRIPTION_QUEUE_SIZE = int(os.environ.get('EVENT_SUBSCRIPTION_QUEUE_SIZE', 100))
+# The Redis relay retries a lost connection after 0.5s, doubling up to this.
+RECONNECT_MAX_SECONDS = float(os.environ.get('EVENT_BROKER_RECONNECT_MAX_SECONDS', 30))
+# Connecting to Redis and each command give up after this long, so a hung
+# server cannot hold a request thread in publish().
+SOCKET_TIMEOUT = float(os.environ.get('EVENT_BROKER_SOCKET_TIMEOUT', 5))
+# The relay pings Redis after this long without an event and reconnects when
+# the reply takes longer than SOCKET_TIMEOUT, so a dead connection does not
+# go unnoticed on a quiet channel.
+PING_SECONDS = float(os.environ.get('EVENT_BROKER_PING_SECONDS', 15))
+
+# Delivered to every subscription when the process is shutting down.
+SHUTDOWN_EVENT = {"type": "shutdown", "data": None}
+
+
+class Subscription:
+    """A bounded per-connection queue. Slow consumers drop their oldest events."""
+
+    def __init__(self, broker, channel):
+        self.broker = broker
+        self.channel = channel
+        self._queue = queue.Queue(maxsize=SUBSCRIPTION_QUEUE_SIZE)
+        self.dropped = 0
+
+    def put(self, event):
+        while True:
+            try:
+                self._queue.put_nowait(event)
+                return
+            except queue.Full:
+                try:
+                    self._queue.get_nowait()
+                    self.dropped += 1
+                except queue.Empty:
+                    pass
+
+    def get(self, timeout=None):
+        """Returns the next event, or None if none arrives within timeout."""
+        try:
+            return self._queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def close(self):
+        self.broker.unsubscribe(self)
+
+
+class Broker(abc.ABC):
+    """Interface for event brokers."""
+
+    @abc.abstractmethod
+    def publish(self, channel, event):
+        """Delivers `event` to every subscription on `channel`."""
+
+    @abc.abstractmethod
+    def subscribe(self, channel):
+        """Returns a new Subscription to `channel`."""
+
+    @abc.abstractmethod
+    def unsubscribe(self, subscription):
+        """Stops delivering to `subscription`."""
+
+    @abc.abstractmethod
+    def shutdown(self):
+        """Sends SHUTDOWN_EVENT to every open and future subscription."""
+
+    def after_fork(self):
+        """Re-creates per-process connections and threads in a forked worker."""
+
+    def publish_many(self, channels, event):
+        """Best-effort publish; a broker failure must not fail the write that caused it."""
+        for channel in set(channels):
+            if not channel:
+                continue
+            try:
+                self.publish(str(channel), event)
+            except Exception as e:
+                print(f"Failed to publish {event.get('type')} event: {e}")
+
+    def connection_count(self):
+        return 0
+
+
+class InMemoryBroker(Broker):
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscriptions = {}  # channel -> set of Subscription
+        self._closed = False
+
+    def publish(self, channel, event):
+        self._deliver(channel, event)
+
+    def _deliver(self, channel, event):
+        with self._lock:
+            targets = list(self._subscriptions.get(channel, ()))
+        for subscription in targets:
+            subscription.put(event)
+
+    def subscribe(self, channel):
+        subscription = Subscription(self, channel)
+        with self._lock:
+            self._subscriptions.setdefault(channel, set()).add(subscription)
+            closed = self._closed
+        if closed:
+            subscription.put(SHUTDOWN_EVENT)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            subs = self._subscriptions.get(subscription.channel)
+            if subs is not None:
+                subs.discard(subscription)
+                if not subs:
+                    del self._subscriptions[subscription.channel]
+
+    def shutdown(self):
+        with self._lock:
+            self._closed = True
+            targets = [sub for subs in self._subscriptions.values() for sub in subs]
+        for subscription in targets:
+            subscription.put(SHUTDOWN_EVENT)
+
+    def after_fork(self):
+        # Subscriptions belong to the parent's requests; a worker starts empty.
+        self._lock = threading.Lock()
+        self._subscriptions = {}
+
+    def connection_count(self):
+        with self._lock:
+            return sum(len(s) for s in self._subscriptions.values())
+
+
+class RedisBroker(InMemoryBroker):
+    """
+    Publishes to Redis; one listener thread per process relays every event
+    back into the local subscriptions, including events from this process.
+    The listener reconnects with backoff when Redis goes away; events
+    published meanwhile are lost, and clients catch up on their next sync.
+    """
+
+    PREFIX = "bw-events:"
+
+    def __init__(self, url, dumps=json.dumps):
+        super().__init__()
+        try:
+            import redis
+        except ImportError:
+            raise RuntimeError("EVENT_BROKER=redis requires the 'redis' package")
+        self._url = url
+        self._dumps = dumps
+        self._connect(redis)
+
+    def _connect(self, redis):
+        self._redis = redis.Redis.from_url(
+            self._url, socket_timeout=SOCKET_TIMEOUT, socket_connect_timeout=SOCKET_TIMEOUT
+        )
+        self._thread = threading.Thread(target=self._listen, name="event-relay", daemon=True)
+        self._thread.start()
+
+    def after_fork(self):
+        # The parent's socket and relay thread are not usable in a child.
+        super().after_fork()
+        import redis
+        self._connect(redis)
+
+    def publish(self, channel, event):
+        self._redis.publish(self.PREFIX + channel, self._dumps(event))
+
+    def _listen(self):
+        client, delay = self._redis, 0.5
+        # A newer relay replaces this one after a fork.
+        while client is self._redis and not self._closed:
+            pubsub = client.pubsub(ignore_subscribe_messages=True)
+            try:
+                pubsub.psubscribe(self.PREFIX + "*")
+                delay = 0.5
+                self._relay(client, pubsub)
+            except Exception as e:
+                print(f"Event relay lost its Redis connection, retrying in {delay:.1f}s: {e}")
+            finally:
+                try:
+                    pubsub.close()
+                except Exception:
+                    pass
+            time.sleep(delay)
+            delay = min(delay * 2, RECONNECT_MAX_SECONDS)
+
+    def _relay(self, client, pubsub):
+        # Polls rather than blocking in listen(), whose read would hit the
+        # socket timeout on every quiet channel.
+        heard = pinged = time.monotonic()
+        while client is self._redis and not self._closed:
+            message = pubsub.get_message(timeout=1.0)
+            now = time.monotonic()
+            if message is not None:
+                heard = now
+            elif pinged > heard and now - pinged > SOCKET_TIMEOUT:
+                raise TimeoutError(f"no reply to a ping within {SOCKET_TIMEOUT:g}s")
+            elif now - max(heard, pinged) > PING_SECONDS:
+                pubsub.ping()
+                pinged = now
+            if message is None or message["type"] != "pmessage":
+                continue
+            channel = message["channel"]
+            if isinstance(channel, bytes):
+                channel = channel.decode("utf-8")
+            try:
+                event = json.loads(message["data"])
+            except (TypeError, ValueError):
+                continue
+            self._deliver(channel[len(self.PREFIX):], event)
+
+
+def create_broker(dumps=json.dumps):
+    """`dumps` encodes events for RedisBroker; pass the app's, e.g. app.json.dumps."""
+    kind = os.environ.get('EVENT_BROKER', 'memory')
+    if kind == "memory":
+        return InMemoryBroker()
+    if kind == "redis":
+        return RedisBroker(os.environ.get('EVENT_BROKER_URL', 'redis://localhost:6379/0'), dumps)
+    raise RuntimeError(f"Unknown EVENT_BROKER '{kind}'")
@@ -0,0 +1,169 @@
+"""
+Materialized conversation summaries (the inbox) in the Conversations table.
+
+Each participant of a conversation has their own summary item, keyed by
+(user_id, conversation_id), holding the peer, the last message (id,
+sender, a preview of its content, timestamp) and that user's unread
+count. A GSI sorts a user's summaries by last activity:
+
+  user_id-last_timestamp-index  partition: user_id, sort: last_timestamp
+
+so the inbox is one Query whose cost depends on the number of
+conversations, not on the message history.
+
+Summaries are updated after messages are stored, with one UpdateItem per
+summary: the last-message fields are only replaced by a newer message
+(a condition on last_timestamp), and unread and message counts change by
+atomic ADD, so concurrent writers and marking as read never lose an
+increment.
+
+Messages are never changed or deleted, so the summaries also version a
+user's message history: history_etag() hashes the last message id and
+message count of each of them, a Query over a few small items instead of
+a read of the history. A summary update that failed leaves that version
+behind until the next message or backfill_conversations.py.
+"""
+import datetime
+import hashlib
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from boto3.dynamodb.conditions import Key
+from botocore.exceptions import ClientError
+
+from common.pagination import check_start_key, iter_items, key_fields
+
+INBOX_INDEX = os.environ.get('CONVERSATIONS_INBOX_INDEX', 'user_id-last_timestamp-index')
+# Characters of the last message kept in a summary.
+PREVIEW_CHARS = int(os.environ.get('CONVERSATION_PREVIEW_CHARS', 120))
+# Summaries updated in parallel for a batch that touches many conversations.
+SUMMARY_UPDATE_CONCURRENCY = int(os.environ.get('CONVERSATION_UPDATE_CONCURRENCY', 8))
+
+inbox_key = key_fields("user_id", "conversation_id", "last_timestamp")
+
+
+class NotFound(Exception):
+    """The user has no summary for the conversation."""
+
+
+def preview(content):
+    if not isinstance(content, str):
+        return ""
+    return content[:PREVIEW_CHARS]
+
+
+def summary_updates(stored):
+    """
+    Folds stored messages into one update per (user_id, conversation_id):
+    the newest message, the number of messages the user received and the
+    number of messages. Returns
+    {(user_id, conversation_id): (peer_id, last_message, unread, count)}.
+    """
+    updates = {}
+    for message in stored:
+        sender, receiver = message["sender_id"], message["receiver_id"]
+        for user_id, peer_id, unread in ((sender, receiver, 0), (receiver, sender, 1)):
+            if user_id == peer_id and unread:
+                continue  # a note to self is never unread
+            key = (user_id, message["conversation_id"])
+            _, last, unread_total, count = updates.get(key, (peer_id, message, 0, 0))
+            if message["timestamp"] >= last["timestamp"]:
+                last = message
+            updates[key] = (peer_id, last, unread_total + unread, count + 1)
+    return updates
+
+
+def _apply(table, user_id, conversation_id, peer_id, last, unread, count):
+    key = {"user_id": user_id, "conversation_id": conversation_id}
+    try:
+        table.update_item(
+            Key=key,
+            UpdateExpression="SET peer_id = :peer, last_message_id = :id, last_sender_id = :sender, "
+                             "last_preview = :preview, last_timestamp = :ts "
+                             "ADD unread_count :unread, message_count :count",
+            ConditionExpression="attribute_not_exists(last_timestamp) OR last_timestamp < :ts",
+            ExpressionAttributeValues={
+                ":peer": peer_id, ":id": last["message_id"], ":sender": last["sender_id"],
+                ":preview": preview(last.get("content")), ":ts": last["timestamp"],
+                ":unread": unread, ":count": count,
+            },
+        )
+    except ClientError as e:
+        if e.response["Error"]["Code"] != "ConditionalCheckFailedException":
+            raise
+        # A newer message is already the summary; only the counts change.
+        table.update_item(Key=key, UpdateExpression="ADD unread_count :unread, message_count :count",
+                          ExpressionAttributeValues={":unread": unread, ":count": count})
+
+
+def record_messages(table, stored):
+    """Updates the summaries of both participants for each stored message."""
+    updates = summary_updates(stored)
+
+    def apply(item):
+        (user_id, conversation_id), (peer_id, last, unread, count) = item
+        _apply(table, user_id, conversation_id, peer_id, last, unread, count)
+
+    if len(updates) <= 2:
+        for item in updates.items():
+            apply(item)
+        return
+    with ThreadPoolExecutor(max_workers=min(len(updates), SUMMARY_UPDATE_CONCURRENCY)) as pool:
+        list(pool.map(apply, updates.items()))
+
+
+def query_inbox(table, user_id, page_size=None, start_key=None):
+    """
+    Yields a user's conversation summaries, most recently active first.
+    Raises ValueError (when called) for a start_key outside the user's inbox.
+    """
+    check_start_key(start_key, ("user_id", "conversation_id", "last_timestamp"), user_id=user_id)
+    kwargs = {
+        "IndexName": INBOX_INDEX,
+        "KeyConditionExpression": Key("user_id").eq(user_id),
+        "ScanIndexForward": False,
+    }
+    if page_size:
+        kwargs["Limit"] = page_size
+    return iter_items(table.query, start_key=start_key, **kwargs)
+
+
+def history_etag(table, user_id, conversation_id=None):
+    """
+    A validator for a user's full message list, or for one conversation's,
+    from the user's summaries. Read consistently, so a message whose summary
+    is updated is never answered with a 304.
+    """
+    projection = {"ProjectionExpression": "conversation_id, last_message_id, message_count"}
+    if conversation_id:
+        item = table.get_item(Key={"user_id": user_id, "conversation_id": conversation_id},
+                              ConsistentRead=True, **projection).get("Item")
+        items = [item] if item else []
+    else:
+        items = iter_items(table.query, KeyConditionExpression=Key("user_id").eq(user_id),
+                           ConsistentRead=True, **projection)
+    versions = [[item["conversation_id"], item.get("last_message_id"), item.get("message_count")]
+                for item in items]
+    return hashlib.sha1(json.dumps(versions, default=str).encode("utf-8")).hexdigest()
+
+
+def mark_read(table, user_id, conversation_id, now=None):
+    """
+    Resets the user's unread count for a conversation and returns the
+    updated summary. Raises NotFound if the user has no such summary.
+    """
+    now = now or datetime.datetime.utcnow()
+    try:
+        response = table.update_item(
+            Key={"user_id": user_id, "conversation_id": conversation_id},
+            UpdateExpression="SET unread_count = :zero, last_read_at = :now",
+            ConditionExpression="attribute_exists(user_id)",
+            ExpressionAttributeValues={":zero": 0, ":now": now.isoformat() + "Z"},
+            ReturnValues="ALL_NEW",
+        )
+    except ClientError as e:
+        if e.response["Error"]["Code"] == "ConditionalCheckFailedException":
+            raise NotFound(f"No conversation '{conversation_id}' for user '{user_id}'")
+        raise
+    return response["Attributes"]
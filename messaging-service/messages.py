@@ -0,0 +1,256 @@
+"""
+Indexed read paths for the Messages table.
+
+Messages are keyed by message_id, with three GSIs that all sort on
+`timestamp` (ISO-8601, so lexical order is time order):
+
+  sender_id-timestamp-index        partition: sender_id
+  receiver_id-timestamp-index      partition: receiver_id
+  conversation_id-timestamp-index  partition: conversation_id ("<a>#<b>", ids sorted)
+
+A user's inbox is the newest-first merge of their sent and received
+messages, so the cost of a read depends on that user's messages only.
+Pages are resumed from the index keys of the last item returned.
+
+Bulk sends go through BatchWriteItem, 25 items per request, and
+conversations for a batched history fetch are queried concurrently.
+"""
+import datetime
+import heapq
+import os
+import random
+import time
+import uuid
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+
+from boto3.dynamodb.conditions import Key
+from botocore.exceptions import ClientError
+
+from common.pagination import check_start_key, iter_items, key_fields, take_page
+
+SENDER_INDEX = os.environ.get('MESSAGES_SENDER_INDEX', 'sender_id-timestamp-index')
+RECEIVER_INDEX = os.environ.get('MESSAGES_RECEIVER_INDEX', 'receiver_id-timestamp-index')
+CONVERSATION_INDEX = os.environ.get('MESSAGES_CONVERSATION_INDEX', 'conversation_id-timestamp-index')
+# Messages are stamped before they are stored, so concurrent writes can become
+# visible out of timestamp order. Delta reads also return the messages of this
+# many seconds before `since`, for clients to merge by message_id.
+SYNC_OVERLAP_SECONDS = float(os.environ.get('MESSAGES_SYNC_OVERLAP_SECONDS', 10))
+
+# BatchWriteItem takes at most 25 puts per call.
+BATCH_WRITE_SIZE = 25
+# Rounds of resubmitting UnprocessedItems before an item is reported as failed.
+BATCH_WRITE_ATTEMPTS = int(os.environ.get('MESSAGES_BATCH_WRITE_ATTEMPTS', 5))
+BATCH_WRITE_BACKOFF_SECONDS = float(os.environ.get('MESSAGES_BATCH_WRITE_BACKOFF_SECONDS', 0.05))
+# Conversations queried in parallel by fetch_conversations().
+BATCH_GET_CONCURRENCY = int(os.environ.get('MESSAGES_BATCH_GET_CONCURRENCY', 8))
+
+
+def conversation_id(user_a, user_b):
+    """Order-independent id for the conversation between two users."""
+    return "#".join(sorted([user_a, user_b]))
+
+
+def new_message(data, now=None):
+    """Returns a copy of `data` with a fresh message_id, timestamp and conversation_id."""
+    now = now or datetime.datetime.utcnow()
+    message = dict(data)
+    message["message_id"] = str(uuid.uuid4())
+    message["timestamp"] = now.isoformat() + "Z"
+    message["conversation_id"] = conversation_id(message["sender_id"], message["receiver_id"])
+    return message
+
+
+def new_messages(batch):
+    """
+    Builds stored messages for a batch. Timestamps step by a microsecond so
+    the batch keeps its request order in every timestamp-sorted index.
+    """
+    now = datetime.datetime.utcnow()
+    return [new_message(data, now + datetime.timedelta(microseconds=i)) for i, data in enumerate(batch)]
+
+
+def _sort_key(item):
+    return (item.get("timestamp", ""), item["message_id"])
+
+
+def _index_key(key_name):
+    return key_fields("message_id", key_name, "timestamp")
+
+
+def iter_index(table, index_name, key_name, key_value, page_size=None,
+               newest_first=True, start_key=None, since=None):
+    """
+    Yields every item under one GSI partition, following LastEvaluatedKey.
+    With `since`, only items with a timestamp strictly after it are read.
+    """
+    condition = Key(key_name).eq(key_value)
+    if since:
+        condition = condition & Key("timestamp").gt(since)
+    kwargs = {
+        "IndexName": index_name,
+        "KeyConditionExpression": condition,
+        "ScanIndexForward": not newest_first,
+    }
+    if page_size:
+        kwargs["Limit"] = page_size
+    return iter_items(table.query, start_key=start_key, **kwargs)
+
+
+def iter_user_messages(table, user_id, page_size=None, position=None,
+                       newest_first=True, since=None):
+    """Yields all messages sent or received by user_id, newest first by default."""
+    position = position or {}
+    sent = iter_index(table, SENDER_INDEX, "sender_id", user_id, page_size, newest_first,
+                      start_key=position.get("sent"), since=since)
+    received = iter_index(table, RECEIVER_INDEX, "receiver_id", user_id, page_size, newest_first,
+                          start_key=position.get("received"), since=since)
+    last_id = None
+    for item in heapq.merge(sent, received, key=_sort_key, reverse=newest_first):
+        # A message a user sent to themselves is in both indexes, back to back.
+        if item["message_id"] != last_id:
+            last_id = item["message_id"]
+            yield item
+
+
+def iter_conversation(table, user_a, user_b, page_size=None, start_key=None,
+                      newest_first=True, since=None):
+    """Yields the messages exchanged between two users, newest first by default."""
+    return iter_index(table, CONVERSATION_INDEX, "conversation_id",
+                      conversation_id(user_a, user_b), page_size, newest_first,
+                      start_key=start_key, since=since)
+
+
+def check_position(position, user_id, peer_id=None):
+    """
+    Validates a decoded cursor for user_id's messages (with peer_id: their
+    conversation). Returns it; raises ValueError if it does not fit.
+    """
+    if position is None:
+        return None
+    if peer_id:
+        streams, owner = {"conversation": "conversation_id"}, conversation_id(user_id, peer_id)
+    else:
+        streams, owner = {"sent": "sender_id", "received": "receiver_id"}, user_id
+    if not isinstance(position, dict) or not set(position) <= set(streams):
+        raise ValueError("Invalid cursor")
+    for stream, key in position.items():
+        key_name = streams[stream]
+        check_start_key(key, ("message_id", key_name, "timestamp"), **{key_name: owner})
+    return position
+
+
+def user_messages_page(table, user_id, limit, position=None):
+    """
+    Returns (page, next_position) for a user's inbox, newest first.
+    The position records where each of the two index streams stopped.
+    """
+    position = position or {}
+    items = iter_user_messages(table, user_id, page_size=limit + 1, position=position)
+    page = list(islice(items, limit + 1))
+    if len(page) <= limit:
+        return page, None
+    page = page[:limit]
+
+    next_position = dict(position)
+    for stream, key_name in (("sent", "sender_id"), ("received", "receiver_id")):
+        last = next((m for m in reversed(page) if m.get(key_name) == user_id), None)
+        if last is not None:
+            next_position[stream] = _index_key(key_name)(last)
+    return page, next_position
+
+
+def conversation_page(table, user_a, user_b, limit, position=None):
+    """Returns (page, next_position) for one conversation, newest first."""
+    position = position or {}
+    items = iter_conversation(table, user_a, user_b, page_size=limit + 1,
+                              start_key=position.get("conversation"))
+    page, next_key = take_page(items, limit, _index_key("conversation_id"))
+    return page, next_key and {"conversation": next_key}
+
+
+def _rewind(since, seconds):
+    """`since` moved back by `seconds`, in the stored timestamp format; unparsable values stay."""
+    try:
+        moment = datetime.datetime.fromisoformat(since.replace("Z", "+00:00"))
+    except ValueError:
+        return since
+    if moment.tzinfo is not None:
+        moment = moment.astimezone(datetime.timezone.utc).replace(tzinfo=None)
+    return (moment - datetime.timedelta(seconds=seconds)).isoformat(timespec="microseconds") + "Z"
+
+
+def messages_since(table, user_id, since, limit, peer_id=None, overlap=SYNC_OVERLAP_SECONDS):
+    """
+    Returns (recent, new), oldest first: `new` holds up to `limit` messages
+    newer than `since`, so a client can append them and continue from the
+    last timestamp. `recent` adds before them up to `limit` messages from
+    the `overlap` seconds before `since`, which a client may have missed
+    if they were stored after it had already moved on.
+    """
+    start = _rewind(since, overlap) if overlap else since
+    if peer_id:
+        items = iter_conversation(table, user_id, peer_id, page_size=limit,
+                                  newest_first=False, since=start)
+    else:
+        items = iter_user_messages(table, user_id, page_size=limit,
+                                   newest_first=False, since=start)
+    earlier, new = deque(maxlen=limit), []
+    for item in items:
+        if item["timestamp"] > since:
+            new.append(item)
+            if len(new) == limit:
+                break
+        else:
+            earlier.append(item)
+    return list(earlier) + new, new
+
+
+# ----------------------------------------------------------------
+#  Bulk operations
+# ----------------------------------------------------------------
+def write_batch(table, items, attempts=BATCH_WRITE_ATTEMPTS):
+    """
+    Puts `items` with BatchWriteItem, resubmitting UnprocessedItems with
+    jittered exponential backoff. Returns {message_id: error} for the items
+    that could not be written; every other item was stored.
+    """
+    # The resource's client accepts plain Python values, like table.put_item.
+    client = table.meta.client
+    failed = {}
+    for start in range(0, len(items), BATCH_WRITE_SIZE):
+        requests = [{"PutRequest": {"Item": item}} for item in items[start:start + BATCH_WRITE_SIZE]]
+        for attempt in range(attempts):
+            if attempt:
+                time.sleep(random.uniform(0, BATCH_WRITE_BACKOFF_SECONDS * 2 ** attempt))
+            try:
+                response = client.batch_write_item(RequestItems={table.name: requests})
+            except ClientError as e:
+                # Throttling was already retried by the client; the chunk as a whole failed.
+                error = e.response["Error"].get("Code", "ClientError")
+                failed.update((r["PutRequest"]["Item"]["message_id"], error) for r in requests)
+                requests = []
+                break
+            requests = response.get("UnprocessedItems", {}).get(table.name, [])
+            if not requests:
+                break
+        failed.update((r["PutRequest"]["Item"]["message_id"], "Unprocessed") for r in requests)
+    return failed
+
+
+def fetch_conversations(table, user_id, peer_ids, limit, positions=None):
+    """
+    Returns {peer_id: (page, next_position)} for the newest `limit` messages
+    of each conversation, querying up to BATCH_GET_CONCURRENCY at a time.
+    `positions` maps a peer_id to the position its previous page returned.
+    """
+    positions = positions or {}
+    if not peer_ids:
+        return {}
+
+    def fetch(peer_id):
+        return conversation_page(table, user_id, peer_id, limit, positions.get(peer_id))
+
+    with ThreadPoolExecutor(max_workers=min(len(peer_ids), BATCH_GET_CONCURRENCY)) as pool:
+        return dict(zip(peer_ids, pool.map(fetch, peer_ids)))
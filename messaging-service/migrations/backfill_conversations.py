@@ -0,0 +1,90 @@
+"""
+One-off backfill for the Conversations table (inbox summaries).
+
+Summaries are maintained as messages are written, so conversations whose
+messages all predate the table have none. This script scans Messages once,
+keeps the newest message per (user, conversation) in memory, and writes
+the summaries. A summary already at a newer message (live traffic) is left
+alone; history is treated as read, so unread counts start at zero. Rerun
+it to repair summaries after failed updates; it never moves one backwards.
+
+Run from the messaging-service directory, after the table exists:
+
+    python -m migrations.backfill_conversations --region eu-north-1
+    python -m migrations.backfill_conversations --endpoint-url http://localhost:8000 --dry-run
+"""
+from botocore.exceptions import ClientError
+
+from conversations import preview, summary_updates
+from messages import conversation_id
+from migrations import scan
+
+
+def keep_newest(newest, item):
+    """Folds a scanned message into {(user_id, conversation_id): (peer_id, newest message)}."""
+    if not all(isinstance(item.get(k), str) for k in ("sender_id", "receiver_id", "timestamp")):
+        return "skipped"
+    item["conversation_id"] = conversation_id(item["sender_id"], item["receiver_id"])
+    for key, (peer_id, last, _, _) in summary_updates([item]).items():
+        if key not in newest or last["timestamp"] > newest[key][1]["timestamp"]:
+            newest[key] = (peer_id, last)
+    return None
+
+
+def write_summary(table, user_id, conv_id, peer_id, last):
+    try:
+        table.update_item(
+            Key={"user_id": user_id, "conversation_id": conv_id},
+            UpdateExpression="SET peer_id = :peer, last_message_id = :id, last_sender_id = :sender, "
+                             "last_preview = :preview, last_timestamp = :ts, "
+                             "unread_count = if_not_exists(unread_count, :zero)",
+            ConditionExpression="attribute_not_exists(last_timestamp) OR last_timestamp < :ts",
+            ExpressionAttributeValues={
+                ":peer": peer_id, ":id": last["message_id"], ":sender": last["sender_id"],
+                ":preview": preview(last.get("content")), ":ts": last["timestamp"], ":zero": 0,
+            },
+        )
+    except ClientError as e:
+        if e.response["Error"]["Code"] != "ConditionalCheckFailedException":
+            raise
+        return False
+    return True
+
+
+def main():
+    parser = scan.parser("Build Conversations summaries from Messages.")
+    parser.add_argument("--messages-table", default="Messages")
+    parser.add_argument("--table", default="Conversations")
+    args = parser.parse_args()
+
+    segments = []  # one dict per segment, merged below
+
+    def make_handler(dynamodb):
+        newest = {}
+        segments.append(newest)
+        return lambda item: keep_newest(newest, item)
+
+    totals = scan.parallel_scan(
+        args, args.messages_table, make_handler,
+        ProjectionExpression="message_id, sender_id, receiver_id, #ts, content",
+        ExpressionAttributeNames={"#ts": "timestamp"},
+    )
+
+    newest = {}
+    for segment_newest in segments:
+        for key, (peer_id, last) in segment_newest.items():
+            if key not in newest or last["timestamp"] > newest[key][1]["timestamp"]:
+                newest[key] = (peer_id, last)
+
+    written = 0
+    if not args.dry_run:
+        table = scan.resource(args).Table(args.table)
+        for (user_id, conv_id), (peer_id, last) in newest.items():
+            written += write_summary(table, user_id, conv_id, peer_id, last)
+    verb = "would write" if args.dry_run else "wrote"
+    print(f"Found {len(newest)} summaries, {verb} {written if not args.dry_run else len(newest)}, "
+          f"skipped {totals['skipped']} unindexable messages.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+"""
+One-off backfill for the Messages GSIs.
+
+Messages written before the indexed read path have no `conversation_id`,
+so they are missing from conversation_id-timestamp-index. This script scans
+the table once and sets conversation_id on those items. Items without a
+string sender_id/receiver_id/timestamp cannot be indexed and are reported.
+
+Run from the messaging-service directory, after the GSIs exist:
+
+    python -m migrations.backfill_messages --table Messages --region eu-north-1
+    python -m migrations.backfill_messages --endpoint-url http://localhost:8000 --dry-run
+"""
+from botocore.exceptions import ClientError
+
+from messages import conversation_id
+from migrations import scan
+
+
+def backfill_message(table, item, dry_run):
+    sender, receiver = item.get("sender_id"), item.get("receiver_id")
+    if not all(isinstance(v, str) for v in (sender, receiver, item.get("timestamp"))):
+        print(f"Skipping unindexable message {item['message_id']}")
+        return "skipped"
+    conv_id = conversation_id(sender, receiver)
+    if item.get("conversation_id") == conv_id:
+        return None
+    if not dry_run:
+        try:
+            table.update_item(
+                Key={"message_id": item["message_id"]},
+                UpdateExpression="SET conversation_id = :c",
+                ConditionExpression="attribute_exists(message_id)",
+                ExpressionAttributeValues={":c": conv_id},
+            )
+        except ClientError as e:
+            if e.response["Error"]["Code"] != "ConditionalCheckFailedException":
+                raise
+            return None
+    return "updated"
+
+
+def main():
+    parser = scan.parser("Backfill conversation_id on existing Messages items.")
+    parser.add_argument("--table", default="Messages")
+    args = parser.parse_args()
+
+    def make_handler(dynamodb):
+        table = dynamodb.Table(args.table)
+        return lambda item: backfill_message(table, item, args.dry_run)
+
+    totals = scan.parallel_scan(
+        args, args.table, make_handler,
+        ProjectionExpression="message_id, sender_id, receiver_id, conversation_id, #ts",
+        ExpressionAttributeNames={"#ts": "timestamp"},
+    )
+    verb = "would update" if args.dry_run else "updated"
+    print(f"Scanned {totals['scanned']}, {verb} {totals['updated']}, skipped {totals['skipped']}.")
+
+
+if __name__ == "__main__":
+    main()
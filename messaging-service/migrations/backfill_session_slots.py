@@ -0,0 +1,61 @@
+"""
+One-off backfill for the SessionSlots index.
+
+Sessions booked before the slot index existed hold no slot, so new bookings
+could still collide with them. This script scans Sessions once and claims
+the slot of every active session. Cancelled sessions, and those whose
+date/time is malformed or off the slot grid, hold no slot and are counted
+as skipped. Two active sessions in the same slot are reported as conflicts
+(the first one scanned keeps the slot) so they can be resolved by hand.
+
+Run from the messaging-service directory, after the SessionSlots table exists:
+
+    python -m migrations.backfill_session_slots --region eu-north-1
+    python -m migrations.backfill_session_slots --endpoint-url http://localhost:8000 --dry-run
+"""
+from botocore.exceptions import ClientError
+
+from migrations import scan
+from scheduling import held_slot
+
+
+def claim_slot(slots, item, dry_run):
+    slot = held_slot(item)
+    if slot is None:
+        return "skipped"
+    if not dry_run:
+        try:
+            slots.put_item(
+                Item={"counsellor_id": item["counsellor_id"], "slot": slot,
+                      "session_id": item["session_id"],
+                      **({"customer_id": item["customer_id"]} if item.get("customer_id") else {})},
+                ConditionExpression="attribute_not_exists(slot) OR session_id = :sid",
+                ExpressionAttributeValues={":sid": item["session_id"]},
+            )
+        except ClientError as e:
+            if e.response["Error"]["Code"] != "ConditionalCheckFailedException":
+                raise
+            print(f"Slot {item['counsellor_id']} {slot} already held; "
+                  f"session {item['session_id']} double-booked")
+            return "conflicts"
+    return "claimed"
+
+
+def main():
+    parser = scan.parser("Claim SessionSlots items for existing sessions.")
+    parser.add_argument("--sessions-table", default="Sessions")
+    parser.add_argument("--slots-table", default="SessionSlots")
+    args = parser.parse_args()
+
+    def make_handler(dynamodb):
+        slots = dynamodb.Table(args.slots_table)
+        return lambda item: claim_slot(slots, item, args.dry_run)
+
+    totals = scan.parallel_scan(args, args.sessions_table, make_handler)
+    verb = "would claim" if args.dry_run else "claimed"
+    print(f"Scanned {totals['scanned']}, {verb} {totals['claimed']}, skipped {totals['skipped']}, "
+          f"conflicts {totals['conflicts']}.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+"""
+One-off backfill for the Sessions GSIs.
+
+The customer_id- and counsellor_id-date_time indexes sort on a plain
+YYYY-MM-DD `date_time`. Older sessions may carry a full timestamp there
+("2025-04-30T14:00:00Z"), which would sort and range-filter wrongly; this
+script splits those into date_time + session_time. Sessions without a
+string customer_id, counsellor_id or date_time are left out of the
+indexes by DynamoDB and are reported, since GET /sessions no longer sees them.
+
+Run from the messaging-service directory, after the GSIs exist:
+
+    python -m migrations.backfill_sessions --table Sessions --region eu-north-1
+    python -m migrations.backfill_sessions --endpoint-url http://localhost:8000 --dry-run
+"""
+import re
+
+from botocore.exceptions import ClientError
+
+from migrations import scan
+
+_TIMESTAMP_RE = re.compile(r"^(\d{4}-\d{2}-\d{2})[T ](\d{2}:\d{2})")
+
+
+def backfill_session(table, item, dry_run):
+    date_time = item.get("date_time")
+    if not all(isinstance(item.get(k), str) for k in ("customer_id", "counsellor_id")) \
+            or not isinstance(date_time, str):
+        print(f"Session {item['session_id']} is missing customer_id, counsellor_id or date_time")
+        return "unindexed"
+    match = _TIMESTAMP_RE.match(date_time)
+    if not match:
+        return None
+    date, time = match.groups()
+    if not dry_run:
+        try:
+            table.update_item(
+                Key={"session_id": item["session_id"]},
+                UpdateExpression="SET date_time = :d, session_time = if_not_exists(session_time, :t)",
+                ConditionExpression="date_time = :old",
+                ExpressionAttributeValues={":d": date, ":t": time, ":old": date_time},
+            )
+        except ClientError as e:
+            if e.response["Error"]["Code"] != "ConditionalCheckFailedException":
+                raise
+            return None
+    return "updated"
+
+
+def main():
+    parser = scan.parser("Normalize Sessions.date_time for the date-sorted GSIs.")
+    parser.add_argument("--table", default="Sessions")
+    args = parser.parse_args()
+
+    def make_handler(dynamodb):
+        table = dynamodb.Table(args.table)
+        return lambda item: backfill_session(table, item, args.dry_run)
+
+    totals = scan.parallel_scan(
+        args, args.table, make_handler,
+        ProjectionExpression="session_id, customer_id, counsellor_id, date_time, session_time",
+    )
+    verb = "would update" if args.dry_run else "updated"
+    print(f"Scanned {totals['scanned']}, {verb} {totals['updated']}, unindexed {totals['unindexed']}.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,50 @@
+"""
+Parallel segment scan shared by the backfills.
+
+A backfill supplies make_handler(dynamodb), called once per segment with
+that segment's own boto3 resource; the handler it returns gets every
+scanned item and returns the name of the outcome to count (or None).
+"""
+import argparse
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+import boto3
+
+from common.pagination import iter_items
+
+
+def parser(description):
+    """An argument parser with the options every backfill takes."""
+    parser = argparse.ArgumentParser(description=description)
+    parser.add_argument("--region", default="eu-north-1")
+    parser.add_argument("--endpoint-url", default=None, help="e.g. DynamoDB Local")
+    parser.add_argument("--segments", type=int, default=4, help="parallel scan segments")
+    parser.add_argument("--dry-run", action="store_true")
+    return parser
+
+
+def resource(args):
+    # boto3 resources are not thread-safe, so each thread gets its own.
+    return boto3.resource("dynamodb", region_name=args.region, endpoint_url=args.endpoint_url)
+
+
+def parallel_scan(args, table_name, make_handler, **scan_kwargs):
+    """
+    Scans `table_name` in args.segments parallel segments and returns the
+    outcome counts of all of them, plus "scanned".
+    """
+    def run_segment(segment):
+        dynamodb = resource(args)
+        handle = make_handler(dynamodb)
+        counts = Counter()
+        for item in iter_items(dynamodb.Table(table_name).scan, Segment=segment,
+                               TotalSegments=args.segments, **scan_kwargs):
+            counts["scanned"] += 1
+            outcome = handle(item)
+            if outcome:
+                counts[outcome] += 1
+        return counts
+
+    with ThreadPoolExecutor(max_workers=args.segments) as pool:
+        return sum(pool.map(run_segment, range(args.segments)), Counter())
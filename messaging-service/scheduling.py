@@ -0,0 +1,269 @@
+"""
+Session scheduling on top of a per-counsellor slot index.
+
+The SessionSlots table holds one item per booked counsellor slot:
+
+  counsellor_id (partition)   slot (sort: "<YYYY-MM-DD>#<HH:MM>")
+
+Booking, rescheduling and cancelling write the Sessions item and its slot
+in one DynamoDB transaction. Claiming a slot is a Put conditional on the
+slot not existing yet, so two concurrent bookings of the same counsellor
+slot cannot both succeed. Availability for a date range is one Query on
+the counsellor's partition, so both checks cost O(slots in range) however
+many sessions exist overall.
+
+Slots are SESSION_SLOT_MINUTES long and start on that grid; the bookable
+day runs from SESSION_DAY_START to SESSION_DAY_END. New bookings and
+reschedules must pick one of its slots (the ones availability lists);
+sessions stored before that keep whatever slot they already hold.
+"""
+import datetime
+import os
+
+from boto3.dynamodb.conditions import Key
+from botocore.exceptions import ClientError
+
+from common.pagination import iter_items
+
+SESSION_SLOT_MINUTES = int(os.environ.get('SESSION_SLOT_MINUTES', 60))
+SESSION_DAY_START = os.environ.get('SESSION_DAY_START', '09:00')
+SESSION_DAY_END = os.environ.get('SESSION_DAY_END', '17:00')
+MAX_AVAILABILITY_DAYS = int(os.environ.get('MAX_AVAILABILITY_DAYS', 31))
+
+CANCELLED = "cancelled"
+# Fields a client may change on an existing session.
+UPDATABLE_FIELDS = ("date_time", "session_time", "status")
+
+
+class SlotConflict(Exception):
+    """The counsellor already has a session in the requested slot."""
+
+
+class SessionNotFound(Exception):
+    pass
+
+
+class SessionChanged(SlotConflict):
+    """The session was modified concurrently, more often than update() retries."""
+
+
+# ----------------------------------------------------------------
+#  Slot keys
+# ----------------------------------------------------------------
+def parse_date(value, name):
+    try:
+        return datetime.date.fromisoformat(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"'{name}' must be a date (YYYY-MM-DD)")
+
+
+def _parse_minutes(value, name):
+    try:
+        parsed = datetime.datetime.strptime(value, "%H:%M")
+    except (TypeError, ValueError):
+        raise ValueError(f"'{name}' must be a time (HH:MM)")
+    return parsed.hour * 60 + parsed.minute
+
+
+def _format_minutes(minutes):
+    return f"{minutes // 60:02d}:{minutes % 60:02d}"
+
+
+def slot_key(date_value, time_value):
+    """
+    Validates a session's date_time/session_time and returns its slot sort
+    key. Raises ValueError for malformed values or an off-grid start time.
+    """
+    date = parse_date(date_value, "date_time")
+    minutes = _parse_minutes(time_value, "session_time")
+    if minutes % SESSION_SLOT_MINUTES:
+        raise ValueError(f"'session_time' must start on a {SESSION_SLOT_MINUTES}-minute slot boundary")
+    return f"{date.isoformat()}#{_format_minutes(minutes)}"
+
+
+def bookable_slot(date_value, time_value):
+    """slot_key() for a new booking, which must also fall within the bookable day."""
+    slot = slot_key(date_value, time_value)
+    if slot.split("#", 1)[1] not in day_slots():
+        raise ValueError(
+            f"'session_time' must be a slot between {SESSION_DAY_START} and {SESSION_DAY_END}"
+        )
+    return slot
+
+
+def held_slot(session):
+    """The slot a stored session occupies, or None (cancelled, or booked before slots existed)."""
+    if session.get("status") == CANCELLED or not session.get("counsellor_id"):
+        return None
+    try:
+        return slot_key(session.get("date_time"), session.get("session_time"))
+    except ValueError:
+        return None
+
+
+def day_slots():
+    """Start times of every slot in the bookable day."""
+    start = _parse_minutes(SESSION_DAY_START, "SESSION_DAY_START")
+    end = _parse_minutes(SESSION_DAY_END, "SESSION_DAY_END")
+    start += -start % SESSION_SLOT_MINUTES
+    return [_format_minutes(m) for m in range(start, end - SESSION_SLOT_MINUTES + 1, SESSION_SLOT_MINUTES)]
+
+
+# ----------------------------------------------------------------
+#  Scheduler
+# ----------------------------------------------------------------
+class Scheduler:
+    def __init__(self, sessions_table, slots_table):
+        self.sessions_table = sessions_table
+        self.slots_table = slots_table
+
+    def _claim(self, session, slot):
+        item = {
+            "counsellor_id": session["counsellor_id"],
+            "slot": slot,
+            "session_id": session["session_id"],
+        }
+        if session.get("customer_id"):
+            item["customer_id"] = session["customer_id"]
+        return {"Put": {
+            "TableName": self.slots_table.name,
+            "Item": item,
+            "ConditionExpression": "attribute_not_exists(slot)",
+        }}
+
+    def _release(self, session, slot):
+        return {"Delete": {
+            "TableName": self.slots_table.name,
+            "Key": {"counsellor_id": session["counsellor_id"], "slot": slot},
+            # Never release a slot that another session holds.
+            "ConditionExpression": "attribute_not_exists(slot) OR session_id = :sid",
+            "ExpressionAttributeValues": {":sid": session["session_id"]},
+        }}
+
+    def _transact(self, items, claim_index, session_index):
+        try:
+            # The resource's client accepts plain Python values in transactions.
+            self.sessions_table.meta.client.transact_write_items(TransactItems=items)
+        except ClientError as e:
+            if e.response["Error"]["Code"] != "TransactionCanceledException":
+                raise
+            reasons = e.response.get("CancellationReasons") or []
+            failed = {i for i, r in enumerate(reasons) if r.get("Code") == "ConditionalCheckFailed"}
+            if claim_index in failed:
+                raise SlotConflict("The counsellor is already booked for that slot")
+            if session_index in failed:
+                raise SessionNotFound("Session not found")
+            raise
+
+    def book(self, session):
+        """
+        Stores a new session and claims its slot atomically.
+        Raises ValueError for invalid input and SlotConflict if the slot is taken.
+        """
+        if not session.get("counsellor_id"):
+            raise ValueError("'counsellor_id' is required")
+        slot = bookable_slot(session.get("date_time"), session.get("session_time"))
+        items = [] if session.get("status") == CANCELLED else [self._claim(session, slot)]
+        items.append({"Put": {
+            "TableName": self.sessions_table.name,
+            "Item": session,
+            "ConditionExpression": "attribute_not_exists(session_id)",
+        }})
+        self._transact(items, 0 if len(items) == 2 else None, len(items) - 1)
+        return session
+
+    def update(self, session_id, changes, attempts=3):
+        """
+        Applies `changes` (a subset of UPDATABLE_FIELDS) to a session, moving
+        or releasing its slot in the same transaction. Returns the updated
+        session. Raises SessionNotFound, SlotConflict or ValueError.
+        """
+        for _ in range(attempts - 1):
+            try:
+                return self._update(session_id, changes)
+            except SessionChanged:
+                continue  # a concurrent update won; recompute from fresh state
+        return self._update(session_id, changes)
+
+    def _update(self, session_id, changes):
+        current = self.sessions_table.get_item(
+            Key={"session_id": session_id}, ConsistentRead=True
+        ).get("Item")
+        if current is None:
+            raise SessionNotFound("Session not found")
+
+        updated = dict(current, **changes)
+        old_slot = held_slot(current)
+        if updated.get("status") == CANCELLED or not updated.get("counsellor_id"):
+            new_slot = None
+        elif "date_time" in changes or "session_time" in changes:
+            new_slot = bookable_slot(updated.get("date_time"), updated.get("session_time"))
+        else:
+            new_slot = held_slot(updated)
+
+        items, claim_index = [], None
+        if old_slot and old_slot != new_slot:
+            items.append(self._release(current, old_slot))
+        if new_slot and new_slot != old_slot:
+            claim_index = len(items)
+            items.append(self._claim(updated, new_slot))
+
+        # The slot decision above was made from `current`; only apply it if
+        # the scheduling fields still hold the values it was based on.
+        names, values, sets, guards = {}, {}, [], ["attribute_exists(session_id)"]
+        for i, field in enumerate(UPDATABLE_FIELDS):
+            names[f"#f{i}"] = field
+            if field in current:
+                values[f":c{i}"] = current[field]
+                guards.append(f"#f{i} = :c{i}")
+            else:
+                guards.append(f"attribute_not_exists(#f{i})")
+            if field in changes:
+                values[f":v{i}"] = changes[field]
+                sets.append(f"#f{i} = :v{i}")
+        items.append({"Update": {
+            "TableName": self.sessions_table.name,
+            "Key": {"session_id": session_id},
+            "UpdateExpression": "SET " + ", ".join(sets),
+            "ConditionExpression": " AND ".join(guards),
+            "ExpressionAttributeNames": names,
+            "ExpressionAttributeValues": values,
+        }})
+        try:
+            self._transact(items, claim_index, len(items) - 1)
+        except SessionNotFound:
+            raise SessionChanged("The session was changed concurrently; please retry")
+        return updated
+
+    def availability(self, counsellor_id, start, end):
+        """
+        Returns one entry per day in [start, end] with the free and booked
+        slot start times, from a single range Query on the slot index.
+        """
+        if end < start:
+            raise ValueError("'to' must not be before 'from'")
+        days = (end - start).days + 1
+        if days > MAX_AVAILABILITY_DAYS:
+            raise ValueError(f"A range covers at most {MAX_AVAILABILITY_DAYS} days")
+
+        booked = {}
+        for item in iter_items(
+            self.slots_table.query,
+            KeyConditionExpression=Key("counsellor_id").eq(counsellor_id)
+            & Key("slot").between(f"{start.isoformat()}#", f"{end.isoformat()}#~"),
+            ProjectionExpression="slot"
+        ):
+            date, time = item["slot"].split("#", 1)
+            booked.setdefault(date, []).append(time)
+
+        grid = day_slots()
+        result = []
+        for offset in range(days):
+            date = (start + datetime.timedelta(days=offset)).isoformat()
+            taken = booked.get(date, [])
+            result.append({
+                "date": date,
+                "available": [t for t in grid if t not in taken],
+                "booked": taken,
+            })
+        return result
@@ -0,0 +1,73 @@
+"""
+Indexed read path for the Sessions table.
+
+Sessions are keyed by session_id, with two GSIs sorted on `date_time`
+(YYYY-MM-DD, so lexical order is date order):
+
+  customer_id-date_time-index    partition: customer_id
+  counsellor_id-date_time-index  partition: counsellor_id
+
+Every GET /sessions is one Query on the partition of the requested user;
+`from`/`to` narrow the sort key range and `status` (or a second user id)
+is applied as a filter on that partition only.
+"""
+import hashlib
+import json
+import os
+
+from boto3.dynamodb.conditions import Attr, Key
+
+from common.pagination import check_start_key, iter_items, key_fields
+
+CUSTOMER_INDEX = os.environ.get('SESSIONS_CUSTOMER_INDEX', 'customer_id-date_time-index')
+COUNSELLOR_INDEX = os.environ.get('SESSIONS_COUNSELLOR_INDEX', 'counsellor_id-date_time-index')
+
+
+def query_sessions(table, customer_id=None, counsellor_id=None, status=None,
+                   start=None, end=None, page_size=None, start_key=None):
+    """
+    Yields sessions for a customer and/or counsellor in date order.
+    With both ids, returns only sessions between the two. `start`/`end`
+    are inclusive dates. Returns (items, key_of) where key_of builds the
+    resume key for an item. Raises ValueError without a user id, or for a
+    start_key that is not a key of the queried partition.
+    """
+    if customer_id:
+        index, key_name, key_value = CUSTOMER_INDEX, "customer_id", customer_id
+    elif counsellor_id:
+        index, key_name, key_value = COUNSELLOR_INDEX, "counsellor_id", counsellor_id
+    else:
+        raise ValueError("Query param 'customerId' or 'counsellorId' is required")
+
+    check_start_key(start_key, ("session_id", key_name, "date_time"), **{key_name: key_value})
+
+    condition = Key(key_name).eq(key_value)
+    if start and end:
+        condition = condition & Key("date_time").between(start, end)
+    elif start:
+        condition = condition & Key("date_time").gte(start)
+    elif end:
+        condition = condition & Key("date_time").lte(end)
+
+    filters = []
+    if customer_id and counsellor_id:
+        filters.append(Attr("counsellor_id").eq(counsellor_id))
+    if status:
+        filters.append(Attr("status").eq(status))
+
+    kwargs = {"IndexName": index, "KeyConditionExpression": condition}
+    if filters:
+        expression = filters[0]
+        for extra in filters[1:]:
+            expression = expression & extra
+        kwargs["FilterExpression"] = expression
+    if page_size:
+        kwargs["Limit"] = page_size
+    items = iter_items(table.query, start_key=start_key, **kwargs)
+    return items, key_fields("session_id", key_name, "date_time")
+
+
+def sessions_etag(items):
+    """A weak ETag value over a complete, already read list of sessions."""
+    body = json.dumps(items, sort_keys=True, default=str).encode("utf-8")
+    return hashlib.sha1(body).hexdigest()
@@ -0,0 +1,75 @@
+"""
+Tests import the service's modules (app, messages, ...) and common/ as the
+service does when run from its directory. The `app` fixture imports the
+Flask app once, against moto tables, with token verification stubbed out.
+"""
+import importlib
+import os
+import sys
+
+import pytest
+
+SERVICE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+REPO_ROOT = os.path.dirname(SERVICE_DIR)
+sys.path[:0] = [path for path in (SERVICE_DIR, REPO_ROOT) if path not in sys.path]
+
+
+def _create_table(dynamodb, name, keys, indexes=()):
+    attributes = set(keys) | {key for _, index_keys in indexes for key in index_keys}
+
+    def key_schema(names):
+        return [{"AttributeName": n, "KeyType": kind} for n, kind in zip(names, ("HASH", "RANGE"))]
+
+    kwargs = {}
+    if indexes:
+        kwargs["GlobalSecondaryIndexes"] = [
+            {"IndexName": index, "KeySchema": key_schema(index_keys), "Projection": {"ProjectionType": "ALL"}}
+            for index, index_keys in indexes
+        ]
+    dynamodb.create_table(
+        TableName=name,
+        BillingMode="PAY_PER_REQUEST",
+        KeySchema=key_schema(keys),
+        AttributeDefinitions=[{"AttributeName": a, "AttributeType": "S"} for a in sorted(attributes)],
+        **kwargs,
+    )
+
+
+@pytest.fixture(scope="session")
+def app(tmp_path_factory):
+    moto = pytest.importorskip("moto")
+    jwks = tmp_path_factory.mktemp("auth") / "jwks.json"
+    jwks.write_text('{"keys": []}')
+    env = {
+        "AWS_REGION": "us-east-1", "AWS_DEFAULT_REGION": "us-east-1",
+        "AWS_ACCESS_KEY_ID": "test", "AWS_SECRET_ACCESS_KEY": "test",
+        "COGNITO_USER_POOL_ID": "pool", "COGNITO_USER_POOL_CLIENT_ID": "client",
+        "COGNITO_JWKS_URL": str(jwks), "RATE_LIMIT_ENABLED": "0",
+    }
+    saved = {name: os.environ.get(name) for name in env}
+    os.environ.update(env)
+    with moto.mock_aws():
+        import boto3
+        dynamodb = boto3.resource("dynamodb", region_name="us-east-1")
+        _create_table(dynamodb, "Messages", ["message_id"], [
+            ("sender_id-timestamp-index", ["sender_id", "timestamp"]),
+            ("receiver_id-timestamp-index", ["receiver_id", "timestamp"]),
+            ("conversation_id-timestamp-index", ["conversation_id", "timestamp"]),
+        ])
+        _create_table(dynamodb, "Sessions", ["session_id"], [
+            ("customer_id-date_time-index", ["customer_id", "date_time"]),
+            ("counsellor_id-date_time-index", ["counsellor_id", "date_time"]),
+        ])
+        _create_table(dynamodb, "SessionSlots", ["counsellor_id", "slot"])
+        _create_table(dynamodb, "Conversations", ["user_id", "conversation_id"], [
+            ("user_id-last_timestamp-index", ["user_id", "last_timestamp"]),
+        ])
+
+        module = importlib.import_module("app")
+        module.verify_cognito_token = lambda token: {"sub": "alice"}
+        yield module
+    for name, value in saved.items():
+        if value is None:
+            os.environ.pop(name, None)
+        else:
+            os.environ[name] = value
@@ -0,0 +1,76 @@
+"""
+Unpaginated GET /messages and GET /sessions are streamed; repeating one
+with the ETag it returned must get a 304 until the result changes.
+
+    pip install pytest moto
+    python -m pytest messaging-service/tests
+"""
+import datetime
+
+import pytest
+
+pytest.importorskip("moto")
+
+AUTH = {"Authorization": "Bearer test-token"}
+
+
+def _revalidate(client, url):
+    first = client.get(url, headers=AUTH)
+    assert first.status_code == 200
+    etag = first.headers.get("ETag")
+    assert etag
+    again = client.get(url, headers={**AUTH, "If-None-Match": etag})
+    return first, again
+
+
+def test_unpaginated_messages_revalidate(app):
+    client = app.app.test_client()
+    for content in ("hi", "hello"):
+        response = client.post("/messages", json={"sender_id": "alice", "receiver_id": "bob", "content": content},
+                               headers=AUTH)
+        assert response.status_code == 201
+
+    for url in ("/messages?userId=alice", "/messages?userId=alice&peerId=bob"):
+        first, again = _revalidate(client, url)
+        assert len(first.get_json()) == 2
+        assert again.status_code == 304
+        assert again.headers["ETag"] == first.headers["ETag"]
+
+    client.post("/messages", json={"sender_id": "bob", "receiver_id": "alice", "content": "new"}, headers=AUTH)
+    changed = client.get("/messages?userId=alice", headers={**AUTH, "If-None-Match": first.headers["ETag"]})
+    assert changed.status_code == 200
+    assert len(changed.get_json()) == 3
+
+
+def test_late_message_changes_the_messages_etag(app):
+    client = app.app.test_client()
+    client.post("/messages", json={"sender_id": "dave", "receiver_id": "erin", "content": "now"}, headers=AUTH)
+    first = client.get("/messages?userId=dave", headers=AUTH)
+
+    # Stamped before the last message but stored after it, as under concurrent writes.
+    late = app.messages.new_message({"sender_id": "erin", "receiver_id": "dave", "content": "late"},
+                                    datetime.datetime(2000, 1, 1))
+    app.messages_table.put_item(Item=late)
+    app.record_conversations([late])
+    changed = client.get("/messages?userId=dave", headers={**AUTH, "If-None-Match": first.headers["ETag"]})
+    assert changed.status_code == 200
+    assert [m["content"] for m in changed.get_json()] == ["now", "late"]
+
+
+def test_unpaginated_sessions_revalidate(app):
+    client = app.app.test_client()
+    response = client.post("/sessions", json={
+        "customer_id": "alice", "counsellor_id": "carol", "date_time": "2030-01-07",
+        "session_time": "10:00", "status": "booked",
+    }, headers=AUTH)
+    assert response.status_code == 201
+    session_id = response.get_json()["data"]["session_id"]
+
+    first, again = _revalidate(client, "/sessions?customerId=alice")
+    assert len(first.get_json()) == 1
+    assert again.status_code == 304
+
+    client.put(f"/sessions/{session_id}", json={"status": "cancelled"}, headers=AUTH)
+    changed = client.get("/sessions?customerId=alice", headers={**AUTH, "If-None-Match": first.headers["ETag"]})
+    assert changed.status_code == 200
+    assert changed.get_json()[0]["status"] == "cancelled"
@@ -0,0 +1,133 @@
+"""
+JWKSManager and CognitoTokenVerifier against a local JWKS file, the same
+stand-in for Cognito that COGNITO_JWKS_URL selects.
+"""
+import json
+import threading
+import time
+
+import pytest
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import rsa
+from jose import jwk, jwt
+
+from common.auth import CognitoTokenVerifier
+from common.jwks import JWKSManager
+
+REGION, POOL, CLIENT = "eu-north-1", "pool", "client"
+
+
+def make_key(kid):
+    """Returns (private PEM, public JWK) for a fresh RSA key."""
+    private = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    pem = private.private_bytes(serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8,
+                                serialization.NoEncryption()).decode("ascii")
+    public = jwk.construct(pem, "RS256").public_key().to_dict()
+    public = {name: value.decode("ascii") if isinstance(value, bytes) else value for name, value in public.items()}
+    return pem, dict(public, kid=kid, alg="RS256")
+
+
+@pytest.fixture(scope="module")
+def keys():
+    return {kid: make_key(kid) for kid in ("k1", "k2")}
+
+
+class JWKSFile:
+    """A JWKS file the test rewrites, as Cognito rotates keys."""
+
+    def __init__(self, path, keys):
+        self.path = path
+        self.keys = keys
+
+    def __str__(self):
+        return str(self.path)
+
+    def publish(self, *kids):
+        self.path.write_text(json.dumps({"keys": [self.keys[kid][1] for kid in kids]}))
+
+
+@pytest.fixture
+def jwks_file(tmp_path, keys):
+    file = JWKSFile(tmp_path / "jwks.json", keys)
+    file.publish("k1")
+    return file
+
+
+def counting(manager, delay=0.0):
+    """Wraps manager._fetch to count calls, optionally slowing each down."""
+    calls = []
+    fetch = manager._fetch
+
+    def wrapped():
+        calls.append(1)
+        time.sleep(delay)
+        return fetch()
+    manager._fetch = wrapped
+    return calls
+
+
+def wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            return False
+        time.sleep(0.01)
+    return True
+
+
+def test_background_refresh_picks_up_rotated_keys(jwks_file):
+    manager = JWKSManager(str(jwks_file), default_max_age=0, min_refresh_interval=0.05)
+    manager.start(wait=True)
+    try:
+        assert manager.get_key("k1") is not None
+        jwks_file.publish("k2")
+        assert wait_for(lambda: "k2" in manager._keys and "k1" not in manager._keys)
+    finally:
+        manager.stop()
+
+
+def test_unknown_kid_refetches_once_for_concurrent_misses(jwks_file):
+    manager = JWKSManager(str(jwks_file), kid_miss_interval=60)
+    manager.refresh()
+    jwks_file.publish("k1", "k2")
+    calls = counting(manager, delay=0.1)
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(manager.get_key("k2"))) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(calls) == 1
+    assert len(results) == 8 and all(key is not None for key in results)
+    # Within kid_miss_interval another unknown kid does not fetch again.
+    assert manager.get_key("k3") is None
+    assert len(calls) == 1
+
+
+def test_failed_refresh_keeps_last_good_keys(jwks_file):
+    manager = JWKSManager(str(jwks_file), retry_interval=30)
+    assert manager.refresh()
+    key = manager.get_key("k1")
+
+    jwks_file.path.write_text("not json")
+    assert manager.refresh() is False
+    assert manager.last_error
+    assert manager.get_key("k1") is key
+
+    jwks_file.path.unlink()
+    assert manager.refresh() is False
+    assert manager.get_key("k1") is key
+    assert manager.loaded
+
+
+def test_verifier_accepts_tokens_signed_with_a_published_key(jwks_file, keys):
+    verifier = CognitoTokenVerifier(REGION, POOL, CLIENT, jwks_url=str(jwks_file))
+    verifier.jwks.refresh()
+    claims = {"sub": "u1", "aud": CLIENT, "iss": verifier.issuer, "exp": int(time.time()) + 300}
+
+    assert verifier.verify(jwt.encode(claims, keys["k1"][0], algorithm="RS256", headers={"kid": "k1"}))["sub"] == "u1"
+    forged = jwt.encode(claims, keys["k2"][0], algorithm="RS256", headers={"kid": "k1"})
+    with pytest.raises(ValueError):
+        verifier.verify(forged)
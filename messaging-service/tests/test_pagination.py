@@ -0,0 +1,157 @@
+"""
+Opaque cursors (common/pagination.py) and walking paginated endpoints to
+their last page.
+"""
+import base64
+import json
+import re
+from decimal import Decimal
+
+import pytest
+
+from common.pagination import check_start_key, decode_cursor, encode_cursor, parse_page_args, take_page
+
+AUTH = {"Authorization": "Bearer test-token"}
+
+
+def raw_cursor(wire):
+    return base64.urlsafe_b64encode(json.dumps(wire).encode()).decode().rstrip("=")
+
+
+# ----------------------------------------------------------------
+#  Cursors
+# ----------------------------------------------------------------
+@pytest.mark.parametrize("position", [
+    {"session_id": "s1", "customer_id": "alice", "date_time": "2030-01-01"},
+    {"sent": {"message_id": "m1", "sender_id": "a", "timestamp": "2030-01-01T00:00:00Z"},
+     "received": {"message_id": "m2", "receiver_id": "a", "timestamp": "2030-01-01T00:00:01Z"}},
+    {"user_id": "u", "score": Decimal("12.5")},
+])
+def test_cursor_round_trip(position):
+    cursor = encode_cursor(position)
+    assert re.fullmatch(r"[A-Za-z0-9_-]+", cursor)
+    assert decode_cursor(cursor) == position
+
+
+def test_empty_positions_have_no_cursor():
+    assert encode_cursor(None) is None and encode_cursor({}) is None
+    assert decode_cursor(None) is None and decode_cursor("") is None
+
+
+@pytest.mark.parametrize("cursor", [
+    "not a cursor!",
+    encode_cursor({"user_id": "u"})[:-4],             # truncated
+    raw_cursor(["user_id"]),                          # not an object
+    raw_cursor({"user_id": {"Q": "u"}}),              # unknown type tag
+    base64.urlsafe_b64encode(b"\xff\xfe").decode(),   # not JSON
+])
+def test_malformed_cursors_are_rejected(cursor):
+    with pytest.raises(ValueError, match="Invalid cursor"):
+        decode_cursor(cursor)
+
+
+def test_check_start_key():
+    names = ("session_id", "customer_id", "date_time")
+    key = {"session_id": "s1", "customer_id": "alice", "date_time": "2030-01-01"}
+    assert check_start_key(key, names, customer_id="alice") == key
+    assert check_start_key(None, names, customer_id="alice") is None
+    for bad in (
+        dict(key, customer_id="mallory"),                 # another user's partition
+        {"session_id": "s1", "customer_id": "alice"},     # missing attribute
+        dict(key, extra="x"),                             # unexpected attribute
+        dict(key, date_time={"S": "2030-01-01"}),         # not a scalar
+        "s1",
+    ):
+        with pytest.raises(ValueError):
+            check_start_key(bad, names, customer_id="alice")
+
+
+def test_parse_page_args():
+    assert parse_page_args({}) == (False, None, None)
+    paginated, limit, position = parse_page_args({"limit": "10", "cursor": encode_cursor({"user_id": "u"})})
+    assert (paginated, limit, position) == (True, 10, {"user_id": "u"})
+    assert parse_page_args({"limit": "100000"})[1] == parse_page_args({"cursor": ""})[1]
+    for bad in ({"limit": "0"}, {"limit": "-1"}, {"limit": "ten"}, {"cursor": "!!"}):
+        with pytest.raises(ValueError):
+            parse_page_args(bad)
+
+
+def test_take_page_has_no_next_key_on_the_last_page():
+    key_of = lambda item: {"id": item}  # noqa: E731
+    assert take_page(iter([1, 2, 3]), 2, key_of) == ([1, 2], {"id": 2})
+    assert take_page(iter([1, 2]), 2, key_of) == ([1, 2], None)
+    assert take_page(iter([]), 2, key_of) == ([], None)
+
+
+# ----------------------------------------------------------------
+#  Endpoints
+# ----------------------------------------------------------------
+def walk(client, url, limit):
+    """Follows next_cursor from the first page; returns the pages' items."""
+    pages, cursor = [], None
+    while True:
+        response = client.get(url + f"&limit={limit}" + (f"&cursor={cursor}" if cursor else ""), headers=AUTH)
+        assert response.status_code == 200
+        body = response.get_json()
+        pages.append(body["items"])
+        cursor = body["next_cursor"]
+        if cursor is None:
+            return pages
+
+
+@pytest.mark.parametrize("count, limit, sizes", [(5, 2, [2, 2, 1]), (4, 2, [2, 2]), (0, 2, [0])])
+def test_message_pages_cover_the_history_once(app, count, limit, sizes):
+    client = app.app.test_client()
+    user = f"walker-{count}-{limit}"
+    for i in range(count):
+        sender, receiver = (user, "peer") if i % 2 else ("peer", user)
+        client.post("/messages", json={"sender_id": sender, "receiver_id": receiver, "content": str(i)}, headers=AUTH)
+
+    full = client.get(f"/messages?userId={user}", headers=AUTH).get_json()
+    for url in (f"/messages?userId={user}", f"/messages?userId={user}&peerId=peer"):
+        pages = walk(client, url, limit)
+        assert [len(page) for page in pages] == sizes
+        assert [m["message_id"] for page in pages for m in page] == [m["message_id"] for m in full]
+
+
+def test_inbox_and_session_pages_end_with_a_null_cursor(app):
+    client = app.app.test_client()
+    for peer in ("p1", "p2", "p3"):
+        client.post("/messages", json={"sender_id": "inbox-walker", "receiver_id": peer, "content": "hi"},
+                    headers=AUTH)
+    for time in ("09:00", "10:00", "11:00"):
+        client.post("/sessions", json={"customer_id": "session-walker", "counsellor_id": "c-walk",
+                                       "date_time": "2030-05-06", "session_time": time}, headers=AUTH)
+
+    assert [len(page) for page in walk(client, "/conversations?userId=inbox-walker", 2)] == [2, 1]
+    assert [len(page) for page in walk(client, "/sessions?customerId=session-walker", 2)] == [2, 1]
+    assert [len(page) for page in walk(client, "/sessions?customerId=session-walker", 3)] == [3]
+
+
+def test_tampered_cursors_get_400(app):
+    client = app.app.test_client()
+    for i in range(3):
+        client.post("/messages", json={"sender_id": "owner", "receiver_id": "friend", "content": str(i)},
+                    headers=AUTH)
+    body = client.get("/messages?userId=owner&limit=1", headers=AUTH).get_json()
+    position = decode_cursor(body["next_cursor"])
+
+    stolen = {"sent": dict(position["sent"], sender_id="someone-else")}
+    session_key = {"session_id": "s", "customer_id": "someone-else", "date_time": "2030-01-01"}
+    for url, cursor in (
+        ("/messages?userId=owner", encode_cursor(stolen)),
+        ("/messages?userId=owner", encode_cursor({"bogus": position["sent"]})),
+        ("/messages?userId=owner&peerId=friend", body["next_cursor"]),
+        ("/messages?userId=owner", body["next_cursor"][:-3] + "AAA"),
+        ("/conversations?userId=owner", encode_cursor({"user_id": "owner"})),
+        ("/sessions?customerId=owner", encode_cursor(session_key)),
+        ("/sessions?customerId=owner", "garbage!"),
+    ):
+        response = client.get(f"{url}&limit=1&cursor={cursor}", headers=AUTH)
+        assert response.status_code == 400, url
+        assert response.get_json()["error"]
+
+    response = client.post("/messages/batch-get", json={
+        "user_id": "owner", "peer_ids": ["friend"], "cursors": {"friend": encode_cursor(stolen)},
+    }, headers=AUTH)
+    assert response.status_code == 400
@@ -0,0 +1,192 @@
+"""
+Token buckets (common/ratelimit.py) on the memory backend with an injected
+clock, and the DynamoDB backend's conditional writes against a stub table.
+"""
+import pytest
+from botocore.exceptions import ClientError, EndpointConnectionError
+from flask import Flask
+
+from common import ratelimit
+from common.ratelimit import DynamoDBBackend, Limit, MemoryBackend, RateLimiter
+
+
+class Clock:
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture(autouse=True)
+def enabled(monkeypatch):
+    # The app fixture imports the module with RATE_LIMIT_ENABLED=0.
+    monkeypatch.setattr(ratelimit, "RATE_LIMIT_ENABLED", True)
+
+
+@pytest.fixture
+def request_from():
+    app = Flask(__name__)
+
+    def context(ip):
+        return app.test_request_context("/", headers={"X-Forwarded-For": ip})
+    return context
+
+
+def test_parse():
+    limit = Limit.parse("10/minute")
+    assert (limit.count, limit.period, limit.interval, limit.tolerance) == (10, 60, 6.0, 60.0)
+    assert Limit.parse("5/hours").period == 3600
+    assert Limit.parse("") is None and Limit.parse("0") is None and Limit.parse("0/second") is None
+    with pytest.raises(ValueError):
+        Limit.parse("ten/minute")
+
+
+def test_burst_then_reject_then_refill():
+    clock = Clock()
+    backend = MemoryBackend(clock=clock)
+    limit = Limit.parse("3/minute")
+
+    assert [backend.take("k", limit.interval, limit.tolerance) for _ in range(3)] == [0.0, 0.0, 0.0]
+    assert backend.take("k", limit.interval, limit.tolerance) == pytest.approx(20.0)
+    clock.now += 19.5
+    assert backend.take("k", limit.interval, limit.tolerance) == pytest.approx(0.5)
+    clock.now += 0.5
+    assert backend.take("k", limit.interval, limit.tolerance) == 0.0
+    # A rejected take does not count against the bucket.
+    assert backend.take("k", limit.interval, limit.tolerance) == pytest.approx(20.0)
+
+
+def test_refund_gives_tokens_back():
+    clock = Clock()
+    backend = MemoryBackend(clock=clock)
+    limit = Limit.parse("2/minute")
+    backend.take("k", limit.interval, limit.tolerance, cost=2)
+    assert backend.take("k", limit.interval, limit.tolerance) > 0
+
+    backend.refund("k", limit.interval)
+    assert backend.take("k", limit.interval, limit.tolerance) == 0.0
+    backend.refund("unknown", limit.interval)  # nothing taken, nothing to give back
+
+
+@pytest.mark.parametrize("spec, elapsed, retry_after", [
+    ("3/minute", 0.0, "20"),     # exactly 20s
+    ("3/minute", 0.5, "20"),     # 19.5s rounds up
+    ("3/minute", 19.9, "1"),     # 0.1s is still a whole second
+    ("10/second", 0.0, "1"),
+])
+def test_retry_after_is_whole_seconds_rounded_up(request_from, spec, elapsed, retry_after):
+    clock = Clock()
+    limiter = RateLimiter("t", per_ip=spec, backend=MemoryBackend(clock=clock))
+    with request_from("203.0.113.1"):
+        for _ in range(Limit.parse(spec).count):
+            assert limiter.check() is None
+        clock.now += elapsed
+        response = limiter.check()
+    assert response.status_code == 429
+    assert response.headers["Retry-After"] == retry_after
+    assert response.get_json()["retry_after"] == int(retry_after)
+
+
+def test_total_limit_rejection_refunds_the_per_ip_bucket(request_from):
+    clock = Clock()
+    backend = MemoryBackend(clock=clock)
+    limiter = RateLimiter("t", per_ip="5/minute", per_user="5/minute", total="2/minute", backend=backend)
+    with request_from("203.0.113.1"):
+        assert limiter.check(user="u1") is None
+        assert limiter.check(user="u1") is None
+        assert limiter.check(user="u1").status_code == 429   # over the total
+    # Only the two accepted requests were charged to the client's own buckets.
+    assert backend._tat["t:ip:203.0.113.1"] == pytest.approx(clock.now + 2 * 12)
+    assert backend._tat["t:user:u1"] == pytest.approx(clock.now + 2 * 12)
+
+    with request_from("203.0.113.2"):
+        assert limiter.check(user="u2").status_code == 429
+    assert backend._tat["t:ip:203.0.113.2"] <= clock.now
+    assert backend._tat["t:user:u2"] <= clock.now
+
+
+def test_per_user_rejection_does_not_drain_the_ip_bucket(request_from):
+    limiter = RateLimiter("t", per_ip="3/minute", per_user="1/minute", backend=MemoryBackend(clock=Clock()))
+    with request_from("203.0.113.1"):
+        assert limiter.check(user="u1") is None
+        for _ in range(5):
+            assert limiter.check(user="u1").status_code == 429
+        # Another user behind the same address still has the IP's other two tokens.
+        assert limiter.check(user="u2") is None
+        assert limiter.check(user="u3") is None
+        assert limiter.check(user="u4").status_code == 429
+
+
+# ----------------------------------------------------------------
+#  DynamoDB backend
+# ----------------------------------------------------------------
+def conditional_failure():
+    return ClientError({"Error": {"Code": "ConditionalCheckFailedException"}}, "PutItem")
+
+
+class StubTable:
+    """One bucket table in a dict; `interfere` writes run between a read and the next put."""
+
+    def __init__(self):
+        self.items = {}
+        self.interfere = []
+        self.puts = 0
+
+    def get_item(self, Key, ConsistentRead):
+        item = self.items.get(Key["bucket"])
+        return {"Item": dict(item)} if item else {}
+
+    def put_item(self, Item, ConditionExpression, ExpressionAttributeValues=None):
+        self.puts += 1
+        if self.interfere:
+            self.interfere.pop(0)(self.items)
+        current = self.items.get(Item["bucket"])
+        if ConditionExpression == "attribute_not_exists(tat)":
+            if current is not None:
+                raise conditional_failure()
+        elif current is None or current["tat"] != ExpressionAttributeValues[":old"]:
+            raise conditional_failure()
+        self.items[Item["bucket"]] = Item
+
+
+def test_dynamodb_take_retries_when_another_replica_wrote_first():
+    clock = Clock()
+    table = StubTable()
+    backend = DynamoDBBackend(table, clock=clock)
+    limit = Limit.parse("2/minute")
+
+    # Another replica takes a token between our read and our write.
+    table.interfere.append(lambda items: items.update(k={"bucket": "k", "tat": str(clock.now + 30)}))
+    assert backend.take("k", limit.interval, limit.tolerance) == 0.0
+    assert table.puts == 2
+    assert float(table.items["k"]["tat"]) == pytest.approx(clock.now + 60)
+    assert backend.take("k", limit.interval, limit.tolerance) == pytest.approx(30.0)
+
+
+def test_dynamodb_take_fails_open_after_retries(monkeypatch):
+    table = StubTable()
+    table.interfere = [lambda items, n=n: items.update(k={"bucket": "k", "tat": str(n)})
+                       for n in range(DynamoDBBackend.RETRIES)]
+    backend = DynamoDBBackend(table, clock=Clock())
+    assert backend.take("k", 30.0, 60.0) == 0.0
+    assert table.puts == DynamoDBBackend.RETRIES
+
+    def unreachable(**kwargs):
+        raise EndpointConnectionError(endpoint_url="https://dynamodb")
+    monkeypatch.setattr(table, "get_item", unreachable)
+    assert backend.take("k", 30.0, 60.0) == 0.0
+
+
+def test_dynamodb_refund():
+    clock = Clock()
+    table = StubTable()
+    backend = DynamoDBBackend(table, clock=clock)
+    backend.take("k", 30.0, 60.0, cost=2)
+    assert backend.take("k", 30.0, 60.0) > 0
+
+    table.interfere.append(lambda items: None)  # a put that wins the race is not retried
+    backend.refund("k", 30.0)
+    assert float(table.items["k"]["tat"]) == pytest.approx(clock.now + 30)
+    assert backend.take("k", 30.0, 60.0) == 0.0
+    backend.refund("missing", 30.0)
@@ -0,0 +1,65 @@
+"""
+Booking and rescheduling through the API: one session per counsellor slot,
+slots within the working day, and a reschedule moving the slot it holds.
+"""
+import pytest
+
+pytest.importorskip("moto")
+
+AUTH = {"Authorization": "Bearer test-token"}
+DATE = "2030-03-04"
+
+
+def book(client, counsellor_id, time, customer_id="alice", date=DATE):
+    return client.post("/sessions", json={
+        "customer_id": customer_id, "counsellor_id": counsellor_id, "date_time": date,
+        "session_time": time, "status": "booked",
+    }, headers=AUTH)
+
+
+def availability(client, counsellor_id, date=DATE):
+    response = client.get(f"/counsellors/{counsellor_id}/availability?from={date}", headers=AUTH)
+    assert response.status_code == 200
+    return response.get_json()["days"][0]
+
+
+def test_second_booking_of_a_slot_gets_409(app):
+    client = app.app.test_client()
+    assert book(client, "c-double", "10:00").status_code == 201
+
+    response = book(client, "c-double", "10:00", customer_id="bob")
+    assert response.status_code == 409
+    sessions = client.get("/sessions?counsellorId=c-double", headers=AUTH).get_json()
+    assert [s["customer_id"] for s in sessions] == ["alice"]
+    # Another counsellor, or another slot, is free.
+    assert book(client, "c-other", "10:00", customer_id="bob").status_code == 201
+    assert book(client, "c-double", "11:00", customer_id="bob").status_code == 201
+
+
+@pytest.mark.parametrize("time", ["22:00", "08:00", "17:00", "14:30", "25:00", "noon"])
+def test_times_outside_the_working_day_or_grid_get_400(app, time):
+    client = app.app.test_client()
+    response = book(client, "c-hours", time)
+    assert response.status_code == 400
+    assert "session_time" in response.get_json()["error"]
+    assert availability(client, "c-hours")["booked"] == []
+
+
+def test_reschedule_frees_the_old_slot_and_claims_the_new_one(app):
+    client = app.app.test_client()
+    session_id = book(client, "c-move", "10:00").get_json()["data"]["session_id"]
+    assert book(client, "c-move", "12:00", customer_id="bob").status_code == 201
+
+    assert client.put(f"/sessions/{session_id}", json={"session_time": "12:00"}, headers=AUTH).status_code == 409
+    assert client.put(f"/sessions/{session_id}", json={"session_time": "18:00"}, headers=AUTH).status_code == 400
+
+    response = client.put(f"/sessions/{session_id}", json={"session_time": "11:00"}, headers=AUTH)
+    assert response.status_code == 200
+    day = availability(client, "c-move")
+    assert sorted(day["booked"]) == ["11:00", "12:00"]
+    assert "10:00" in day["available"]
+    # The freed slot can be booked again.
+    assert book(client, "c-move", "10:00", customer_id="carol").status_code == 201
+
+    assert client.put(f"/sessions/{session_id}", json={"status": "cancelled"}, headers=AUTH).status_code == 200
+    assert "11:00" in availability(client, "c-move")["available"]
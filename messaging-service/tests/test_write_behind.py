@@ -0,0 +1,135 @@
+"""
+MessageWriter against a stub table whose BatchWriteItem answers are
+scripted, so stored, retried and dropped messages can be checked.
+"""
+import time
+import types
+
+import pytest
+from botocore.exceptions import ClientError
+
+import messages
+import write_behind
+
+
+class StubTable:
+    """
+    Answers batch_write_item from `responses` in turn, then with `default`
+    (everything stored). A response is a dict, a function of the requests,
+    or an exception to raise.
+    """
+
+    name = "Messages"
+
+    def __init__(self, *responses, default=None):
+        self.responses = list(responses)
+        self.default = default or {}
+        self.calls = []
+        self.meta = types.SimpleNamespace(client=self)
+
+    def batch_write_item(self, RequestItems):
+        requests = RequestItems[self.name]
+        self.calls.append([r["PutRequest"]["Item"]["message_id"] for r in requests])
+        response = self.responses.pop(0) if self.responses else self.default
+        if isinstance(response, Exception):
+            raise response
+        return response(requests) if callable(response) else response
+
+
+def unprocessed(*message_ids):
+    """A response that leaves the given messages unprocessed."""
+    def response(requests):
+        left = [r for r in requests if r["PutRequest"]["Item"]["message_id"] in message_ids]
+        return {"UnprocessedItems": {StubTable.name: left}} if left else {}
+    return response
+
+
+def message(message_id):
+    return {"message_id": message_id, "sender_id": "a", "receiver_id": "b",
+            "conversation_id": "a#b", "timestamp": f"2030-01-01T00:00:00.{message_id}Z"}
+
+
+@pytest.fixture(autouse=True)
+def no_backoff(monkeypatch):
+    monkeypatch.setattr(messages, "BATCH_WRITE_BACKOFF_SECONDS", 0)
+
+
+def make_writer(table, written, **kwargs):
+    kwargs.setdefault("flush_interval", 0.01)
+    return write_behind.MessageWriter(table, on_written=written.append, **kwargs)
+
+
+def test_flush_reports_stored_messages_once_per_batch():
+    written = []
+    writer = make_writer(StubTable(*[unprocessed("2")] * messages.BATCH_WRITE_ATTEMPTS), written)
+    entries = [write_behind._Entry(message(i)) for i in ("1", "2", "3")]
+
+    retry = writer._flush(entries)
+
+    assert written == [[message("1"), message("3")]]
+    assert [entry.message["message_id"] for entry in retry] == ["2"]
+
+
+def test_failed_messages_are_retried_in_the_next_round():
+    written = []
+    table = StubTable(*[unprocessed("2")] * messages.BATCH_WRITE_ATTEMPTS)
+    writer = make_writer(table, written)
+
+    retry = writer._flush([write_behind._Entry(message(i)) for i in ("1", "2")])
+    assert [(entry.message["message_id"], entry.rounds) for entry in retry] == [("2", 1)]
+
+    assert writer._flush(retry) == []
+    assert written == [[message("1")], [message("2")]]
+    assert table.calls[-1] == ["2"]
+
+
+def test_a_failed_request_retries_the_whole_batch():
+    throttled = ClientError({"Error": {"Code": "ProvisionedThroughputExceededException"}}, "BatchWriteItem")
+    written = []
+    writer = make_writer(StubTable(throttled), written)
+
+    retry = writer._flush([write_behind._Entry(message(i)) for i in ("1", "2")])
+    assert [entry.message["message_id"] for entry in retry] == ["1", "2"]
+    assert written == []
+    assert writer._flush(retry) == []
+    assert written == [[message("1"), message("2")]]
+
+
+def test_messages_are_dropped_after_max_rounds():
+    written = []
+    table = StubTable(default=unprocessed("2"))
+    writer = make_writer(table, written, max_rounds=3)
+    dropped = write_behind.WRITES.value(result="dropped")
+
+    batch = [write_behind._Entry(message(i)) for i in ("1", "2")]
+    rounds = 0
+    while batch:
+        batch = writer._flush(batch)
+        rounds += 1
+    assert rounds == 3
+    assert write_behind.WRITES.value(result="dropped") == dropped + 1
+    assert written == [[message("1")]]
+    assert len(table.calls) == 3 * messages.BATCH_WRITE_ATTEMPTS
+
+
+def test_full_queue_raises_backpressure():
+    writer = make_writer(StubTable(), [], max_queue=1, enqueue_timeout=0.01)
+    writer.submit(message("1"))
+    with pytest.raises(write_behind.Backpressure):
+        writer.submit(message("2"))
+
+
+def test_drain_stores_queued_messages_without_waiting_for_a_full_batch():
+    written = []
+    # A batch would otherwise wait up to a minute to fill.
+    writer = make_writer(StubTable(unprocessed("2")), written, flush_interval=60)
+    writer.start()
+    for i in ("1", "2", "3"):
+        writer.submit(message(i))
+
+    started = time.monotonic()
+    assert writer.drain(timeout=5)
+    assert time.monotonic() - started < 5
+    assert sorted(m["message_id"] for batch in written for m in batch) == ["1", "2", "3"]
+    with pytest.raises(write_behind.Backpressure):
+        writer.submit(message("4"))
@@ -0,0 +1,184 @@
+"""
+Write-behind persistence for POST /messages (MESSAGE_WRITE_MODE=write-behind).
+
+Accepted messages go into a bounded in-process FIFO and the request
+returns 202 at once. One flusher thread per process takes up to
+`batch_size` queued messages, waiting at most `flush_interval` for a
+batch to fill, and stores them with messages.write_batch (BatchWriteItem
+with unprocessed-item retry). `on_written` gets the messages each flush
+stored, once per flush, so conversation summaries are updated per batch;
+events for a message are published only once it is stored, so a woken
+long-poll always finds it.
+
+Ordering: timestamps are assigned when a message is accepted and the
+single flusher writes in acceptance order, retrying failed items ahead of
+newer ones, so a conversation reads back in the order it was sent.
+
+Backpressure: when the queue is full, submit() waits up to
+`enqueue_timeout` and then raises Backpressure (the API answers 503 with
+Retry-After). On shutdown the writer stops accepting and the flusher
+drains the queue without waiting for batches to fill; the process waits
+up to `drain_timeout` for it at exit.
+
+Queued messages live in process memory: a pod that is killed (not
+stopped) loses what it has not flushed, at most `flush_interval` plus one
+DynamoDB round trip of traffic.
+"""
+import atexit
+import os
+import queue
+import threading
+import time
+
+from common import metrics
+
+import messages
+
+MESSAGE_QUEUE_SIZE = int(os.environ.get('MESSAGE_QUEUE_SIZE', 10000))
+MESSAGE_FLUSH_INTERVAL = float(os.environ.get('MESSAGE_FLUSH_INTERVAL_MS', 20)) / 1000
+MESSAGE_ENQUEUE_TIMEOUT = float(os.environ.get('MESSAGE_ENQUEUE_TIMEOUT_MS', 200)) / 1000
+# Flush rounds a message may fail before it is dropped and counted as lost.
+MESSAGE_WRITE_MAX_ROUNDS = int(os.environ.get('MESSAGE_WRITE_MAX_ROUNDS', 5))
+MESSAGE_DRAIN_TIMEOUT = float(os.environ.get('MESSAGE_DRAIN_TIMEOUT', 15))
+
+QUEUE_DEPTH = metrics.gauge(
+    "message_write_queue_depth", "Messages accepted but not yet stored"
+)
+WRITES = metrics.counter(
+    "message_writes_total", "Write-behind messages by outcome", ["result"]
+)
+WRITE_DELAY = metrics.histogram(
+    "message_write_delay_seconds", "Time from accepting a message to storing it"
+)
+
+_WAKE = object()
+
+
+class Backpressure(Exception):
+    """The write queue is full or closed; the client should retry later."""
+
+
+class _Entry:
+    __slots__ = ("message", "accepted_at", "rounds")
+
+    def __init__(self, message):
+        self.message = message
+        self.accepted_at = time.monotonic()
+        self.rounds = 0
+
+
+class MessageWriter:
+    def __init__(self, table, on_written=None, max_queue=MESSAGE_QUEUE_SIZE,
+                 batch_size=messages.BATCH_WRITE_SIZE, flush_interval=MESSAGE_FLUSH_INTERVAL,
+                 enqueue_timeout=MESSAGE_ENQUEUE_TIMEOUT, max_rounds=MESSAGE_WRITE_MAX_ROUNDS,
+                 drain_timeout=MESSAGE_DRAIN_TIMEOUT):
+        self.table = table
+        self.on_written = on_written
+        self.max_queue = max_queue
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.enqueue_timeout = enqueue_timeout
+        self.max_rounds = max_rounds
+        self.drain_timeout = drain_timeout
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._closed = False
+        self._thread = None
+        self._pid = None
+        atexit.register(self.drain)
+
+    def start(self):
+        """Starts the flusher; after a fork, with a fresh queue."""
+        if self._pid == os.getpid() and self._thread.is_alive():
+            return
+        if self._pid is not None:
+            # Forked: the parent's queue lock and flusher are not usable here.
+            self._queue = queue.Queue(maxsize=self.max_queue)
+            self._closed = False
+        self._pid = os.getpid()
+        self._thread = threading.Thread(target=self._run, name="message-writer", daemon=True)
+        self._thread.start()
+
+    def submit(self, message):
+        """Queues a message for storage. Raises Backpressure if it cannot be queued."""
+        if self._closed:
+            raise Backpressure("The service is shutting down")
+        try:
+            self._queue.put(_Entry(message), timeout=self.enqueue_timeout)
+        except queue.Full:
+            WRITES.inc(result="rejected")
+            raise Backpressure("Too many messages are waiting to be stored")
+        QUEUE_DEPTH.set(self._queue.qsize())
+
+    def close(self):
+        """Stops accepting messages and lets the flusher drain without batching delays."""
+        self._closed = True
+        try:
+            self._queue.put_nowait(_WAKE)
+        except queue.Full:
+            pass  # the flusher is busy and will notice the flag
+
+    def drain(self, timeout=None):
+        """Closes the writer and waits for the queue to be stored. Returns True if it was."""
+        if self._thread is None or self._pid != os.getpid():
+            return True
+        self.close()
+        self._thread.join(self.drain_timeout if timeout is None else timeout)
+        return not self._thread.is_alive()
+
+    # ----------------------------------------------------------------
+    #  Flusher
+    # ----------------------------------------------------------------
+    def _next_batch(self, batch):
+        if not batch:
+            entry = self._queue.get()
+            if entry is not _WAKE:
+                batch.append(entry)
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.batch_size:
+            remaining = 0 if self._closed else deadline - time.monotonic()
+            try:
+                entry = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if entry is not _WAKE:
+                batch.append(entry)
+        return batch
+
+    def _run(self):
+        retry = []
+        while not (self._closed and not retry and self._queue.empty()):
+            batch = self._next_batch(retry)
+            QUEUE_DEPTH.set(self._queue.qsize())
+            if batch:
+                retry = self._flush(batch)
+                if retry:
+                    time.sleep(self.flush_interval)
+
+    def _flush(self, batch):
+        try:
+            failed = messages.write_batch(self.table, [entry.message for entry in batch])
+        except Exception as e:
+            failed = {entry.message["message_id"]: str(e) for entry in batch}
+
+        retry, written = [], []
+        now = time.monotonic()
+        for entry in batch:
+            message = entry.message
+            error = failed.get(message["message_id"])
+            if error is None:
+                WRITES.inc(result="written")
+                WRITE_DELAY.observe(now - entry.accepted_at)
+                written.append(message)
+                continue
+            entry.rounds += 1
+            if entry.rounds < self.max_rounds:
+                retry.append(entry)
+            else:
+                WRITES.inc(result="dropped")
+                print(f"Dropping message {message['message_id']} after {entry.rounds} failed writes: {error}")
+        if written and self.on_written is not None:
+            try:
+                self.on_written(written)
+            except Exception as e:
+                print(f"Publishing {len(written)} stored messages failed: {e}")
+        return retry
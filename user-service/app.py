@@ -3,14 +3,28 @@ from flask_cors import CORS
 import uuid
 import datetime
 import os
-import boto3
-import requests
-from jose import jwk, jwt
-from jose.utils import base64url_decode
+import time
 from botocore.exceptions import ClientError
 
+from common import aws, lifecycle, metrics
+from common.auth import CognitoTokenVerifier
+from common.directory import CounsellorDirectory
+from common.http import add_response_middleware, json_with_etag, stream_json
+from common.instrumentation import instrument_app
+from common.json_provider import DynamoJSONProvider
+from common.pagination import check_start_key, page_payload, parse_page_args
+from common.ratelimit import RateLimiter
+from common.readiness import (
+    COGNITO_PROBE_INTERVAL, Readiness, add_readiness_route, add_table_probes, cognito_probe, jwks_probe
+)
+from usernames import UsernameResolver
+
 app = Flask(__name__)
+# Serializes DynamoDB Decimals, sets and binaries, with orjson when available.
+app.json = DynamoJSONProvider(app)
 CORS(app)
+instrument_app(app)
+add_response_middleware(app)
 
 # ----------------------------------------------------------------
 #  AWS & Cognito Config
@@ -20,39 +34,74 @@ USERS_TABLE_NAME = os.environ.get('USERS_TABLE_NAME', 'Users')
 USER_POOL_ID = os.environ.get('COGNITO_USER_POOL_ID')      # e.g., "us-east-1_xxxxx"
 USER_POOL_CLIENT_ID = os.environ.get('COGNITO_USER_POOL_CLIENT_ID')
 
-dynamodb = boto3.resource('dynamodb', region_name=AWS_REGION)
+dynamodb = aws.resource('dynamodb', region_name=AWS_REGION)
 users_table = dynamodb.Table(USERS_TABLE_NAME)
 
-# Boto3 Cognito client for sign-up / sign-in actions
-cognito_idp = boto3.client('cognito-idp', region_name=AWS_REGION)
-
-# We’ll grab the JWKS (public keys) from Cognito once on startup or lazily.
-JWKS_URL = f"https://cognito-idp.{AWS_REGION}.amazonaws.com/{USER_POOL_ID}/.well-known/jwks.json"
-JWKS = None  # Will load on first validation or at startup
+# Counsellors change rarely; serve them from a TTL cache fed by the profile_type GSI.
+counsellor_directory = CounsellorDirectory(users_table)
 
-
-@app.before_first_request
-def load_jwks():
-    global JWKS
-    try:
-        resp = requests.get(JWKS_URL)
-        resp.raise_for_status()
-        JWKS = resp.json()["keys"]
-        print("JWKS loaded successfully.")
-    except Exception as e:
-        print(f"Failed to load JWKS from {JWKS_URL}: {e}")
+# Boto3 Cognito client for sign-up / sign-in actions
+cognito_idp = aws.client('cognito-idp', region_name=AWS_REGION)
+
+# email -> Cognito username, so /login and /confirm rarely need ListUsers
+username_resolver = UsernameResolver(users_table, cognito_idp, USER_POOL_ID)
+
+# Each sign-up, confirmation or login costs Cognito calls against the
+# account-wide Cognito quotas, so they are limited per client IP and in
+# total (per worker process with the default memory backend; see
+# common/ratelimit.py). "" turns a limit off.
+register_limiter = RateLimiter(
+    "register",
+    per_ip=os.environ.get('REGISTER_RATE_LIMIT_PER_IP', '5/minute'),
+    total=os.environ.get('REGISTER_RATE_LIMIT', '10/second'),
+)
+confirm_limiter = RateLimiter(
+    "confirm",
+    per_ip=os.environ.get('CONFIRM_RATE_LIMIT_PER_IP', '10/minute'),
+    total=os.environ.get('CONFIRM_RATE_LIMIT', '10/second'),
+)
+login_limiter = RateLimiter(
+    "login",
+    per_ip=os.environ.get('LOGIN_RATE_LIMIT_PER_IP', '20/minute'),
+    total=os.environ.get('LOGIN_RATE_LIMIT', '30/second'),
+)
+
+LOGIN_LATENCY = metrics.histogram(
+    "login_duration_seconds", "Time spent handling POST /login", ["outcome"]
+)
+
+# Verified tokens are cached until they expire; the JWKS is loaded on startup
+# (in the background with FAST_START) and refreshed in the background.
+token_verifier = CognitoTokenVerifier(
+    AWS_REGION, USER_POOL_ID, USER_POOL_CLIENT_ID,
+    cache_size=int(os.environ.get('TOKEN_CACHE_SIZE', 1024)),
+    jwks_url=os.environ.get('COGNITO_JWKS_URL')  # override for a local JWKS file or stub
+)
+verify_cognito_token = token_verifier.verify
+token_verifier.jwks.start()
+lifecycle.after_fork(token_verifier.jwks.start)
 
 # ----------------------------------------------------------------
-#  Health Check
+#  Health Check (liveness) and readiness
 # ----------------------------------------------------------------
 @app.route("/health", methods=["GET"])
 def health():
     return "User Service is healthy!", 200
 
+readiness = Readiness()
+readiness.probe("jwks", jwks_probe(token_verifier))
+add_table_probes(readiness, {USERS_TABLE_NAME: users_table})
+# Sign-up and login need Cognito itself, but an outage there should not
+# take the profile endpoints out of rotation with it.
+readiness.probe("cognito", cognito_probe(token_verifier, cognito_idp),
+                interval=COGNITO_PROBE_INTERVAL, critical=False)
+add_readiness_route(app, readiness)
+
 # ----------------------------------------------------------------
 #  Cognito-based Sign Up
 # ----------------------------------------------------------------
 @app.route("/register", methods=["POST"])
+@register_limiter
 def register():
     """
     Registers a user using Cognito.
@@ -106,6 +155,7 @@ def register():
         "name": name,
         "email": email,
         "profile_type": profile_type,
+        "cognito_username": username,
         "created_at": datetime.datetime.utcnow().isoformat() + "Z"
     }
     if profile_type == "counsellor":
@@ -115,6 +165,8 @@ def register():
         users_table.put_item(Item=user_item)
     except Exception as e:
         return jsonify({"error": f"Error storing user data: {e}"}), 500
+    username_resolver.remember(email, username)
+    counsellor_directory.add([user_item])
 
     return jsonify({
         "message": "User registered successfully",
@@ -128,6 +180,7 @@ def register():
 #  Cognito-based Sign Up Confirmation
 # ----------------------------------------------------------------
 @app.route("/confirm", methods=["POST"])
+@confirm_limiter
 def confirm():
     data = request.json
     if not data or "email" not in data or "confirmation_code" not in data:
@@ -138,14 +191,9 @@ def confirm():
 
     # Look up the username using email:
     try:
-        lookup_resp = cognito_idp.list_users(
-            UserPoolId=USER_POOL_ID,
-            Filter=f'email = "{email}"'
-        )
-        users = lookup_resp.get("Users", [])
-        if not users:
+        username = username_resolver.resolve(email)
+        if username is None:
             return jsonify({"error": "User not found"}), 404
-        username = users[0]["Username"]
     except ClientError as e:
         return jsonify({"error": f"Error looking up user: {e}"}), 500
 
@@ -165,7 +213,14 @@ def confirm():
 #  Cognito-based Sign In
 # ----------------------------------------------------------------
 @app.route("/login", methods=["POST"])
+@login_limiter
 def login():
+    started = time.perf_counter()
+    response, status = _login()
+    LOGIN_LATENCY.observe(time.perf_counter() - started, outcome=status)
+    return response, status
+
+def _login():
     data = request.json
     if not data or "email" not in data or "password" not in data:
         return jsonify({"error": "Email and password are required"}), 400
@@ -173,18 +228,11 @@ def login():
     email = data["email"]
     password = data["password"]
 
-    # Lookup the actual username using the email alias.
+    # Lookup the actual username using the email alias (cached; ListUsers is the last resort).
     try:
-        lookup_resp = cognito_idp.list_users(
-            UserPoolId=USER_POOL_ID,
-            Filter=f'email = "{email}"'
-        )
-        users = lookup_resp.get("Users", [])
-        if not users:
+        username = username_resolver.resolve(email)
+        if username is None:
             return jsonify({"error": "User not found"}), 404
-        
-        # The actual username generated during sign-up is in the 'Username' field.
-        username = users[0]["Username"]
     except ClientError as e:
         return jsonify({"error": f"Error looking up user: {e}"}), 500
 
@@ -211,56 +259,6 @@ def login():
         "token_type": auth_result["TokenType"]
     }), 200
 
-# ----------------------------------------------------------------
-#  Token Validation Utility
-# ----------------------------------------------------------------
-def verify_cognito_token(token):
-    """
-    Verifies the JWT using the public keys from the Cognito User Pool.
-    Raises an exception if verification fails.
-    """
-    global JWKS
-    if not JWKS:
-        # Reload JWKS if not loaded or if you prefer lazy loading
-        load_jwks()
-
-    headers = jwt.get_unverified_header(token)
-    kid = headers['kid']
-
-    # Find the matching public key in our JWKS
-    key_index = None
-    for i in range(len(JWKS)):
-        if kid == JWKS[i]['kid']:
-            key_index = i
-            break
-    if key_index is None:
-        raise ValueError("Public key not found in JWKS")
-
-    public_key = jwk.construct(JWKS[key_index])
-    message, encoded_signature = token.rsplit('.', 1)
-    decoded_signature = base64url_decode(encoded_signature.encode('utf-8'))
-
-    if not public_key.verify(message.encode("utf8"), decoded_signature):
-        raise ValueError("Signature verification failed")
-
-    # Now verify claims like issuer, client_id, expiration, etc.
-    claims = jwt.get_unverified_claims(token)
-    # Check token expiration
-    if claims['exp'] < datetime.datetime.utcnow().timestamp():
-        raise ValueError("Token is expired")
-
-    # Verify token audience matches your app client ID
-    if claims['aud'] != USER_POOL_CLIENT_ID:
-        raise ValueError("Token was not issued for this audience")
-
-    # (Optionally) check the issuer
-    iss = f"https://cognito-idp.{AWS_REGION}.amazonaws.com/{USER_POOL_ID}"
-    if claims['iss'] != iss:
-        raise ValueError("Token issuer mismatch")
-
-    # If everything checks out, return the claims
-    return claims
-
 # ----------------------------------------------------------------
 #  Example Protected Endpoint: fetch all counsellors
 # ----------------------------------------------------------------
@@ -270,6 +268,9 @@ def get_counsellors():
     Example: You must supply a valid Cognito Access/ID token in the header:
       Authorization: Bearer <JWT>
     This endpoint simply returns all users in DynamoDB with profile_type = 'counsellor'.
+    Pass `limit` (and the returned `next_cursor` as `cursor`) to page through results.
+    Responses carry an ETag; a matching If-None-Match gets 304.
+    The unpaginated list is streamed; ?format=ndjson returns one counsellor per line.
     """
     # Grab the token from the Authorization header
     auth_header = request.headers.get('Authorization')
@@ -289,12 +290,20 @@ def get_counsellors():
     except Exception as e:
         return jsonify({"error": f"Token verification failed: {e}"}), 401
 
-    # If we get here, token is valid. Let's fetch counsellors from DynamoDB
     try:
-        response = users_table.scan()
-        all_users = response.get("Items", [])
-        counsellors = [u for u in all_users if u.get("profile_type") == "counsellor"]
-        return jsonify(counsellors), 200
+        paginated, limit, position = parse_page_args(request.args)
+        check_start_key(position, ("user_id",))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    # If we get here, token is valid. Let's fetch counsellors from the directory cache
+    try:
+        if not paginated:
+            counsellors, etag = counsellor_directory.snapshot()
+            return stream_json(counsellors, etag)
+        after_id = position.get("user_id") if position else None
+        page, last_id = counsellor_directory.page(limit, after_id)
+        return json_with_etag(page_payload(page, limit, last_id and {"user_id": last_id}))
     except Exception as e:
         return jsonify({"error": "Error fetching counsellors: " + str(e)}), 500
 
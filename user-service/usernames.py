@@ -0,0 +1,101 @@
+import os
+import time
+
+from boto3.dynamodb.conditions import Key
+
+from common import metrics
+from common.cache import TTLCache
+
+EMAIL_INDEX = os.environ.get('USERS_EMAIL_INDEX', 'email-index')
+USERNAME_CACHE_SIZE = int(os.environ.get('USERNAME_CACHE_SIZE', 10000))
+USERNAME_CACHE_TTL = float(os.environ.get('USERNAME_CACHE_TTL', 3600))
+
+LOOKUPS = metrics.counter(
+    "username_lookup_total",
+    "Email to Cognito username lookups, by where the answer came from",
+    ["source"]
+)
+
+
+# ----------------------------------------------------------------
+#  Email -> Cognito username resolution
+# ----------------------------------------------------------------
+class UsernameResolver:
+    """
+    Resolves the Cognito username for an email without calling ListUsers
+    on every login. Lookups go, in order, to:
+
+      1. a bounded in-process cache,
+      2. the Users table `email-index` GSI (cognito_username is written at register),
+      3. cognito-idp ListUsers, whose answer is written back to the Users item.
+    """
+
+    def __init__(self, users_table, cognito_idp, user_pool_id, index_name=EMAIL_INDEX,
+                 cache_size=USERNAME_CACHE_SIZE, ttl=USERNAME_CACHE_TTL):
+        self.users_table = users_table
+        self.cognito_idp = cognito_idp
+        self.user_pool_id = user_pool_id
+        self.index_name = index_name
+        self.ttl = ttl
+        self._cache = TTLCache(maxsize=cache_size, name="cognito_username")
+
+    def remember(self, email, username):
+        self._cache.set(email, username, time.time() + self.ttl)
+
+    def _from_table(self, email):
+        try:
+            response = self.users_table.query(
+                IndexName=self.index_name,
+                KeyConditionExpression=Key("email").eq(email)
+            )
+        except Exception as e:
+            print(f"Users email-index lookup failed, falling back to Cognito: {e}")
+            return None
+        for item in response.get("Items", []):
+            if item.get("cognito_username"):
+                return item["cognito_username"]
+        return None
+
+    def _from_cognito(self, email):
+        lookup_resp = self.cognito_idp.list_users(
+            UserPoolId=self.user_pool_id,
+            Filter=f'email = "{email}"'
+        )
+        users = lookup_resp.get("Users", [])
+        if not users:
+            return None
+        username = users[0]["Username"]
+        sub = next((a["Value"] for a in users[0].get("Attributes", []) if a["Name"] == "sub"), None)
+        if sub:
+            # Backfill so the next lookup for this user is answered by the table.
+            try:
+                self.users_table.update_item(
+                    Key={"user_id": sub},
+                    UpdateExpression="SET cognito_username = :u",
+                    ConditionExpression="attribute_exists(user_id)",
+                    ExpressionAttributeValues={":u": username}
+                )
+            except Exception:
+                pass
+        return username
+
+    def resolve(self, email):
+        """
+        Returns the username, or None if no user has this email.
+        Raises botocore ClientError if the Cognito fallback fails.
+        """
+        username = self._cache.get(email)
+        if username is not None:
+            LOOKUPS.inc(source="cache")
+            return username
+        username = self._from_table(email)
+        source = "table"
+        if username is None:
+            username = self._from_cognito(email)
+            source = "cognito"
+        if username is None:
+            LOOKUPS.inc(source="not_found")
+            return None
+        LOOKUPS.inc(source=source)
+        self.remember(email, username)
+        return username